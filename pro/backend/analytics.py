@@ -0,0 +1,224 @@
+"""Job duration statistics and completion estimates
+
+Closed time entries of archived jobs are loaded in columnar form (NumPy
+arrays of job id, user id, clock-in and clock-out epoch seconds) and reduced
+with vectorized group operations: per-job totals with bincount, per-group
+percentiles by sorting once on (group, value) and indexing each group's
+quantile positions.
+
+Similar jobs share a "kind": the job name with part numbers and other tokens
+containing digits removed, so "Part AB-1234 mill" and "Part CD-77 mill" are
+both "part mill". An open job's estimate is the median and 90th percentile
+total time of archived jobs of its kind, or of all archived jobs when its kind
+has too few samples.
+
+The statistics are recomputed every ANALYTICS_REFRESH_SECONDS on a
+background thread in each worker; requests only read the last result.
+"""
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from config import ANALYTICS_REFRESH_SECONDS, ESTIMATE_MIN_SAMPLES
+from database import SessionLocal
+from models import Job, TimeEntry
+from timeclock import epoch_seconds
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.9)
+STREAM_BATCH = 10000
+
+_TOKEN_RE = re.compile(r"[\w-]+")
+
+
+def job_kind(job_name: str) -> str:
+    """Name with numbered tokens (part numbers, sizes, dates) dropped"""
+    words = [token for token in _TOKEN_RE.findall(job_name.lower()) if not any(ch.isdigit() for ch in token)]
+    return " ".join(words)
+
+
+class ClosedEntries(NamedTuple):
+    """Closed entries of archived jobs, one array per column"""
+    job_ids: np.ndarray  # int64
+    user_ids: np.ndarray  # int64
+    clock_ins: np.ndarray  # float64 epoch seconds
+    clock_outs: np.ndarray  # float64 epoch seconds
+
+    @property
+    def durations(self) -> np.ndarray:
+        return np.maximum(self.clock_outs - self.clock_ins, 0.0)
+
+
+def load_closed_entries(db: Session) -> ClosedEntries:
+    """Stream closed entries of archived jobs into arrays"""
+    job_ids, user_ids, clock_ins, clock_outs = [], [], [], []
+    rows = (
+        db.query(TimeEntry.job_id, TimeEntry.user_id, TimeEntry.clock_in, TimeEntry.clock_out)
+        .join(Job, Job.id == TimeEntry.job_id)
+        .filter(Job.is_archived == True, TimeEntry.clock_out.isnot(None))
+        .yield_per(STREAM_BATCH)
+    )
+    for job_id, user_id, clock_in, clock_out in rows:
+        job_ids.append(job_id)
+        user_ids.append(user_id)
+        clock_ins.append(epoch_seconds(clock_in))
+        clock_outs.append(epoch_seconds(clock_out))
+    return ClosedEntries(
+        np.array(job_ids, dtype=np.int64),
+        np.array(user_ids, dtype=np.int64),
+        np.array(clock_ins, dtype=np.float64),
+        np.array(clock_outs, dtype=np.float64),
+    )
+
+
+def group_percentiles(groups: np.ndarray, values: np.ndarray, quantiles=QUANTILES):
+    """Per-group percentiles (linear interpolation, like np.percentile)
+
+    Returns (unique groups, counts, array of shape [groups, quantiles]).
+    """
+    if not len(values):
+        return groups[:0], np.zeros(0, dtype=np.int64), np.zeros((0, len(quantiles)))
+    order = np.lexsort((values, groups))
+    values = values[order]
+    unique, starts, counts = np.unique(groups[order], return_index=True, return_counts=True)
+    q = np.asarray(quantiles, dtype=np.float64)
+    positions = starts[:, None] + q[None, :] * (counts - 1)[:, None]
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, (starts + counts - 1)[:, None])
+    fraction = positions - lower
+    return unique, counts, values[lower] + (values[upper] - values[lower]) * fraction
+
+
+class Estimate(NamedTuple):
+    p50_seconds: float
+    p90_seconds: float
+    samples: int
+
+
+class DurationStats(NamedTuple):
+    overall: Optional[Estimate]
+    kinds: Dict[str, Estimate]
+    workers: List[dict]  # per user: jobs, entries, total and per-job percentiles
+    entries: int
+    jobs: int
+
+
+def compute_stats(entries: ClosedEntries, job_names: Dict[int, str]) -> DurationStats:
+    """Vectorized duration statistics over closed entries"""
+    if not len(entries.job_ids):
+        return DurationStats(None, {}, [], 0, 0)
+    durations = entries.durations
+
+    # Total time per job
+    job_ids, job_index = np.unique(entries.job_ids, return_inverse=True)
+    job_totals = np.bincount(job_index, weights=durations, minlength=len(job_ids))
+    overall = np.percentile(job_totals, [q * 100 for q in QUANTILES])
+
+    # Per kind of job
+    kind_names = {}
+    kind_of_job = np.fromiter(
+        (kind_names.setdefault(job_kind(job_names.get(int(job_id), "")), len(kind_names)) for job_id in job_ids),
+        dtype=np.int64, count=len(job_ids),
+    )
+    kinds, kind_counts, kind_pcts = group_percentiles(kind_of_job, job_totals)
+    names_by_index = {index: name for name, index in kind_names.items()}
+    by_kind = {
+        names_by_index[int(kind)]: Estimate(float(pcts[0]), float(pcts[1]), int(count))
+        for kind, count, pcts in zip(kinds, kind_counts, kind_pcts)
+    }
+
+    # Per worker: time they put into each job, as a distribution over jobs
+    stride = int(entries.job_ids.max()) + 1
+    pair_keys, pair_index = np.unique(entries.user_ids * stride + entries.job_ids, return_inverse=True)
+    pair_seconds = np.bincount(pair_index, weights=durations, minlength=len(pair_keys))
+    users, user_jobs, user_pcts = group_percentiles(pair_keys // stride, pair_seconds)
+    user_index = np.searchsorted(users, entries.user_ids)
+    user_entries = np.bincount(user_index, minlength=len(users))
+    user_totals = np.bincount(user_index, weights=durations, minlength=len(users))
+    workers = [
+        {
+            "user_id": int(user_id),
+            "jobs": int(jobs),
+            "entries": int(n_entries),
+            "total_seconds": float(total),
+            "p50_job_seconds": float(pcts[0]),
+            "p90_job_seconds": float(pcts[1]),
+        }
+        for user_id, jobs, n_entries, total, pcts in zip(users, user_jobs, user_entries, user_totals, user_pcts)
+    ]
+    return DurationStats(
+        Estimate(float(overall[0]), float(overall[1]), len(job_ids)),
+        by_kind, workers, len(durations), len(job_ids),
+    )
+
+
+class JobEstimates:
+    """Last computed DurationStats, refreshed periodically on a background thread"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stats = DurationStats(None, {}, [], 0, 0)
+        self.refreshed_at: Optional[datetime] = None
+        self.refresh_seconds = 0.0
+        self._listeners = []
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def on_refresh(self, callback) -> None:
+        """Call callback() after each refresh (e.g. to rebuild cached responses)"""
+        self._listeners.append(callback)
+
+    def refresh(self) -> None:
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            entries = load_closed_entries(db)
+            job_names = dict(db.query(Job.id, Job.job_name).filter(Job.is_archived == True).all())
+        finally:
+            db.close()
+        self.stats = compute_stats(entries, job_names)
+        self.refreshed_at = datetime.utcnow()
+        self.refresh_seconds = time.perf_counter() - started
+        for callback in self._listeners:
+            callback()
+
+    def estimate(self, job_name: str) -> Optional[Estimate]:
+        """Expected total time for a job with this name, if there is enough history"""
+        stats = self.stats
+        similar = stats.kinds.get(job_kind(job_name))
+        if similar is not None and similar.samples >= ESTIMATE_MIN_SAMPLES:
+            return similar
+        if stats.overall is not None and stats.overall.samples >= ESTIMATE_MIN_SAMPLES:
+            return stats.overall
+        return None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._refresh_forever, name="job-estimates", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _refresh_forever(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Refreshing job estimates failed; keeping the previous ones")
+            self._stopping.wait(self.interval)
+
+
+estimates = JobEstimates(ANALYTICS_REFRESH_SECONDS)
@@ -0,0 +1,306 @@
+"""Append-only audit log
+
+Every change to users, jobs, job assignments and time entries made through
+the ORM is captured when the session flushes: who made it (the session's
+actor), which row, and the changed columns before and after. Set-based
+statements bypass the flush and call record() themselves.
+
+Events wait on the session until it commits (a rollback discards them) and
+then go to an in-memory buffer that a background thread writes in batches -
+one multi-row INSERT every AUDIT_FLUSH_SECONDS, or as soon as AUDIT_BATCH_SIZE
+are waiting - so a clock-in only pays for building a small dict. Events still
+in the buffer when a worker dies are lost; stop() flushes on a clean shutdown.
+"""
+import json
+import logging
+import threading
+from datetime import date, datetime
+from typing import List, Optional
+
+from fastapi import Depends
+from sqlalchemy import event, inspect, insert
+from sqlalchemy.orm import Session
+
+from auth import get_current_active_user
+from config import AUDIT_FLUSH_SECONDS, AUDIT_BATCH_SIZE, AUDIT_MAX_BUFFERED
+from database import get_write_db, write_session
+from models import AuditEvent, Job, JobAssignment, TimeEntry, User
+
+logger = logging.getLogger("honeybadger.audit")
+
+SOURCE_API = "api"
+SOURCE_SYNC = "sync"
+SOURCE_KIOSK = "kiosk"
+SOURCE_SYSTEM = "system"
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+
+# Columns recorded as "***" - the log should say a secret changed, not hold it
+_SECRET_COLUMNS = {"password_hash", "kiosk_credential_hash"}
+
+
+def _user_ids(user: User):
+    return None, user.id
+
+
+def _job_ids(job: Job):
+    return job.id, None
+
+
+def _row_ids(row):
+    return row.job_id, row.user_id
+
+
+def _time_entry_action(op: str, before: Optional[dict], after: Optional[dict]) -> str:
+    if op == CREATE:
+        return "clock_in"
+    if op == UPDATE and before and before.get("clock_out") is None and after.get("clock_out") is not None:
+        return "clock_out"
+    return f"time_entry.{op}"
+
+
+# model -> (action for an operation, (job_id, user_id) the row concerns)
+_AUDITED = {
+    User: (lambda op, before, after: f"user.{op}", _user_ids),
+    Job: (lambda op, before, after: f"job.{op}", _job_ids),
+    JobAssignment: (
+        lambda op, before, after: {CREATE: "job.assign", DELETE: "job.unassign"}.get(op, "assignment.update"),
+        _row_ids,
+    ),
+    TimeEntry: (_time_entry_action, _row_ids),
+}
+
+
+def _jsonable(key: str, value):
+    if value is not None and key in _SECRET_COLUMNS:
+        return "***"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _loaded_columns(obj) -> dict:
+    """Column values already loaded on obj (never triggers a lazy load)"""
+    state = inspect(obj)
+    loaded = state.dict
+    return {
+        attr.key: _jsonable(attr.key, loaded[attr.key])
+        for attr in state.mapper.column_attrs if attr.key in loaded
+    }
+
+
+def _changed_columns(obj):
+    """(before, after) of the columns changed on obj since it was loaded"""
+    state = inspect(obj)
+    before, after = {}, {}
+    for attr in state.mapper.column_attrs:
+        history = state.attrs[attr.key].history
+        if not history.added and not history.deleted:
+            continue
+        before[attr.key] = _jsonable(attr.key, history.deleted[0] if history.deleted else None)
+        after[attr.key] = _jsonable(attr.key, history.added[0] if history.added else None)
+    return before, after
+
+
+def set_actor(db: Session, actor_id: Optional[int], source: str = SOURCE_API) -> None:
+    """Attribute the session's changes to a user (None for the system)"""
+    db.info["audit_actor"] = (actor_id, source)
+
+
+def get_audited_db(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_write_db)
+) -> Session:
+    """get_write_db() with the caller as the actor of everything it writes"""
+    set_actor(db, current_user.id)
+    return db
+
+
+def _pending(db: Session) -> list:
+    return db.info.setdefault("audit_pending", [])
+
+
+def record(db: Session, action: str, target_type: str, target_id: Optional[int] = None,
+           job_id: Optional[int] = None, user_id: Optional[int] = None,
+           before: Optional[dict] = None, after: Optional[dict] = None) -> None:
+    """Log a change made without the ORM (bulk UPDATE/INSERT); kept if db commits"""
+    _pending(db).append({
+        "occurred_at": datetime.utcnow(),
+        "action": action,
+        "target_type": target_type,
+        "target_id": target_id,
+        "job_id": job_id,
+        "user_id": user_id,
+        "before": json.dumps(before) if before is not None else None,
+        "after": json.dumps(after) if after is not None else None,
+    })
+
+
+class AuditLog:
+    """Buffer of committed events, written in batches by a background thread"""
+
+    def __init__(self, flush_interval: float, batch_size: int, max_buffered: int):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffered = max_buffered
+        self._buffer: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # keeps batches in buffer order
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._stats = {"written": 0, "batches": 0, "dropped": 0}
+
+    def append(self, events: List[dict]) -> None:
+        with self._lock:
+            self._buffer.extend(events)
+            waiting = len(self._buffer)
+        if waiting >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of events"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._buffer = self._buffer, []
+            if not events:
+                return 0
+            try:
+                with write_session() as db:
+                    db.execute(insert(AuditEvent), events)
+                    db.commit()
+            except Exception:
+                self._requeue(events)
+                raise
+            with self._lock:
+                self._stats["written"] += len(events)
+                self._stats["batches"] += 1
+            return len(events)
+
+    def _requeue(self, events: List[dict]) -> None:
+        """Put a failed batch back in front, dropping the oldest past max_buffered"""
+        with self._lock:
+            self._buffer[:0] = events
+            overflow = len(self._buffer) - self.max_buffered
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self._stats["dropped"] += overflow
+                logger.error("Audit buffer full; dropped %d events", overflow)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {**self._stats, "buffered": len(self._buffer)}
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._flush_forever, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final audit flush failed; %d events lost", self.metrics()["buffered"])
+
+    def _flush_forever(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writing audit events failed; retrying")
+
+
+audit_log = AuditLog(AUDIT_FLUSH_SECONDS, AUDIT_BATCH_SIZE, AUDIT_MAX_BUFFERED)
+
+
+def query_events(db: Session, limit: int, before_id: Optional[int] = None, since: Optional[datetime] = None,
+                 until: Optional[datetime] = None, **filters) -> List[dict]:
+    """Events newest first, filtered on equality (actor_id, job_id, action, ...)
+
+    Pages by id (before_id = the last id of the previous page), which every
+    index ends with, so each page is one index range scan.
+    """
+    query = db.query(AuditEvent)
+    for column, value in filters.items():
+        if value is not None:
+            query = query.filter(getattr(AuditEvent, column) == value)
+    if before_id is not None:
+        query = query.filter(AuditEvent.id < before_id)
+    if since is not None:
+        query = query.filter(AuditEvent.occurred_at >= since)
+    if until is not None:
+        query = query.filter(AuditEvent.occurred_at < until)
+    events = query.order_by(AuditEvent.id.desc()).limit(limit).all()
+
+    actor_ids = {e.actor_id for e in events if e.actor_id is not None}
+    names = dict(db.query(User.id, User.username).filter(User.id.in_(actor_ids)).all()) if actor_ids else {}
+    return [
+        {
+            "id": e.id,
+            "occurred_at": e.occurred_at,
+            "actor_id": e.actor_id,
+            "actor_username": names.get(e.actor_id),
+            "source": e.source,
+            "action": e.action,
+            "target_type": e.target_type,
+            "target_id": e.target_id,
+            "job_id": e.job_id,
+            "user_id": e.user_id,
+            "before": json.loads(e.before) if e.before else None,
+            "after": json.loads(e.after) if e.after else None,
+        }
+        for e in events
+    ]
+
+
+# ==================== SESSION HOOKS ====================
+
+@event.listens_for(Session, "after_flush")
+def _capture_flush(session, flush_context):
+    changes = (
+        [(obj, CREATE) for obj in session.new]
+        + [(obj, UPDATE) for obj in session.dirty]
+        + [(obj, DELETE) for obj in session.deleted]
+    )
+    for obj, op in changes:
+        audited = _AUDITED.get(type(obj))
+        if audited is None:
+            continue
+        if op == CREATE:
+            before, after = None, _loaded_columns(obj)
+        elif op == UPDATE:
+            before, after = _changed_columns(obj)
+            if not after:
+                continue  # only relationships changed
+        else:
+            before, after = _loaded_columns(obj), None
+        action, ids = audited
+        job_id, user_id = ids(obj)
+        record(session, action(op, before, after), obj.__tablename__, obj.id, job_id, user_id, before, after)
+
+
+@event.listens_for(Session, "after_commit")
+def _buffer_commit(session):
+    events = session.info.pop("audit_pending", None)
+    if events:
+        actor_id, source = session.info.get("audit_actor", (None, SOURCE_SYSTEM))
+        for item in events:
+            item["actor_id"] = actor_id
+            item["source"] = source
+        audit_log.append(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rollback(session):
+    session.info.pop("audit_pending", None)
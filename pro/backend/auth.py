@@ -1,30 +1,116 @@
 """Authentication utilities"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
 
-from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
-from database import get_db
+from config import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, USER_CACHE_TTL_SECONDS,
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE
+)
+from database import SessionLocal
+from invalidation import bus
 from models import User
+from sessions import is_session_live
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Token users by username -> (expires_at, detached User). Cleared whenever any
+# worker commits to the users table; the TTL only bounds a missed notification.
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+_user_cache_generation = 0
+
+
+def _clear_user_cache(table: str = "users") -> None:
+    global _user_cache_generation
+    with _user_cache_lock:
+        _user_cache.clear()
+        _user_cache_generation += 1
+
+
+bus.subscribe("users", _clear_user_cache)
+
+
+def lookup_user(username: str) -> Optional[User]:
+    """Find a user by username, through the user cache"""
+    now = time.monotonic()
+    cached = _user_cache.get(username)
+    if cached and cached[0] > now:
+        return cached[1]
+    
+    generation = _user_cache_generation
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == username).first()
+    finally:
+        db.close()
+    if user is not None:
+        with _user_cache_lock:
+            # Skip caching if an invalidation raced with our query
+            if generation == _user_cache_generation:
+                _user_cache[username] = (now + USER_CACHE_TTL_SECONDS, user)
+    return user
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# bcrypt is deliberately slow (hundreds of ms of CPU). Hashes and
+# verifications run on a few dedicated threads; the semaphore bounds how many
+# may wait for them.
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+
+async def _on_hash_pool(busy_detail: str, fn, *args):
+    """fn(*args) on the bcrypt pool; 503 with busy_detail when too many are queued"""
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=busy_detail,
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await asyncio.wrap_future(_hash_pool.submit(fn, *args))
+    finally:
+        _hash_slots.release()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password() on the bcrypt pool; 503 when too many are queued"""
+    return await _on_hash_pool("Too many logins at once, please try again",
+                               verify_password, plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
 
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash() on the bcrypt pool; 503 when too many are queued"""
+    return await _on_hash_pool("Too many accounts being created at once, please try again",
+                               get_password_hash, password)
+
+
+def token_session_id(token: str) -> Optional[str]:
+    """Session id ("sid") of an access token, if it has one"""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sid")
+    except JWTError:
+        return None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -37,8 +123,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """Get current user from JWT token"""
+def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    """Get current user from JWT token
+
+    The lookup uses its own short-lived session (or the user cache) so the
+    request never holds a pooled connection while it waits for the writer
+    lock (see get_write_db). The returned user is detached and shared between
+    requests; only read its column attributes.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -52,7 +144,12 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
+    # Tokens issued before sessions existed carry no sid and simply expire
+    sid = payload.get("sid")
+    if sid is not None and not is_session_live(sid):
+        raise credentials_exception
+    
+    user = lookup_user(username)
     if user is None:
         raise credentials_exception
     return user
@@ -0,0 +1,264 @@
+"""Job board responses: bulk loading and the in-memory board snapshot
+
+Job lists come in two views:
+  full - JobResponse, with description, requirements and assignments
+  card - JobCardResponse, just what a board card shows; skips the text
+         columns and never loads assignment rows or users
+"""
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import List, Literal, Optional
+
+from pydantic import TypeAdapter
+from sqlalchemy import func
+from sqlalchemy.orm import Session, load_only
+
+from analytics import estimates
+from config import JOB_TIME_ATTRIBUTION
+from invalidation import bus
+from models import User, Job, JobAssignment, JobTimeTotal, OpenClock
+from schemas import JobResponse, JobCardResponse
+from timeclock import epoch_seconds
+
+# Any commit touching these tables changes what the board shows
+BOARD_TABLES = ("jobs", "job_assignments", "time_entries", "users", "open_clocks", "job_time_totals")
+
+# "raw" sums every entry; "apportioned" splits a worker's overlapping clocks
+# between their jobs so each hour is counted once (see overlap.py)
+TIME_RAW = "raw"
+TIME_APPORTIONED = "apportioned"
+
+VIEW_FULL = "full"
+VIEW_CARD = "card"
+JobView = Literal["full", "card"]
+
+_CARD_COLUMNS = (
+    Job.id, Job.job_name, Job.max_workers, Job.is_complete, Job.is_archived,
+    Job.marked_for_review, Job.created_at, Job.completed_at,
+)
+
+_adapters = {
+    VIEW_FULL: TypeAdapter(List[JobResponse]),
+    VIEW_CARD: TypeAdapter(List[JobCardResponse]),
+}
+
+
+def job_query(db: Session, view: str = VIEW_FULL):
+    """Query for jobs loading only the columns the view needs"""
+    query = db.query(Job)
+    if view == VIEW_CARD:
+        query = query.options(load_only(*_CARD_COLUMNS))
+    return query
+
+
+def _load_time_parts(db: Session, job_ids: List[int]):
+    """Time so far, open clocks and clocked-in pairs per job
+
+    Open clocks are (since, rate) pairs: the job's total grows by
+    (now - since) * rate. Raw totals come from the clock projections
+    (ledger.py), so no time entries are read.
+    """
+    open_rows = (
+        db.query(OpenClock.job_id, OpenClock.user_id, OpenClock.clock_in)
+        .filter(OpenClock.job_id.in_(job_ids))
+        .all()
+    )
+    clocked_in = {(job_id, user_id) for job_id, user_id, _ in open_rows}
+    if JOB_TIME_ATTRIBUTION == TIME_APPORTIONED:
+        # Recomputed from every overlapping entry of the same workers
+        from overlap import apportioned_job_time
+        closed_seconds, open_clocks = apportioned_job_time(db, job_ids, time.time())
+        return closed_seconds, open_clocks, clocked_in
+
+    closed_seconds = defaultdict(float, (
+        db.query(JobTimeTotal.job_id, JobTimeTotal.closed_seconds)
+        .filter(JobTimeTotal.job_id.in_(job_ids))
+        .all()
+    ))
+    open_clocks = defaultdict(list)
+    for job_id, _user_id, clock_in in open_rows:
+        open_clocks[job_id].append((epoch_seconds(clock_in), 1.0))
+    return closed_seconds, open_clocks, clocked_in
+
+
+def _load_assignments(db: Session, job_ids: List[int], clocked_in: set,
+                      only_user_id: Optional[int] = None) -> dict:
+    """Assignment dicts (with usernames) per job"""
+    assignments = defaultdict(list)
+    query = (
+        db.query(JobAssignment, User.username, User.initials)
+        .join(User, User.id == JobAssignment.user_id)
+        .filter(JobAssignment.job_id.in_(job_ids))
+    )
+    if only_user_id is not None:
+        query = query.filter(JobAssignment.user_id == only_user_id)
+    for assignment, username, initials in query.order_by(JobAssignment.id).all():
+        assignments[assignment.job_id].append({
+            "id": assignment.id,
+            "user_id": assignment.user_id,
+            "username": username,
+            "initials": initials,
+            "assigned_at": assignment.assigned_at,
+            "is_clocked_in": (assignment.job_id, assignment.user_id) in clocked_in,
+        })
+    return assignments
+
+
+def _worker_counts(db: Session, job_ids: List[int]) -> dict:
+    """Assignment count per job"""
+    return dict(
+        db.query(JobAssignment.job_id, func.count(JobAssignment.id))
+        .filter(JobAssignment.job_id.in_(job_ids))
+        .group_by(JobAssignment.job_id)
+        .all()
+    )
+
+
+def _job_dict(job: Job, assignments: list, total_seconds: float, current_workers: int = None) -> dict:
+    estimate = None if job.is_archived else estimates.estimate(job.job_name)
+    return {
+        "id": job.id,
+        "job_name": job.job_name,
+        "description": job.description,
+        "requirements": job.requirements,
+        "max_workers": job.max_workers,
+        "auto_review": job.auto_review,
+        "is_complete": job.is_complete,
+        "is_archived": job.is_archived,
+        "marked_for_review": job.marked_for_review,
+        "created_by": job.created_by,
+        "created_at": job.created_at,
+        "completed_at": job.completed_at,
+        "current_workers": len(assignments) if current_workers is None else current_workers,
+        "assignments": assignments,
+        "estimated_total_seconds": estimate.p50_seconds if estimate else None,
+        "estimated_total_seconds_p90": estimate.p90_seconds if estimate else None,
+        "estimate_samples": estimate.samples if estimate else 0,
+        "total_time_seconds": total_seconds,
+    }
+
+
+def _card_dict(job: Job, current_workers: int, clocked_in_workers: int, total_seconds: float) -> dict:
+    return {
+        "id": job.id,
+        "job_name": job.job_name,
+        "max_workers": job.max_workers,
+        "is_complete": job.is_complete,
+        "is_archived": job.is_archived,
+        "marked_for_review": job.marked_for_review,
+        "completed_at": job.completed_at,
+        "current_workers": current_workers,
+        "clocked_in_workers": clocked_in_workers,
+        "total_time_seconds": total_seconds,
+    }
+
+
+def _build(db: Session, jobs: List[Job], view: str, only_user_id: Optional[int] = None) -> list:
+    """(dict with total_time_seconds = time so far, open clocks) per job"""
+    job_ids = [job.id for job in jobs]
+    if not job_ids:
+        return []
+    closed_seconds, open_clocks, clocked_in = _load_time_parts(db, job_ids)
+    built = []
+    if view == VIEW_CARD:
+        counts = _worker_counts(db, job_ids)
+        clocked_counts = defaultdict(int)
+        for job_id, _user_id in clocked_in:
+            clocked_counts[job_id] += 1
+        for job in jobs:
+            data = _card_dict(job, counts.get(job.id, 0), clocked_counts[job.id], closed_seconds[job.id])
+            built.append((data, open_clocks[job.id]))
+        return built
+
+    assignments = _load_assignments(db, job_ids, clocked_in, only_user_id)
+    counts = _worker_counts(db, job_ids) if only_user_id is not None else {}
+    for job in jobs:
+        data = _job_dict(
+            job, assignments[job.id], closed_seconds[job.id],
+            counts.get(job.id, 0) if only_user_id is not None else None,
+        )
+        built.append((data, open_clocks[job.id]))
+    return built
+
+
+def build_job_responses(db: Session, jobs: List[Job], view: str = VIEW_FULL,
+                        only_user_id: Optional[int] = None) -> List[dict]:
+    """Build job responses with computed fields for a list of jobs
+
+    With only_user_id, each job lists only that user's assignment
+    (current_workers still counts everyone).
+    """
+    now = time.time()
+    items = []
+    for data, open_clocks in _build(db, jobs, view, only_user_id):
+        data["total_time_seconds"] += sum((now - since) * rate for since, rate in open_clocks)
+        items.append(data)
+    return items
+
+
+def encode_job_responses(items: List[dict], view: str = VIEW_FULL) -> bytes:
+    """Validate and serialize job responses to JSON once"""
+    adapter = _adapters[view]
+    return adapter.dump_json(adapter.validate_python(items))
+
+
+class BoardSnapshot:
+    """Pre-serialized open-job board, rebuilt only after a relevant commit.
+
+    Each job is stored per view as JSON bytes up to its total_time_seconds
+    value, plus its time so far and its open clocks as (since, rate) pairs,
+    so serving the board is a byte join with an elapsed-time fix-up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)  # next() is atomic under the GIL
+        self._generation = 0
+        self._built_generation = -1
+        # view -> [(json_prefix, closed_seconds, open_clocks)]
+        self._views = {VIEW_FULL: [], VIEW_CARD: []}
+
+    def invalidate(self, table: str = None) -> None:
+        """Mark the snapshot stale; the next read rebuilds it"""
+        self._generation = next(self._counter)
+
+    def render(self, db: Session, view: str = VIEW_FULL) -> bytes:
+        """Board JSON (open jobs, newest first) as of now"""
+        if self._built_generation != self._generation:
+            with self._lock:
+                if self._built_generation != self._generation:
+                    generation = self._generation
+                    self._views = self._build(db)
+                    # A commit during the build leaves us stale for the next read
+                    self._built_generation = generation
+        return self._encode(self._views[view], time.time())
+
+    def _build(self, db: Session) -> dict:
+        jobs = db.query(Job).filter(Job.is_archived == False).order_by(Job.created_at.desc(), Job.id.desc()).all()
+        views = {}
+        for view, schema in ((VIEW_FULL, JobResponse), (VIEW_CARD, JobCardResponse)):
+            entries = []
+            for data, open_clocks in _build(db, jobs, view):
+                data = schema.model_validate(data).model_dump(mode="json")
+                closed = data.pop("total_time_seconds")
+                prefix = (json.dumps(data)[:-1] + ', "total_time_seconds": ').encode()
+                entries.append((prefix, closed, tuple(open_clocks)))
+            views[view] = entries
+        return views
+
+    @staticmethod
+    def _encode(jobs: list, now: float) -> bytes:
+        parts = []
+        for prefix, closed, open_clocks in jobs:
+            total = closed + sum((now - since) * rate for since, rate in open_clocks)
+            parts.append(prefix + repr(float(total)).encode() + b"}")
+        return b"[" + b", ".join(parts) + b"]"
+
+
+board_snapshot = BoardSnapshot()
+for _table in BOARD_TABLES:
+    bus.subscribe(_table, board_snapshot.invalidate)
+estimates.on_refresh(board_snapshot.invalidate)
@@ -0,0 +1,71 @@
+"""Request coalescing (single-flight) for expensive identical reads
+
+When many tablets ask for the same thing at once, the first request computes
+the response and the others wait for it and share the result instead of
+repeating the work.
+"""
+import threading
+from collections import defaultdict
+
+
+class _Call:
+    """One in-flight computation and the requests waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run fn once per key among concurrent callers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = defaultdict(lambda: {"requests": 0, "computed": 0, "coalesced": 0, "errors": 0})
+
+    def do(self, key: tuple, fn):
+        """Return fn(), sharing the result with identical in-flight calls.
+
+        key[0] names the endpoint for metrics; the rest of the key must cover
+        everything that changes the result (parameters, visibility scope).
+        Results are shared between requests, so they must not be mutated.
+        """
+        with self._lock:
+            stats = self._stats[key[0]]
+            stats["requests"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                stats["computed"] += 1
+            else:
+                stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as exc:
+            call.error = exc
+            with self._lock:
+                stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def metrics(self) -> dict:
+        """Per-endpoint request counts"""
+        with self._lock:
+            return {endpoint: dict(stats) for endpoint, stats in self._stats.items()}
+
+
+flights = SingleFlight()
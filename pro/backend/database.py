@@ -1,13 +1,57 @@
 """Database connection and session management"""
-from sqlalchemy import create_engine
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from config import DATABASE_URL
+from config import (
+    DATABASE_URL, IS_SQLITE, SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE_KB,
+    SQLITE_MMAP_SIZE, SQLITE_BUSY_TIMEOUT_MS
+)
 
-engine = create_engine(DATABASE_URL)
+if IS_SQLITE:
+    # FastAPI runs sync routes in a threadpool, so connections cross threads
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+else:
+    engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# SQLite allows a single writer at a time. Writers queue on this lock inside
+# the process instead of failing with "database is locked".
+sqlite_write_lock = threading.Lock()
+
+
+if IS_SQLITE:
+    # Let SQLAlchemy emit BEGIN itself so writers can use BEGIN IMMEDIATE
+    @event.listens_for(engine, "connect")
+    def _sqlite_on_connect(dbapi_connection, connection_record):
+        """Apply WAL journaling and tuned pragmas to every new connection"""
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _sqlite_on_begin(conn):
+        """Start writer transactions with a RESERVED lock up front"""
+        mode = conn.get_execution_options().get("sqlite_begin", "DEFERRED")
+        conn.exec_driver_sql(f"BEGIN {mode}")
+
+    WriteSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False,
+        bind=engine.execution_options(sqlite_begin="IMMEDIATE")
+    )
+else:
+    WriteSessionLocal = SessionLocal
+
 
 def get_db():
     """Dependency to get database session"""
@@ -16,3 +60,26 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_write_db():
+    """Dependency to get a database session for routes that write.
+
+    On SQLite the session holds the process-wide writer lock and begins with
+    BEGIN IMMEDIATE, so its snapshot can never go stale before it writes.
+    """
+    if not IS_SQLITE:
+        yield from get_db()
+        return
+    with sqlite_write_lock:
+        db = WriteSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+@contextmanager
+def write_session():
+    """get_write_db() for code that runs outside a route's dependencies"""
+    yield from get_write_db()
@@ -0,0 +1,268 @@
+"""Idempotency-Key support for mutation routes
+
+A client that may retry a POST/PUT/PATCH/DELETE sends a unique
+Idempotency-Key header. The first request with a key runs normally and its
+response is stored; a retry with the same key (same caller, method and path)
+gets the stored response back without the route running again. While the
+first request is still running, retries get 409. /api/auth/* is excluded:
+its responses carry tokens, which are never stored.
+
+Responses live in the idempotency_keys table, shared by all workers, for
+IDEMPOTENCY_TTL_HOURS. Each worker also keeps its most recent responses in a
+bounded in-memory cache, so most retries never reach the database.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from jose import JWTError, jwt
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from config import IDEMPOTENCY_TTL_HOURS, IDEMPOTENCY_CACHE_SIZE, SECRET_KEY, ALGORITHM
+from database import SessionLocal, write_session
+from models import IdempotencyKey
+
+HEADER = b"idempotency-key"
+METHODS = ("POST", "PUT", "PATCH", "DELETE")
+# Login/refresh responses hold tokens, which must never be stored
+_EXCLUDED = ("/api/auth/",)
+MAX_KEY_LENGTH = 255
+# Larger responses are not stored (mutations return small JSON bodies)
+MAX_STORED_BODY = 64 * 1024
+# A running request not finished after this long is assumed lost (worker died)
+ABANDONED_AFTER = timedelta(minutes=2)
+# Expired rows are swept after every this many new keys
+PURGE_EVERY = 500
+
+PROCEED = "proceed"
+REPLAY = "replay"
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+
+
+class StoredResponse:
+    def __init__(self, request_hash: str, status_code: int, content_type: Optional[str], body: bytes):
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.content_type = content_type
+        self.body = body
+
+
+class IdempotencyStore:
+    """Stored responses: bounded in-memory LRU in front of the table"""
+
+    def __init__(self, ttl: timedelta, cache_size: int):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # key_hash -> (expires_at monotonic, StoredResponse)
+        self._lock = threading.Lock()
+        self._inserts = 0
+
+    def _cached(self, key_hash: str) -> Optional[StoredResponse]:
+        with self._lock:
+            item = self._cache.get(key_hash)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._cache[key_hash]
+                return None
+            self._cache.move_to_end(key_hash)
+            return item[1]
+
+    def _remember(self, key_hash: str, stored: StoredResponse) -> None:
+        with self._lock:
+            self._cache[key_hash] = (time.monotonic() + self.ttl.total_seconds(), stored)
+            self._cache.move_to_end(key_hash)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def begin(self, key_hash: str, request_hash: str):
+        """Claim a key. Returns (PROCEED|REPLAY|IN_PROGRESS|MISMATCH, stored response)"""
+        stored = self._cached(key_hash)
+        if stored is None:
+            stored = self._load(key_hash)
+        if stored is not None:
+            if stored.request_hash != request_hash:
+                return MISMATCH, None
+            if stored.status_code is None:
+                return IN_PROGRESS, None
+            return REPLAY, stored
+
+        now = datetime.utcnow()
+        try:
+            with write_session() as db:
+                row = db.get(IdempotencyKey, key_hash)
+                if row is not None and row.status_code is None and row.created_at < now - ABANDONED_AFTER:
+                    db.delete(row)
+                    db.flush()
+                elif row is not None:
+                    # Claimed by another worker since _load()
+                    return (MISMATCH, None) if row.request_hash != request_hash else (IN_PROGRESS, None)
+                db.add(IdempotencyKey(key_hash=key_hash, request_hash=request_hash, created_at=now))
+                db.commit()
+        except IntegrityError:
+            return IN_PROGRESS, None
+        self._maybe_purge()
+        return PROCEED, None
+
+    def _load(self, key_hash: str) -> Optional[StoredResponse]:
+        db = SessionLocal()
+        try:
+            row = db.get(IdempotencyKey, key_hash)
+            if row is None or row.created_at < datetime.utcnow() - self.ttl:
+                return None
+            if row.status_code is None and row.created_at < datetime.utcnow() - ABANDONED_AFTER:
+                return None
+            stored = StoredResponse(row.request_hash, row.status_code, row.content_type, row.response_body)
+        finally:
+            db.close()
+        if stored.status_code is not None:
+            self._remember(key_hash, stored)
+        return stored
+
+    def status_of(self, key_hash: str) -> Optional[int]:
+        """Status code stored for a finished request with this key, if any"""
+        stored = self._cached(key_hash) or self._load(key_hash)
+        return stored.status_code if stored is not None else None
+
+    def complete(self, key_hash: str, stored: StoredResponse) -> None:
+        """Store the response of a request that ran"""
+        with write_session() as db:
+            row = db.get(IdempotencyKey, key_hash)
+            if row is None:
+                return
+            row.status_code = stored.status_code
+            row.content_type = stored.content_type
+            row.response_body = stored.body
+            db.commit()
+        self._remember(key_hash, stored)
+
+    def release(self, key_hash: str) -> None:
+        """Forget a key whose request failed, so a retry runs it again"""
+        with write_session() as db:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key_hash == key_hash))
+            db.commit()
+
+    def _maybe_purge(self) -> None:
+        with self._lock:
+            self._inserts += 1
+            if self._inserts % PURGE_EVERY:
+                return
+        with write_session() as db:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < datetime.utcnow() - self.ttl))
+            db.commit()
+
+
+store = IdempotencyStore(timedelta(hours=IDEMPOTENCY_TTL_HOURS), IDEMPOTENCY_CACHE_SIZE)
+
+
+def _caller(headers: dict) -> bytes:
+    """Username ("sub") of a validly signed bearer token, else b""
+
+    Expiry is not checked: a retry with a just-expired token still belongs to
+    the same user (and gets its 401 from the route). Access tokens rotate on
+    refresh, so the header itself cannot scope a key.
+    """
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return b""
+    try:
+        username = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False}).get("sub")
+    except JWTError:
+        return b""
+    return username.encode() if username else b""
+
+
+def hash_key(key: bytes, method: str, path: str, caller: bytes) -> str:
+    """Stored key for an Idempotency-Key sent by caller to method + path"""
+    return hashlib.sha256(b"\n".join((key, method.encode(), path.encode(), caller))).hexdigest()
+
+
+def _json_error(status_code: int, detail: str):
+    body = ('{"detail": "%s"}' % detail).encode()
+    return status_code, b"application/json", body
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware applying Idempotency-Key to every mutation request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METHODS or scope["path"].startswith(_EXCLUDED):
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        key = headers.get(HEADER)
+        if key is None:
+            return await self.app(scope, receive, send)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return await self._respond(send, *_json_error(400, "Invalid Idempotency-Key"))
+
+        # Buffer the body: it is hashed here and replayed to the route
+        messages, chunks = [], []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+
+        # Keys are scoped to the caller (the token's user) and the route
+        key_hash = hash_key(key, scope["method"], scope["path"], _caller(headers))
+        request_hash = hashlib.sha256(b"".join(chunks)).hexdigest()
+
+        outcome, stored = await run_in_threadpool(store.begin, key_hash, request_hash)
+        if outcome == REPLAY:
+            return await self._respond(send, stored.status_code,
+                                       (stored.content_type or "application/json").encode(),
+                                       stored.body or b"", replayed=True)
+        if outcome == IN_PROGRESS:
+            return await self._respond(send, *_json_error(409, "A request with this Idempotency-Key is in progress"))
+        if outcome == MISMATCH:
+            return await self._respond(send, *_json_error(422, "Idempotency-Key was used for a different request"))
+
+        pending = list(messages)
+
+        async def replay_receive():
+            return pending.pop(0) if pending else await receive()
+
+        response = {"status": 500, "content_type": None, "body": []}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["content_type"] = dict(message.get("headers", [])).get(b"content-type")
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            await run_in_threadpool(store.release, key_hash)
+            raise
+
+        body = b"".join(response["body"])
+        if response["status"] >= 500 or len(body) > MAX_STORED_BODY:
+            await run_in_threadpool(store.release, key_hash)
+        else:
+            content_type = response["content_type"].decode() if response["content_type"] else None
+            await run_in_threadpool(store.complete, key_hash, StoredResponse(
+                request_hash, response["status"], content_type, body
+            ))
+
+    @staticmethod
+    async def _respond(send, status_code: int, content_type: bytes, body: bytes, replayed: bool = False):
+        headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode())]
+        if replayed:
+            headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
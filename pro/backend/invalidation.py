@@ -0,0 +1,174 @@
+"""Cross-process cache invalidation
+
+Every committed session publishes the names of the tables it wrote. Caches
+subscribe to those table names and drop or rebuild their state. With
+PostgreSQL the events also go out over LISTEN/NOTIFY so every uvicorn worker
+process hears about writes made by the others; with SQLite (single worker)
+delivery is in-process only.
+"""
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+from collections import defaultdict
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from database import engine
+
+logger = logging.getLogger("honeybadger.invalidation")
+
+PG_CHANNEL = "honeybadger_invalidate"
+
+
+class LocalBus:
+    """In-process invalidation bus"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, table: str, callback) -> None:
+        """Call callback(table) after any commit that wrote to table"""
+        with self._lock:
+            self._subscribers[table].append(callback)
+
+    def publish(self, tables) -> None:
+        """Announce that tables changed"""
+        self._deliver(tables)
+
+    def _deliver(self, tables) -> None:
+        for table in tables:
+            for callback in list(self._subscribers.get(table, ())):
+                try:
+                    callback(table)
+                except Exception:
+                    logger.exception("Invalidation callback failed for %s", table)
+
+    def start(self) -> None:
+        """Begin receiving remote events (no-op in-process)"""
+
+    def stop(self) -> None:
+        """Stop receiving remote events (no-op in-process)"""
+
+
+class PostgresBus(LocalBus):
+    """Invalidation bus fanned out to other workers with LISTEN/NOTIFY"""
+
+    def __init__(self):
+        super().__init__()
+        self._origin = self._new_origin()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    @staticmethod
+    def _new_origin() -> str:
+        """Tag for our own notifications, which we have already delivered"""
+        return f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def publish(self, tables) -> None:
+        tables = sorted(tables)
+        self._deliver(tables)
+        payload = json.dumps({"o": self._origin, "t": tables})
+        try:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                             {"channel": PG_CHANNEL, "payload": payload})
+        except Exception:
+            # Other workers fall back to their cache TTLs
+            logger.exception("Failed to publish invalidation for %s", tables)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._origin = self._new_origin()  # workers fork after import
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._listen_forever, name="invalidation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _listen_forever(self) -> None:
+        backoff = 1
+        while not self._stopping.is_set():
+            try:
+                self._listen()
+                backoff = 1
+            except Exception:
+                logger.exception("Invalidation listener lost its connection; retrying in %ss", backoff)
+                # Anything may have changed while we were not listening
+                self._deliver(list(self._subscribers))
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _listen(self) -> None:
+        # A dedicated connection outside the pool, held for the worker's lifetime
+        fairy = engine.raw_connection()
+        fairy.detach()
+        conn = fairy.dbapi_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {PG_CHANNEL}")
+            while not self._stopping.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self._on_notify(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+    def _on_notify(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("o") != self._origin:
+            self._deliver(message.get("t", []))
+
+
+bus = PostgresBus() if engine.dialect.name == "postgresql" else LocalBus()
+
+
+# ==================== SESSION HOOKS ====================
+
+def _written_tables(session: Session) -> set:
+    return session.info.setdefault("written_tables", set())
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    tables = _written_tables(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            tables.add(table)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_execute(orm_execute_state):
+    # Bulk insert()/update()/delete() statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _written_tables(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_commit(session):
+    tables = session.info.pop("written_tables", None)
+    if tables:
+        bus.publish(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rollback(session):
+    session.info.pop("written_tables", None)
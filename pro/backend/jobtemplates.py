@@ -0,0 +1,128 @@
+"""Cloning jobs from templates and archived jobs
+
+A clone of N jobs is two statements however large N is: one INSERT ...
+SELECT that copies the source row N times (the copies come from a recursive
+CTE counting to N) and one INSERT ... SELECT that assigns the crew to every
+new job, both returning only the new ids. Nothing is loaded into the ORM,
+so the audit events are recorded by hand.
+"""
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, literal, select, true
+from sqlalchemy.orm import Session
+
+from models import Job, JobAssignment, JobTemplate, JobTemplateMember, User
+import audit
+
+# Columns copied from the source (a template and a job share these names)
+CLONED_COLUMNS = ("job_name", "description", "requirements", "max_workers", "auto_review")
+
+
+def _copies(count: int):
+    """CTE with the rows n = 1..count"""
+    copies = select(literal(1).label("n")).cte("copies", recursive=True)
+    return copies.union_all(select(copies.c.n + 1).where(copies.c.n < count))
+
+
+def require_users(db: Session, user_ids, active_only: bool = False) -> None:
+    """400 naming any of user_ids that doesn't exist (or isn't active)"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    query = db.query(User.id).filter(User.id.in_(user_ids))
+    if active_only:
+        query = query.filter(User.is_active == True)
+    missing = user_ids - {user_id for (user_id,) in query}
+    if missing:
+        kind = "Unknown or inactive" if active_only else "Unknown"
+        raise HTTPException(status_code=400, detail=f"{kind} user(s): {sorted(missing)}")
+
+
+def require_crew_fits(crew_size: int, max_workers: int) -> None:
+    """400 if a crew is larger than max_workers, which joining would refuse too"""
+    if crew_size > max_workers:
+        raise HTTPException(status_code=400,
+                            detail=f"Crew of {crew_size} is more than max_workers ({max_workers})")
+
+
+def _crew(db: Session, user_ids: Optional[List[int]], default_crew):
+    """Select of the user ids to assign: user_ids, else default_crew's active users"""
+    if user_ids is None:
+        crew = default_crew.subquery("default_crew")
+        return select(crew.c.user_id).join(User, User.id == crew.c.user_id).where(User.is_active == True)
+    require_users(db, user_ids, active_only=True)
+    return select(User.id.label("user_id")).where(User.id.in_(user_ids))
+
+
+def clone_jobs(db: Session, source, count: int, created_by: int, default_crew,
+               user_ids: Optional[List[int]] = None, job_name: Optional[str] = None) -> dict:
+    """Insert count copies of source (a template or job select) and assign the crew
+
+    source selects CLONED_COLUMNS from exactly one row; default_crew selects
+    user_id (inactive users are left out). Explicit user_ids must all be
+    active users, and the crew may not be larger than the source's
+    max_workers. Returns {"job_ids": [...], "assigned": n}; the caller commits.
+    """
+    crew = _crew(db, user_ids, default_crew).subquery("crew")
+    source = source.subquery("source")
+    crew_size = db.execute(select(func.count()).select_from(crew)).scalar()
+    max_workers = db.execute(select(source.c.max_workers)).scalar()
+    if max_workers is not None:
+        require_crew_fits(crew_size, max_workers)
+    copies = _copies(count)
+    columns = [source.c[name] for name in CLONED_COLUMNS]
+    if job_name is not None:
+        columns[0] = literal(job_name).label("job_name")
+    job_ids = db.execute(
+        insert(Job)
+        .from_select(
+            list(CLONED_COLUMNS) + ["created_by"],
+            select(*columns, literal(created_by)).select_from(source).join(copies, true())
+        )
+        .returning(Job.id)
+    ).scalars().all()
+    if not job_ids:
+        return {"job_ids": [], "assigned": 0}
+
+    assignments = db.execute(
+        insert(JobAssignment)
+        .from_select(
+            ["job_id", "user_id", "assigned_by"],
+            select(Job.id, crew.c.user_id, literal(created_by))
+            .select_from(Job).join(crew, true())
+            .where(Job.id.in_(job_ids))
+        )
+        .returning(JobAssignment.id, JobAssignment.job_id, JobAssignment.user_id)
+    ).all()
+
+    after = db.execute(select(*columns).select_from(source)).mappings().first()
+    for job_id in job_ids:
+        audit.record(db, "job.create", "jobs", job_id, job_id, None, None, {**after, "created_by": created_by})
+    for assignment_id, job_id, user_id in assignments:
+        audit.record(db, "job.assign", "job_assignments", assignment_id, job_id, user_id, None,
+                     {"job_id": job_id, "user_id": user_id, "assigned_by": created_by})
+    return {"job_ids": sorted(job_ids), "assigned": len(assignments)}
+
+
+def clone_template(db: Session, template_id: int, count: int, created_by: int,
+                   user_ids: Optional[List[int]] = None, job_name: Optional[str] = None) -> dict:
+    """count jobs from a template, assigned to its crew unless user_ids is given"""
+    if db.query(JobTemplate.id).filter(JobTemplate.id == template_id).first() is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    source = select(*[getattr(JobTemplate, name) for name in CLONED_COLUMNS]).where(JobTemplate.id == template_id)
+    crew = select(JobTemplateMember.user_id).where(JobTemplateMember.template_id == template_id)
+    return clone_jobs(db, source, count, created_by, crew, user_ids, job_name)
+
+
+def clone_job(db: Session, job_id: int, count: int, created_by: int,
+              user_ids: Optional[List[int]] = None, job_name: Optional[str] = None) -> dict:
+    """count copies of an archived job, assigned to its crew unless user_ids is given"""
+    is_archived = db.query(Job.is_archived).filter(Job.id == job_id).scalar()
+    if is_archived is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not is_archived:
+        raise HTTPException(status_code=400, detail="Only archived jobs can be cloned")
+    source = select(*[getattr(Job, name) for name in CLONED_COLUMNS]).where(Job.id == job_id)
+    crew = select(JobAssignment.user_id).where(JobAssignment.job_id == job_id).distinct()
+    return clone_jobs(db, source, count, created_by, crew, user_ids, job_name)
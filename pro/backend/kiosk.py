@@ -0,0 +1,219 @@
+"""Kiosk clock terminal: badge/PIN punches without a password login
+
+A badge code or PIN is stored as an HMAC-SHA256 keyed with KIOSK_SECRET, so
+checking a scan is one HMAC and a dict lookup instead of a bcrypt round. The
+directory of credential -> user and their open assigned jobs is kept in
+memory and rebuilt after any commit to users, jobs or job_assignments.
+
+A punch toggles the user's clock on one job inside a single write
+transaction: clock out if an entry is open, otherwise clock in.
+"""
+import hashlib
+import hmac
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+
+from fastapi import Header, HTTPException, status
+from sqlalchemy.orm import Session
+
+from config import KIOSK_KEY, KIOSK_SECRET, KIOSK_MAX_FAILURES_PER_MINUTE
+from database import SessionLocal, write_session
+from invalidation import bus
+from models import User, Job, JobAssignment, OpenClock
+import audit
+import ledger
+
+DIRECTORY_TABLES = ("users", "jobs", "job_assignments")
+MIN_CREDENTIAL_LENGTH = 4
+
+CLOCK_IN = "clock_in"
+CLOCK_OUT = "clock_out"
+
+
+class KioskUser(NamedTuple):
+    user_id: int
+    username: str
+    initials: str
+    jobs: Dict[int, str]  # open jobs the user is assigned to: id -> name
+
+
+def credential_hash(credential: str) -> str:
+    """HMAC of a badge code or PIN, as stored in users.kiosk_credential_hash"""
+    return hmac.new(KIOSK_SECRET.encode(), credential.strip().encode(), hashlib.sha256).hexdigest()
+
+
+class KioskDirectory:
+    """In-memory credential -> KioskUser map, rebuilt only after relevant commits"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._generation = 0
+        self._built_generation = -1
+        self._users = {}
+
+    def invalidate(self, table: str = None) -> None:
+        self._generation = next(self._counter)
+
+    def lookup(self, credential: str) -> Optional[KioskUser]:
+        if self._built_generation != self._generation:
+            with self._lock:
+                if self._built_generation != self._generation:
+                    generation = self._generation
+                    self._users = self._build()
+                    self._built_generation = generation
+        return self._users.get(credential_hash(credential))
+
+    @staticmethod
+    def _build() -> dict:
+        db = SessionLocal()
+        try:
+            users = db.query(User.id, User.username, User.initials, User.kiosk_credential_hash).filter(
+                User.kiosk_credential_hash.isnot(None),
+                User.is_active == True
+            ).all()
+            jobs = {user_id: {} for user_id, _, _, _ in users}
+            assignments = db.query(JobAssignment.user_id, Job.id, Job.job_name).join(
+                Job, Job.id == JobAssignment.job_id
+            ).filter(
+                Job.is_archived == False,
+                Job.is_complete == False
+            ).all()
+        finally:
+            db.close()
+        for user_id, job_id, job_name in assignments:
+            if user_id in jobs:
+                jobs[user_id][job_id] = job_name
+        return {
+            key: KioskUser(user_id, username, initials, jobs[user_id])
+            for user_id, username, initials, key in users
+        }
+
+
+directory = KioskDirectory()
+for _table in DIRECTORY_TABLES:
+    bus.subscribe(_table, directory.invalidate)
+
+
+# Failed scans in the last minute per kiosk (client address), to slow PIN
+# guessing without one terminal's typos locking out the others
+_failures: "OrderedDict[str, deque]" = OrderedDict()
+_failures_lock = threading.Lock()
+MAX_TRACKED_KIOSKS = 1000  # least recently failing dropped past this
+
+
+def _note_failure(kiosk_id: str) -> None:
+    with _failures_lock:
+        failures = _failures.get(kiosk_id)
+        if failures is None:
+            failures = _failures[kiosk_id] = deque()
+            if len(_failures) > MAX_TRACKED_KIOSKS:
+                _failures.popitem(last=False)
+        else:
+            _failures.move_to_end(kiosk_id)
+        failures.append(time.monotonic())
+
+
+def _too_many_failures(kiosk_id: str) -> bool:
+    cutoff = time.monotonic() - 60
+    with _failures_lock:
+        failures = _failures.get(kiosk_id)
+        if failures is None:
+            return False
+        while failures and failures[0] < cutoff:
+            failures.popleft()
+        if not failures:
+            del _failures[kiosk_id]
+            return False
+        return len(failures) >= KIOSK_MAX_FAILURES_PER_MINUTE
+
+
+def require_kiosk(x_kiosk_key: Optional[str] = Header(None)) -> None:
+    """Dependency: the request comes from a configured kiosk"""
+    if not KIOSK_KEY:
+        raise HTTPException(status_code=404, detail="Kiosk mode is not enabled")
+    if not x_kiosk_key or not hmac.compare_digest(x_kiosk_key, KIOSK_KEY):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unknown kiosk")
+
+
+def identify(credential: str, kiosk_id: str) -> KioskUser:
+    """The user a badge/PIN belongs to"""
+    if _too_many_failures(kiosk_id):
+        raise HTTPException(status_code=429, detail="Too many failed scans, wait a minute")
+    user = directory.lookup(credential) if len(credential.strip()) >= MIN_CREDENTIAL_LENGTH else None
+    if user is None:
+        _note_failure(kiosk_id)
+        raise HTTPException(status_code=401, detail="Badge or PIN not recognized")
+    return user
+
+
+def open_clocks(db: Session, user_id: int) -> set:
+    """Job ids the user is clocked in to (open_clocks projection)"""
+    return {job_id for (job_id,) in db.query(OpenClock.job_id).filter(OpenClock.user_id == user_id).all()}
+
+
+def toggle(db: Session, user: KioskUser, job_id: int) -> dict:
+    """Clock in or out of one job in a single transaction (commits)"""
+    audit.set_actor(db, user.user_id, audit.SOURCE_KIOSK)
+    # Locks the assignment row on PostgreSQL so two scans can't both clock in
+    assignment = db.query(JobAssignment.id).filter(
+        JobAssignment.job_id == job_id,
+        JobAssignment.user_id == user.user_id
+    ).with_for_update().first()
+    if assignment is None:
+        raise HTTPException(status_code=400, detail="Not assigned to this job")
+    # The kiosk's job list is cached; the job may have closed since
+    job = db.query(Job.is_complete, Job.is_archived).filter(Job.id == job_id).with_for_update().first()
+    if job is None or job.is_complete or job.is_archived:
+        raise HTTPException(status_code=400, detail="Job is already complete")
+
+    now = datetime.utcnow()
+    entry = ledger.open_entry(db, job_id, user.user_id)
+    if entry is not None:
+        ledger.clock_out(db, entry, now)
+        action = CLOCK_OUT
+    else:
+        ledger.clock_in(db, user.user_id, job_id, now)
+        action = CLOCK_IN
+    db.commit()
+    return {"action": action, "at": now}
+
+
+def punch(db: Session, credential: str, job_id: Optional[int] = None, kiosk_id: str = "") -> dict:
+    """Handle one scan: toggle the clock on job_id, or on the user's only open job
+
+    db is a read session, enough to list the jobs to choose from; only the
+    toggle itself opens a write transaction.
+    """
+    user = identify(credential, kiosk_id)
+    if job_id is None:
+        if len(user.jobs) == 1:
+            job_id = next(iter(user.jobs))
+        else:
+            clocked_in = open_clocks(db, user.user_id)
+            return {
+                "status": "choose_job",
+                "username": user.username,
+                "initials": user.initials,
+                "jobs": [
+                    {"id": jid, "job_name": name, "is_clocked_in": jid in clocked_in}
+                    for jid, name in sorted(user.jobs.items())
+                ],
+            }
+    elif job_id not in user.jobs:
+        raise HTTPException(status_code=400, detail="Not assigned to this open job")
+
+    with write_session() as write_db:
+        result = toggle(write_db, user, job_id)
+    return {
+        "status": result["action"],
+        "username": user.username,
+        "initials": user.initials,
+        "job_id": job_id,
+        "job_name": user.jobs[job_id],
+        "at": result["at"],
+    }
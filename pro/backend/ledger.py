@@ -0,0 +1,343 @@
+"""Time clock ledger and the projections folded from it
+
+Clock actions are appended to clock_events and never changed. Every event
+carries the entry's times after it, so an entry's current state is simply
+its latest event, and fixing history is one more event, not an edit:
+
+  clock_in   entry opened
+  clock_out  entry closed
+  correct    entry's times replaced (e.g. an admin fixing a forgotten clock-out)
+  void       entry removed (wrong job, job deleted)
+
+The transaction that appends an event also applies it to the projections the
+rest of the app reads:
+
+  time_entries      the entry itself
+  open_clocks       one row per open clock ("who is clocked in where")
+  job_time_totals   closed seconds and entry count per job
+  user_daily_hours  closed seconds per user per SHOP_TIMEZONE day (raw:
+                    overlapping clocks count twice; payroll merges them)
+
+rebuild_projections() drops the last three and replays the ledger: the
+latest event of every entry, streamed, folded into totals in memory and
+written back in bulk. Changing SHOP_TIMEZONE needs a rebuild.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from config import SHOP_TIMEZONE
+from database import SessionLocal, write_session
+from models import ClockEvent, JobTimeTotal, OpenClock, ProjectionState, TimeEntry, UserDailyHours
+
+logger = logging.getLogger("honeybadger.ledger")
+
+CLOCK_IN = "clock_in"
+CLOCK_OUT = "clock_out"
+CORRECT = "correct"
+VOID = "void"
+
+PROJECTION = "clock"  # projection_state row
+REPLAY_BATCH = 10000
+
+_tz = ZoneInfo(SHOP_TIMEZONE)
+
+# (clock_in, clock_out) of an entry, naive UTC; clock_out None while open
+Times = Tuple[datetime, Optional[datetime]]
+
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def day_seconds(clock_in: datetime, clock_out: datetime) -> List[Tuple[date, float]]:
+    """Seconds of [clock_in, clock_out) (naive UTC) falling on each shop-local day"""
+    start, end = _timestamp(clock_in), _timestamp(clock_out)
+    if end <= start:
+        return []
+    day = datetime.fromtimestamp(start, _tz).date()
+    split = []
+    while True:
+        midnight = datetime.combine(day + timedelta(days=1), dt_time(), _tz).timestamp()
+        if end <= midnight:
+            split.append((day, end - start))
+            return split
+        split.append((day, midnight - start))
+        start, day = midnight, day + timedelta(days=1)
+
+
+# ==================== PROJECTIONS ====================
+
+def _add(db: Session, model, keys: Tuple[str, ...], rows: List[dict]) -> None:
+    """INSERT ... ON CONFLICT DO UPDATE adding each row's other columns to a projection row
+
+    One statement for all rows; each key may appear only once in rows.
+    """
+    if not rows:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(model)
+    amounts = [column for column in rows[0] if column not in keys]
+    db.execute(statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: getattr(model, column) + statement.excluded[column] for column in amounts},
+    ), rows)
+
+
+def _project(db: Session, entry_id: int, user_id: int, job_id: int, times: Times, sign: int) -> None:
+    """Add (sign=1) or take back (sign=-1) one entry state's share of the projections"""
+    clock_in, clock_out = times
+    if clock_out is None:
+        if sign > 0:
+            db.execute(insert(OpenClock).values(user_id=user_id, job_id=job_id, entry_id=entry_id, clock_in=clock_in))
+        else:
+            db.execute(delete(OpenClock).where(OpenClock.entry_id == entry_id))
+        return
+    seconds = max(0.0, (clock_out - clock_in).total_seconds())
+    _add(db, JobTimeTotal, ("job_id",), [{"job_id": job_id, "closed_seconds": sign * seconds, "closed_entries": sign}])
+    _add(db, UserDailyHours, ("user_id", "day"), [
+        {"user_id": user_id, "day": day, "seconds": sign * day_total}
+        for day, day_total in day_seconds(clock_in, clock_out)
+    ])
+
+
+def _append(db: Session, kind: str, entry: TimeEntry, old: Optional[Times], new: Optional[Times],
+            actor_id: Optional[int] = None, reason: Optional[str] = None) -> None:
+    """Record an event and move the projections from the old to the new entry state"""
+    times = new if new is not None else old
+    db.add(ClockEvent(
+        kind=kind, entry_id=entry.id, user_id=entry.user_id, job_id=entry.job_id,
+        clock_in=times[0], clock_out=times[1],
+        recorded_at=datetime.utcnow(), recorded_by=actor_id, reason=reason,
+    ))
+    if old is not None:
+        _project(db, entry.id, entry.user_id, entry.job_id, old, -1)
+    if new is not None:
+        _project(db, entry.id, entry.user_id, entry.job_id, new, 1)
+
+
+def _times(entry: TimeEntry) -> Times:
+    return _naive(entry.clock_in), _naive(entry.clock_out)
+
+
+# ==================== CLOCK ACTIONS ====================
+# Each stages its changes on the session; the caller commits
+
+def clock_in(db: Session, user_id: int, job_id: int, at: Optional[datetime] = None) -> TimeEntry:
+    """Open a new entry (at defaults to now)"""
+    at = _naive(at) if at is not None else datetime.utcnow()
+    entry = TimeEntry(user_id=user_id, job_id=job_id, clock_in=at)
+    db.add(entry)
+    db.flush()  # assigns entry.id
+    _append(db, CLOCK_IN, entry, None, (at, None))
+    return entry
+
+
+def clock_out(db: Session, entry: TimeEntry, at: Optional[datetime] = None) -> TimeEntry:
+    """Close an open entry (at defaults to now; never before it started)"""
+    old = _times(entry)
+    at = _naive(at) if at is not None else datetime.utcnow()
+    entry.clock_out = max(at, old[0])
+    _append(db, CLOCK_OUT, entry, old, (old[0], entry.clock_out))
+    return entry
+
+
+def close_many(db: Session, closures: List[Tuple[int, int, int, datetime, datetime]],
+               reason: Optional[str] = None) -> None:
+    """Clock out many open entries at once: (entry_id, user_id, job_id, clock_in, clock_out)
+
+    Set-based: one bulk statement per table, with the projection changes
+    summed per job and per user-day first, instead of a round trip per entry.
+    """
+    if not closures:
+        return
+    recorded_at = datetime.utcnow()
+    job_totals = defaultdict(lambda: [0.0, 0])
+    daily = defaultdict(float)
+    for _entry_id, user_id, job_id, clock_in, clock_out in closures:
+        job_totals[job_id][0] += max(0.0, (clock_out - clock_in).total_seconds())
+        job_totals[job_id][1] += 1
+        for day, seconds in day_seconds(clock_in, clock_out):
+            daily[(user_id, day)] += seconds
+
+    db.execute(update(TimeEntry), [
+        {"id": entry_id, "clock_out": clock_out} for entry_id, _, _, _, clock_out in closures
+    ])
+    db.execute(insert(ClockEvent), [
+        {"kind": CLOCK_OUT, "entry_id": entry_id, "user_id": user_id, "job_id": job_id,
+         "clock_in": clock_in, "clock_out": clock_out, "recorded_at": recorded_at, "reason": reason}
+        for entry_id, user_id, job_id, clock_in, clock_out in closures
+    ])
+    db.execute(delete(OpenClock).where(OpenClock.entry_id.in_([closure[0] for closure in closures])))
+    _add(db, JobTimeTotal, ("job_id",), [
+        {"job_id": job_id, "closed_seconds": seconds, "closed_entries": count}
+        for job_id, (seconds, count) in job_totals.items()
+    ])
+    _add(db, UserDailyHours, ("user_id", "day"), [
+        {"user_id": user_id, "day": day, "seconds": seconds} for (user_id, day), seconds in daily.items()
+    ])
+
+
+def correct(db: Session, entry: TimeEntry, new_clock_in: Optional[datetime], new_clock_out: Optional[datetime],
+            actor_id: Optional[int], reason: Optional[str] = None) -> TimeEntry:
+    """Replace an entry's times; None keeps the current value (an open entry stays open)"""
+    old = _times(entry)
+    new = (
+        _naive(new_clock_in) if new_clock_in is not None else old[0],
+        _naive(new_clock_out) if new_clock_out is not None else old[1],
+    )
+    if new[1] is not None and new[1] < new[0]:
+        raise HTTPException(status_code=400, detail="clock_out must not be before clock_in")
+    entry.clock_in, entry.clock_out = new
+    _append(db, CORRECT, entry, old, new, actor_id, reason)
+    return entry
+
+
+def void(db: Session, entry: TimeEntry, actor_id: Optional[int], reason: Optional[str] = None) -> None:
+    """Remove an entry from every projection (the ledger keeps its history)"""
+    _append(db, VOID, entry, _times(entry), None, actor_id, reason)
+    db.delete(entry)
+
+
+def void_job(db: Session, job_id: int, actor_id: Optional[int], reason: str = "Job deleted") -> int:
+    """Void every entry of a job before the job is deleted"""
+    entries = db.query(TimeEntry).filter(TimeEntry.job_id == job_id).all()
+    for entry in entries:
+        void(db, entry, actor_id, reason)
+    return len(entries)
+
+
+def open_entry(db: Session, job_id: int, user_id: int) -> Optional[TimeEntry]:
+    """The user's open entry on a job, found through open_clocks"""
+    return db.query(TimeEntry).join(OpenClock, OpenClock.entry_id == TimeEntry.id).filter(
+        OpenClock.user_id == user_id,
+        OpenClock.job_id == job_id
+    ).first()
+
+
+def entry_history(db: Session, entry_id: int) -> List[ClockEvent]:
+    return db.query(ClockEvent).filter(ClockEvent.entry_id == entry_id).order_by(ClockEvent.id).all()
+
+
+# ==================== REBUILD ====================
+
+def _lock_ledger(db: Session) -> None:
+    """Keep clock actions out while projections are rebuilt
+
+    SQLite: write_session() already holds the only writer lock. PostgreSQL:
+    appends wait on this lock; reads of the projections carry on.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE clock_events IN EXCLUSIVE MODE"))
+
+
+def rebuild_projections(db: Session, progress=None) -> dict:
+    """Replace the projections with a replay of the ledger (commits)
+
+    Run inside write_session(). progress(fraction) is called as entries are
+    folded, if given.
+    """
+    _lock_ledger(db)
+    last_event_id = db.query(func.max(ClockEvent.id)).scalar()
+    total_entries = db.query(func.count(func.distinct(ClockEvent.entry_id))).scalar() or 0
+    latest = select(func.max(ClockEvent.id)).group_by(ClockEvent.entry_id)
+    rows = (
+        db.query(ClockEvent.kind, ClockEvent.entry_id, ClockEvent.user_id, ClockEvent.job_id,
+                 ClockEvent.clock_in, ClockEvent.clock_out)
+        .filter(ClockEvent.id.in_(latest))
+        .yield_per(REPLAY_BATCH)
+    )
+
+    open_clocks = []
+    job_seconds = defaultdict(float)
+    job_entries = defaultdict(int)
+    daily = defaultdict(float)
+    folded = 0
+    for kind, entry_id, user_id, job_id, clock_in, clock_out in rows:
+        folded += 1
+        if progress is not None and folded % REPLAY_BATCH == 0:
+            progress(folded / total_entries)
+        if kind == VOID:
+            continue
+        clock_in, clock_out = _naive(clock_in), _naive(clock_out)
+        if clock_out is None:
+            open_clocks.append({"user_id": user_id, "job_id": job_id, "entry_id": entry_id, "clock_in": clock_in})
+            continue
+        job_seconds[job_id] += max(0.0, (clock_out - clock_in).total_seconds())
+        job_entries[job_id] += 1
+        for day, seconds in day_seconds(clock_in, clock_out):
+            daily[(user_id, day)] += seconds
+
+    db.execute(delete(OpenClock))
+    db.execute(delete(JobTimeTotal))
+    db.execute(delete(UserDailyHours))
+    if open_clocks:
+        db.execute(insert(OpenClock), open_clocks)
+    if job_seconds:
+        db.execute(insert(JobTimeTotal), [
+            {"job_id": job_id, "closed_seconds": seconds, "closed_entries": job_entries[job_id]}
+            for job_id, seconds in job_seconds.items()
+        ])
+    if daily:
+        db.execute(insert(UserDailyHours), [
+            {"user_id": user_id, "day": day, "seconds": seconds} for (user_id, day), seconds in daily.items()
+        ])
+
+    state = db.get(ProjectionState, PROJECTION)
+    if state is None:
+        state = ProjectionState(name=PROJECTION)
+        db.add(state)
+    state.rebuilt_at = datetime.utcnow()
+    state.last_event_id = last_event_id
+    db.commit()
+    return {
+        "entries": folded,
+        "open_clocks": len(open_clocks),
+        "jobs": len(job_seconds),
+        "user_days": len(daily),
+        "last_event_id": last_event_id,
+    }
+
+
+def ensure_projections() -> None:
+    """Rebuild at startup if the projections were never built (e.g. just migrated)"""
+    db = SessionLocal()
+    try:
+        state = db.get(ProjectionState, PROJECTION)
+        if state is not None and state.rebuilt_at is not None:
+            return
+    finally:
+        db.close()
+    with write_session() as db:
+        _lock_ledger(db)
+        state = db.get(ProjectionState, PROJECTION)
+        if state is not None and state.rebuilt_at is not None:
+            return  # another worker got there first
+        logger.info("Building clock projections from the ledger: %s", rebuild_projections(db))
+
+
+# ==================== READS ====================
+
+def daily_hours(db: Session, first_day: date, last_day: date, user_id: Optional[int] = None) -> list:
+    """Closed seconds per user per local day, from the projection"""
+    query = db.query(UserDailyHours.user_id, UserDailyHours.day, UserDailyHours.seconds).filter(
+        UserDailyHours.day >= first_day,
+        UserDailyHours.day <= last_day,
+        UserDailyHours.seconds > 0.5  # rows corrections took back to (about) zero
+    )
+    if user_id is not None:
+        query = query.filter(UserDailyHours.user_id == user_id)
+    return query.order_by(UserDailyHours.user_id, UserDailyHours.day).all()
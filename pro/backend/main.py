@@ -1,31 +1,89 @@
 """HoneyBadger Pro - Main FastAPI Application"""
-from fastapi import FastAPI, Depends, HTTPException, status
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session, defer, selectinload
 from sqlalchemy import func
-from datetime import datetime, timedelta
-from typing import List
+from datetime import date, datetime, timedelta
+from typing import List, Literal, Optional, Union
+import json
 import os
 
-from database import engine, get_db, Base
-from models import User, Job, JobAssignment, TimeEntry
+from database import engine, get_db, get_write_db, write_session
+from models import (
+    User, Job, JobAssignment, JobTemplate, JobTemplateMember, TimeEntry, UserSession, BackgroundTask,
+    OpenClock, JobTimeTotal
+)
 from schemas import (
-    UserCreate, UserLogin, UserResponse, Token,
-    JobCreate, JobUpdate, JobResponse, JobAssignmentResponse, TimeEntryResponse,
-    ClockIn, ClockOut, ActiveClockResponse
+    UserCreate, UserLogin, UserResponse, UserImportResponse, Token, RefreshRequest,
+    JobCreate, JobUpdate, JobResponse, JobCardResponse, JobAssignmentResponse, TimeEntryResponse,
+    JobTemplateCreate, JobTemplateUpdate, JobTemplateResponse, JobClone, JobCloneResponse,
+    ClockIn, ClockOut, ActiveClockResponse, EntryCorrection, FlaggedEntryResponse, ClockEventResponse,
+    DashboardResponse,
+    SyncRequest, SyncResponse, KioskPunch, KioskPunchResponse, KioskCredential,
+    OverlapReport, DurationReport, UserDailyHoursReport, PayrollReport, TaskCreate, TaskResponse, AuditEventResponse
 )
+from analytics import estimates
+from audit import audit_log, get_audited_db
 from auth import (
-    get_password_hash, verify_password, create_access_token,
-    get_current_active_user, require_admin
+    get_password_hash_async, verify_password_async, create_access_token, lookup_user,
+    oauth2_scheme, token_session_id, get_current_user, get_current_active_user, require_admin
+)
+from board import (
+    board_snapshot, build_job_responses, encode_job_responses, job_query,
+    JobView, VIEW_FULL
 )
-from config import ROLE_ADMIN, ROLE_BASIC
+from coalesce import flights
+from config import ROLE_ADMIN, ROLE_BASIC, HOST, PORT, ACCESS_TOKEN_EXPIRE_MINUTES, PAYROLL_MAX_DAYS
+from idempotency import IdempotencyMiddleware
+from ratelimit import RateLimitMiddleware, limiter
+from invalidation import bus
+from schema import check_schema
+from sessions import open_session, rotate_session, revoke_session
+from sweeper import sweeper
+import audit
+import jobtemplates
+import kiosk
+import ledger
+import overlap
+import payroll
+import search
+import sync
+import tasks
+import timeclock
+import userimport
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks"""
+    # Only compares the stored Alembic revision; no table reflection
+    check_schema(engine)
+    ledger.ensure_projections()
+    bus.start()
+    audit_log.start()
+    estimates.start()
+    tasks.runner.start()
+    sweeper.start()
+    yield
+    sweeper.stop()
+    tasks.runner.stop()
+    estimates.stop()
+    audit_log.stop()
+    bus.stop()
+
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+app = FastAPI(title="HoneyBadger Pro", version="1.0.0", lifespan=lifespan)
 
-app = FastAPI(title="HoneyBadger Pro", version="1.0.0")
+# Retried mutations with an Idempotency-Key get the stored response
+app.add_middleware(IdempotencyMiddleware)
+
+# Per-client rate limits and load shedding, before any other work
+app.add_middleware(RateLimitMiddleware)
 
 # CORS - allow all origins for local network use
 app.add_middleware(
@@ -42,6 +100,16 @@ if os.path.exists(frontend_path):
     app.mount("/static", StaticFiles(directory=frontend_path), name="static")
 
 
+@app.get("/sw.js")
+async def service_worker():
+    """Service worker, served from the root so it can control the whole app"""
+    return FileResponse(
+        os.path.join(frontend_path, "sw.js"),
+        media_type="application/javascript",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
 @app.get("/")
 async def root():
     """Serve the frontend"""
@@ -53,48 +121,100 @@ async def root():
 
 # ==================== AUTH ROUTES ====================
 
+def insert_user(user: UserCreate, password_hash: str, actor_id: Optional[int],
+                first_user_admin: bool = False) -> User:
+    """Create the user from an already hashed password; 400 if the name is taken"""
+    with write_session() as db:
+        audit.set_actor(db, actor_id)
+        # Check if username exists (again: it may have been taken while hashing)
+        existing = db.query(User).filter(User.username == user.username).first()
+        if existing:
+            raise HTTPException(status_code=400, detail="Username already exists")
+
+        # First user becomes admin
+        role = ROLE_ADMIN if first_user_admin and db.query(User).count() == 0 else user.role
+        db_user = User(
+            username=user.username,
+            initials=user.initials.upper(),
+            password_hash=password_hash,
+            role=role
+        )
+        db.add(db_user)
+        db.commit()
+        db.refresh(db_user)
+        return db_user
+
+
 @app.post("/api/auth/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate):
     """Register a new user (admin only in production, open for first user)"""
-    # Check if first user (auto-make admin)
-    user_count = db.query(User).count()
-    
-    # Check if username exists
-    existing = db.query(User).filter(User.username == user.username).first()
-    if existing:
+    if await run_in_threadpool(lookup_user, user.username):
         raise HTTPException(status_code=400, detail="Username already exists")
-    
-    # First user becomes admin
-    role = ROLE_ADMIN if user_count == 0 else user.role
-    
-    db_user = User(
-        username=user.username,
-        initials=user.initials.upper(),
-        password_hash=get_password_hash(user.password),
-        role=role
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    # bcrypt runs on its own bounded pool, before the writer lock is taken
+    password_hash = await get_password_hash_async(user.password)
+    # No actor: self-registration
+    return await run_in_threadpool(insert_user, user, password_hash, None, first_user_admin=True)
+
+
+def start_session(user: User) -> dict:
+    """Open a login session and build the token response"""
+    with write_session() as db:
+        session, refresh_token = open_session(db, user.id)
+        sid = session.id
+        db.commit()
+    return token_response(user, sid, refresh_token)
+
+
+def token_response(user: User, sid: str, refresh_token: str) -> dict:
+    return {
+        "access_token": create_access_token(data={"sub": user.username, "sid": sid}),
+        "token_type": "bearer",
+        "user": user,
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
 
 
 @app.post("/api/auth/login", response_model=Token)
-def login(user_data: UserLogin, db: Session = Depends(get_db)):
-    """Login and get access token"""
-    user = db.query(User).filter(User.username == user_data.username).first()
-    if not user or not verify_password(user_data.password, user.password_hash):
+async def login(user_data: UserLogin):
+    """Login and get access and refresh tokens"""
+    user = await run_in_threadpool(lookup_user, user_data.username)
+    # bcrypt runs on its own bounded pool, not the request threads
+    if not user or not await verify_password_async(user_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
         )
-    
-    access_token = create_access_token(data={"sub": user.username})
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": user
-    }
+    return await run_in_threadpool(start_session, user)
+
+
+@app.post("/api/auth/refresh", response_model=Token)
+def refresh_token(data: RefreshRequest, db: Session = Depends(get_write_db)):
+    """Swap a refresh token for new tokens (no password check)"""
+    session, new_refresh_token = rotate_session(db, data.refresh_token)
+    sid = session.id
+    user = db.query(User).filter(User.id == session.user_id).first()
+    if not user or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token"
+        )
+    db.commit()
+    return token_response(user, sid, new_refresh_token)
+
+
+@app.post("/api/auth/logout")
+def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_write_db)
+):
+    """End the current session (its refresh token stops working)"""
+    sid = token_session_id(token)
+    if sid:
+        revoke_session(db, sid)
+        db.commit()
+    return {"message": "Logged out"}
 
 
 @app.get("/api/auth/me", response_model=UserResponse)
@@ -115,33 +235,37 @@ def get_users(
 
 
 @app.post("/api/users", response_model=UserResponse)
-def create_user(
+async def create_user(
     user: UserCreate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(require_admin)
 ):
     """Create a new user (admin only)"""
-    existing = db.query(User).filter(User.username == user.username).first()
-    if existing:
+    if await run_in_threadpool(lookup_user, user.username):
         raise HTTPException(status_code=400, detail="Username already exists")
-    
-    db_user = User(
-        username=user.username,
-        initials=user.initials.upper(),
-        password_hash=get_password_hash(user.password),
-        role=user.role
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    password_hash = await get_password_hash_async(user.password)
+    return await run_in_threadpool(insert_user, user, password_hash, current_user.id)
+
+
+@app.post("/api/users/import", response_model=UserImportResponse)
+async def import_users(
+    request: Request,
+    dry_run: bool = False,
+    current_user: User = Depends(require_admin)
+):
+    """Create users from a CSV request body (admin only)
+
+    Columns: username, initials, password and optionally role. Every row is
+    reported as created, duplicate or invalid; with dry_run nothing is created.
+    """
+    data = await request.body()
+    return await run_in_threadpool(userimport.import_users, data, current_user.id, dry_run=dry_run)
 
 
 @app.delete("/api/users/{user_id}")
 def delete_user(
     user_id: int,
     current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Delete a user (admin only)"""
     if user_id == current_user.id:
@@ -151,86 +275,159 @@ def delete_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    db.query(UserSession).filter(UserSession.user_id == user_id).delete()
     db.delete(user)
     db.commit()
     return {"message": "User deleted"}
 
 
+@app.put("/api/users/{user_id}/kiosk-credential")
+def set_kiosk_credential(
+    user_id: int,
+    data: KioskCredential,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_audited_db)
+):
+    """Set a user's kiosk badge code or PIN (admin only)"""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    credential_hash = kiosk.credential_hash(data.credential)
+    taken = db.query(User.id).filter(
+        User.kiosk_credential_hash == credential_hash,
+        User.id != user_id
+    ).first()
+    if taken:
+        raise HTTPException(status_code=400, detail="Credential already in use")
+
+    user.kiosk_credential_hash = credential_hash
+    db.commit()
+    return {"message": "Kiosk credential set"}
+
+
+@app.delete("/api/users/{user_id}/kiosk-credential")
+def clear_kiosk_credential(
+    user_id: int,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_audited_db)
+):
+    """Remove a user's kiosk badge code or PIN (admin only)"""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user.kiosk_credential_hash = None
+    db.commit()
+    return {"message": "Kiosk credential removed"}
+
+
 # ==================== JOB ROUTES ====================
 
 def build_job_response(job: Job, db: Session) -> dict:
     """Build a job response with computed fields"""
-    # Get assignments with user info
-    assignments = []
-    for assignment in job.assignments:
-        # Check if user is currently clocked in
-        active_entry = db.query(TimeEntry).filter(
-            TimeEntry.job_id == job.id,
-            TimeEntry.user_id == assignment.user_id,
-            TimeEntry.clock_out.is_(None)
-        ).first()
-        
-        assignments.append({
-            "id": assignment.id,
-            "user_id": assignment.user_id,
-            "username": assignment.user.username,
-            "initials": assignment.user.initials,
-            "assigned_at": assignment.assigned_at,
-            "is_clocked_in": active_entry is not None
-        })
-    
-    # Calculate total time
-    total_seconds = 0
-    for entry in job.time_entries:
-        if entry.clock_out:
-            delta = entry.clock_out - entry.clock_in
-            total_seconds += delta.total_seconds()
-        elif entry.clock_in:
-            # Still clocked in
-            delta = datetime.utcnow() - entry.clock_in.replace(tzinfo=None)
-            total_seconds += delta.total_seconds()
-    
-    return {
-        "id": job.id,
-        "job_name": job.job_name,
-        "description": job.description,
-        "requirements": job.requirements,
-        "max_workers": job.max_workers,
-        "auto_review": job.auto_review,
-        "is_complete": job.is_complete,
-        "is_archived": job.is_archived,
-        "marked_for_review": job.marked_for_review,
-        "created_by": job.created_by,
-        "created_at": job.created_at,
-        "completed_at": job.completed_at,
-        "current_workers": len(assignments),
-        "assignments": assignments,
-        "total_time_seconds": total_seconds
-    }
+    return build_job_responses(db, [job])[0]
 
 
-@app.get("/api/jobs", response_model=List[JobResponse])
+@app.get("/api/jobs", response_model=Union[List[JobResponse], List[JobCardResponse]])
 def get_jobs(
     include_archived: bool = False,
+    view: JobView = VIEW_FULL,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get all active jobs (job board)"""
-    query = db.query(Job)
-    if not include_archived:
-        query = query.filter(Job.is_archived == False)
-    jobs = query.order_by(Job.created_at.desc()).all()
-    return [build_job_response(job, db) for job in jobs]
+    """Get all active jobs (job board); view=card returns compact cards"""
+    def compute() -> bytes:
+        if not include_archived:
+            # Served from the in-memory snapshot, rebuilt only after writes
+            return board_snapshot.render(db, view)
+        jobs = job_query(db, view).order_by(Job.created_at.desc(), Job.id.desc()).all()
+        return encode_job_responses(build_job_responses(db, jobs, view), view)
+    
+    # Identical concurrent requests share one computation
+    body = flights.do(("GET /api/jobs", include_archived, view, current_user.role), compute)
+    return Response(content=body, media_type="application/json")
 
 
-@app.get("/api/jobs/archived", response_model=List[JobResponse])
+@app.get("/api/jobs/archived", response_model=Union[List[JobResponse], List[JobCardResponse]])
 def get_archived_jobs(
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    view: JobView = VIEW_FULL,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get archived/completed jobs"""
-    jobs = db.query(Job).filter(Job.is_archived == True).order_by(Job.completed_at.desc()).all()
-    return [build_job_response(job, db) for job in jobs]
+    """Get archived/completed jobs (most recent first, optionally paged)"""
+    def compute() -> bytes:
+        jobs = archived_jobs_query(db, limit, offset, view).all()
+        return encode_job_responses(build_job_responses(db, jobs, view), view)
+    
+    body = flights.do(("GET /api/jobs/archived", limit, offset, view, current_user.role), compute)
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/api/jobs/mine", response_model=Union[List[JobResponse], List[JobCardResponse]])
+def get_my_jobs(
+    view: JobView = VIEW_FULL,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Open jobs the current user is assigned to, with only their own assignment"""
+    body = encode_job_responses(my_jobs_for(db, current_user.id, view), view)
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/api/jobs/review", response_model=Union[List[JobResponse], List[JobCardResponse]])
+def get_review_queue(
+    view: JobView = VIEW_FULL,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Jobs marked complete and awaiting approval (admin only)"""
+    body = encode_job_responses(review_queue(db, view), view)
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/api/jobs/search", response_model=Union[List[JobResponse], List[JobCardResponse]])
+def search_jobs(
+    q: str = Query(..., min_length=1, max_length=200),
+    state: Literal["all", "open", "review", "archived"] = "all",
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    view: JobView = VIEW_FULL,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over job name, description and requirements (prefix matching)"""
+    jobs = search.search_jobs(db, q, state, limit, offset, view)
+    body = encode_job_responses(build_job_responses(db, jobs, view), view)
+    return Response(content=body, media_type="application/json")
+
+
+def my_jobs_for(db: Session, user_id: int, view: str = VIEW_FULL) -> list:
+    """Open jobs a user is assigned to (uses ix_job_assignments_user)"""
+    jobs = job_query(db, view).join(JobAssignment, JobAssignment.job_id == Job.id).filter(
+        JobAssignment.user_id == user_id,
+        Job.is_archived == False
+    ).order_by(Job.created_at.desc(), Job.id.desc()).all()
+    return build_job_responses(db, jobs, view, only_user_id=user_id)
+
+
+def review_queue(db: Session, view: str = VIEW_FULL) -> list:
+    """Jobs awaiting approval (uses the partial ix_jobs_review index)"""
+    # approve_job clears the flag when archiving, so no is_archived filter
+    jobs = job_query(db, view).filter(
+        Job.marked_for_review == True
+    ).order_by(Job.created_at.desc(), Job.id.desc()).all()
+    return build_job_responses(db, jobs, view)
+
+
+def archived_jobs_query(db: Session, limit: Optional[int], offset: int, view: str = VIEW_FULL):
+    """Archived jobs, most recently completed first"""
+    query = job_query(db, view).filter(Job.is_archived == True).order_by(
+        Job.completed_at.desc(), Job.id.desc()
+    ).offset(offset)
+    return query.limit(limit) if limit else query
 
 
 @app.get("/api/jobs/{job_id}", response_model=JobResponse)
@@ -250,7 +447,7 @@ def get_job(
 def create_job(
     job: JobCreate,
     current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Create a new job (admin only)"""
     db_job = Job(
@@ -272,7 +469,7 @@ def update_job(
     job_id: int,
     job_update: JobUpdate,
     current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Update a job (admin only)"""
     job = db.query(Job).filter(Job.id == job_id).first()
@@ -291,13 +488,16 @@ def update_job(
 def delete_job(
     job_id: int,
     current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Delete a job (admin only)"""
     job = db.query(Job).filter(Job.id == job_id).first()
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
+    # Its entries leave the projections through the ledger
+    ledger.void_job(db, job_id, current_user.id)
+    db.query(JobTimeTotal).filter(JobTimeTotal.job_id == job_id).delete()
     db.delete(job)
     db.commit()
     return {"message": "Job deleted"}
@@ -309,35 +509,10 @@ def delete_job(
 def join_job(
     job_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Join a job (add yourself to assignment list)"""
-    job = db.query(Job).filter(Job.id == job_id).first()
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    if job.is_complete or job.is_archived:
-        raise HTTPException(status_code=400, detail="Job is already complete")
-    
-    # Check if already assigned
-    existing = db.query(JobAssignment).filter(
-        JobAssignment.job_id == job_id,
-        JobAssignment.user_id == current_user.id
-    ).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Already assigned to this job")
-    
-    # Check max workers
-    current_count = db.query(JobAssignment).filter(JobAssignment.job_id == job_id).count()
-    if current_count >= job.max_workers:
-        raise HTTPException(status_code=400, detail="Job is full")
-    
-    assignment = JobAssignment(
-        job_id=job_id,
-        user_id=current_user.id,
-        assigned_by=current_user.id
-    )
-    db.add(assignment)
+    timeclock.join_job(db, job_id, current_user.id)
     db.commit()
     return {"message": "Joined job successfully"}
 
@@ -347,7 +522,7 @@ def assign_user_to_job(
     job_id: int,
     user_id: int,
     current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Assign a user to a job (admin only)"""
     job = db.query(Job).filter(Job.id == job_id).first()
@@ -380,7 +555,7 @@ def assign_user_to_job(
 def leave_job(
     job_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Leave a job (remove yourself from assignment)"""
     assignment = db.query(JobAssignment).filter(
@@ -392,12 +567,7 @@ def leave_job(
         raise HTTPException(status_code=404, detail="Not assigned to this job")
     
     # Make sure not clocked in
-    active_entry = db.query(TimeEntry).filter(
-        TimeEntry.job_id == job_id,
-        TimeEntry.user_id == current_user.id,
-        TimeEntry.clock_out.is_(None)
-    ).first()
-    if active_entry:
+    if ledger.open_entry(db, job_id, current_user.id):
         raise HTTPException(status_code=400, detail="Clock out first before leaving")
     
     db.delete(assignment)
@@ -405,44 +575,138 @@ def leave_job(
     return {"message": "Left job"}
 
 
+# ==================== JOB TEMPLATES (Admin) ====================
+
+def template_response(template: JobTemplate) -> dict:
+    return {
+        **{column.key: getattr(template, column.key) for column in JobTemplate.__table__.columns},
+        "user_ids": sorted(member.user_id for member in template.members),
+    }
+
+
+def template_crew(db: Session, user_ids: List[int], max_workers: int) -> List[JobTemplateMember]:
+    """Crew rows for user_ids; 400 if any user does not exist or they don't fit"""
+    jobtemplates.require_users(db, user_ids)
+    jobtemplates.require_crew_fits(len(set(user_ids)), max_workers)
+    return [JobTemplateMember(user_id=user_id) for user_id in sorted(set(user_ids))]
+
+
+def get_template_or_404(db: Session, template_id: int) -> JobTemplate:
+    template = db.query(JobTemplate).filter(JobTemplate.id == template_id).first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template
+
+
+@app.get("/api/job-templates", response_model=List[JobTemplateResponse])
+def list_job_templates(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """All job templates with their default crews (admin only)"""
+    templates = db.query(JobTemplate).options(selectinload(JobTemplate.members)).order_by(JobTemplate.name).all()
+    return [template_response(template) for template in templates]
+
+
+@app.post("/api/job-templates", response_model=JobTemplateResponse)
+def create_job_template(
+    data: JobTemplateCreate,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_audited_db)
+):
+    """Create a job template (admin only)"""
+    if db.query(JobTemplate.id).filter(JobTemplate.name == data.name).first():
+        raise HTTPException(status_code=400, detail="Template name already exists")
+    
+    template = JobTemplate(
+        **data.model_dump(exclude={"user_ids"}),
+        created_by=current_user.id,
+        members=template_crew(db, data.user_ids, data.max_workers)
+    )
+    db.add(template)
+    db.commit()
+    db.refresh(template)
+    return template_response(template)
+
+
+@app.put("/api/job-templates/{template_id}", response_model=JobTemplateResponse)
+def update_job_template(
+    template_id: int,
+    data: JobTemplateUpdate,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_audited_db)
+):
+    """Update a job template; user_ids replaces its crew (admin only)"""
+    template = get_template_or_404(db, template_id)
+    changes = data.model_dump(exclude_unset=True)
+    if "name" in changes and db.query(JobTemplate.id).filter(
+        JobTemplate.name == changes["name"], JobTemplate.id != template_id
+    ).first():
+        raise HTTPException(status_code=400, detail="Template name already exists")
+    
+    user_ids = changes.pop("user_ids", None)
+    max_workers = changes.get("max_workers")
+    if max_workers is None:
+        max_workers = template.max_workers
+    if user_ids is not None:
+        template.members = template_crew(db, user_ids, max_workers)
+    else:
+        jobtemplates.require_crew_fits(len(template.members), max_workers)
+    for field, value in changes.items():
+        setattr(template, field, value)
+    db.commit()
+    db.refresh(template)
+    return template_response(template)
+
+
+@app.delete("/api/job-templates/{template_id}")
+def delete_job_template(
+    template_id: int,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_audited_db)
+):
+    """Delete a job template; jobs cloned from it stay (admin only)"""
+    db.delete(get_template_or_404(db, template_id))
+    db.commit()
+    return {"message": "Template deleted"}
+
+
+@app.post("/api/job-templates/{template_id}/clone", response_model=JobCloneResponse)
+def clone_job_template(
+    template_id: int,
+    data: JobClone,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_audited_db)
+):
+    """Create count jobs from a template, assigned to its crew (admin only)"""
+    result = jobtemplates.clone_template(db, template_id, data.count, current_user.id, data.user_ids, data.job_name)
+    db.commit()
+    return result
+
+
+@app.post("/api/jobs/{job_id}/clone", response_model=JobCloneResponse)
+def clone_archived_job(
+    job_id: int,
+    data: JobClone,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_audited_db)
+):
+    """Create count copies of an archived job, assigned to its crew (admin only)"""
+    result = jobtemplates.clone_job(db, job_id, data.count, current_user.id, data.user_ids, data.job_name)
+    db.commit()
+    return result
+
+
 # ==================== TIME TRACKING ROUTES ====================
 
 @app.post("/api/time/clockin")
 def clock_in(
     data: ClockIn,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Clock in to a job"""
-    job = db.query(Job).filter(Job.id == data.job_id).first()
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    if job.is_complete or job.is_archived:
-        raise HTTPException(status_code=400, detail="Job is already complete")
-    
-    # Check if assigned
-    assignment = db.query(JobAssignment).filter(
-        JobAssignment.job_id == data.job_id,
-        JobAssignment.user_id == current_user.id
-    ).first()
-    if not assignment:
-        raise HTTPException(status_code=400, detail="Not assigned to this job")
-    
-    # Check if already clocked in to this job
-    existing = db.query(TimeEntry).filter(
-        TimeEntry.job_id == data.job_id,
-        TimeEntry.user_id == current_user.id,
-        TimeEntry.clock_out.is_(None)
-    ).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Already clocked in to this job")
-    
-    entry = TimeEntry(
-        user_id=current_user.id,
-        job_id=data.job_id
-    )
-    db.add(entry)
+    entry = timeclock.clock_in(db, data.job_id, current_user.id)
     db.commit()
     return {"message": "Clocked in", "clock_in": entry.clock_in}
 
@@ -451,19 +715,10 @@ def clock_in(
 def clock_out(
     data: ClockOut,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Clock out of a job"""
-    entry = db.query(TimeEntry).filter(
-        TimeEntry.job_id == data.job_id,
-        TimeEntry.user_id == current_user.id,
-        TimeEntry.clock_out.is_(None)
-    ).first()
-    
-    if not entry:
-        raise HTTPException(status_code=400, detail="Not clocked in to this job")
-    
-    entry.clock_out = datetime.utcnow()
+    entry = timeclock.clock_out(db, data.job_id, current_user.id)
     db.commit()
     return {"message": "Clocked out", "clock_out": entry.clock_out}
 
@@ -474,19 +729,141 @@ def get_active_clocks(
     db: Session = Depends(get_db)
 ):
     """Get all jobs the current user is clocked in to"""
-    entries = db.query(TimeEntry).filter(
-        TimeEntry.user_id == current_user.id,
-        TimeEntry.clock_out.is_(None)
-    ).all()
-    
-    result = []
-    for entry in entries:
-        result.append({
+    return active_clocks_for(db, current_user.id)
+
+
+def active_clocks_for(db: Session, user_id: int) -> list:
+    """Open clocks for a user, with job names (open_clocks projection)"""
+    rows = db.query(OpenClock.job_id, Job.job_name, OpenClock.clock_in).join(
+        Job, Job.id == OpenClock.job_id
+    ).filter(OpenClock.user_id == user_id).all()
+    return [{"job_id": job_id, "job_name": job_name, "clock_in": clock_in}
+            for job_id, job_name, clock_in in rows]
+
+
+@app.post("/api/time/entries/{entry_id}/correct", response_model=ClockEventResponse)
+def correct_time_entry(
+    entry_id: int,
+    data: EntryCorrection,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_audited_db)
+):
+    """Fix an entry's times or void it; appended to the clock ledger (admin only)"""
+    entry = db.get(TimeEntry, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Time entry not found")
+    if data.void:
+        ledger.void(db, entry, current_user.id, data.reason)
+    else:
+        if data.clock_in is None and data.clock_out is None:
+            raise HTTPException(status_code=400, detail="Nothing to correct")
+        ledger.correct(db, entry, data.clock_in, data.clock_out, current_user.id, data.reason)
+        entry.review_reason = None
+    db.commit()
+    return ledger.entry_history(db, entry_id)[-1]
+
+
+@app.get("/api/time/entries/flagged", response_model=List[FlaggedEntryResponse])
+def get_flagged_entries(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Entries closed by the stale clock sweeper, awaiting review (admin only)"""
+    rows = db.query(TimeEntry, User.username, User.initials, Job.job_name).join(
+        User, User.id == TimeEntry.user_id
+    ).join(
+        Job, Job.id == TimeEntry.job_id
+    ).filter(TimeEntry.review_reason.isnot(None)).order_by(TimeEntry.clock_in).all()
+    return [
+        {
+            "id": entry.id,
+            "user_id": entry.user_id,
+            "username": username,
+            "initials": initials,
             "job_id": entry.job_id,
-            "job_name": entry.job.job_name,
-            "clock_in": entry.clock_in
-        })
-    return result
+            "job_name": job_name,
+            "clock_in": entry.clock_in,
+            "clock_out": entry.clock_out,
+            "review_reason": entry.review_reason,
+        }
+        for entry, username, initials, job_name in rows
+    ]
+
+
+@app.delete("/api/time/entries/{entry_id}/review")
+def accept_time_entry(
+    entry_id: int,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_audited_db)
+):
+    """Accept an automatic clock-out as it is (admin only)"""
+    entry = db.get(TimeEntry, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Time entry not found")
+    entry.review_reason = None
+    db.commit()
+    return {"message": "Time entry accepted"}
+
+
+@app.get("/api/time/entries/{entry_id}/history", response_model=List[ClockEventResponse])
+def get_time_entry_history(
+    entry_id: int,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Every ledger event of an entry, oldest first (admin only)"""
+    events = ledger.entry_history(db, entry_id)
+    if not events:
+        raise HTTPException(status_code=404, detail="Time entry not found")
+    return events
+
+
+# ==================== DASHBOARD ====================
+
+_active_clocks_adapter = TypeAdapter(List[ActiveClockResponse])
+_users_adapter = TypeAdapter(List[UserResponse])
+
+
+def json_object(**parts: bytes) -> bytes:
+    """Join already-encoded JSON values into one JSON object"""
+    return b"{" + b", ".join(json.dumps(key).encode() + b": " + value for key, value in parts.items()) + b"}"
+
+
+@app.get("/api/dashboard", response_model=DashboardResponse)
+def get_dashboard(
+    archived_limit: int = Query(20, ge=1, le=200),
+    archived_offset: int = Query(0, ge=0),
+    view: JobView = VIEW_FULL,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Everything the main screen needs on load, in one request and one session"""
+    is_admin = current_user.role == ROLE_ADMIN
+    board = flights.do(
+        ("GET /api/jobs", False, view, current_user.role),
+        lambda: board_snapshot.render(db, view)
+    )
+    archived = archived_jobs_query(db, archived_limit, archived_offset, view).all()
+    archived_total = db.query(func.count(Job.id)).filter(Job.is_archived == True).scalar()
+    
+    body = json_object(
+        jobs=board,
+        archived=json_object(
+            items=encode_job_responses(build_job_responses(db, archived, view), view),
+            total=str(archived_total).encode(),
+            limit=str(archived_limit).encode(),
+            offset=str(archived_offset).encode(),
+        ),
+        active_clocks=_active_clocks_adapter.dump_json(
+            _active_clocks_adapter.validate_python(active_clocks_for(db, current_user.id))
+        ),
+        my_jobs=encode_job_responses(my_jobs_for(db, current_user.id, view), view),
+        review_queue=encode_job_responses(review_queue(db, view), view) if is_admin else b"null",
+        users=_users_adapter.dump_json(
+            _users_adapter.validate_python(db.query(User).all(), from_attributes=True)
+        ) if is_admin else b"null",
+    )
+    return Response(content=body, media_type="application/json")
 
 
 # ==================== JOB COMPLETION ROUTES ====================
@@ -495,7 +872,7 @@ def get_active_clocks(
 def mark_job_complete(
     job_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Mark a job as complete (triggers review or auto-completes)"""
     job = db.query(Job).filter(Job.id == job_id).first()
@@ -511,12 +888,12 @@ def mark_job_complete(
         raise HTTPException(status_code=403, detail="Not assigned to this job")
     
     # Clock out all users
-    active_entries = db.query(TimeEntry).filter(
-        TimeEntry.job_id == job_id,
-        TimeEntry.clock_out.is_(None)
+    now = datetime.utcnow()
+    active_entries = db.query(TimeEntry).join(OpenClock, OpenClock.entry_id == TimeEntry.id).filter(
+        OpenClock.job_id == job_id
     ).all()
     for entry in active_entries:
-        entry.clock_out = datetime.utcnow()
+        ledger.clock_out(db, entry, now)
     
     if job.auto_review:
         # Auto-complete
@@ -535,7 +912,7 @@ def mark_job_complete(
 def approve_job(
     job_id: int,
     current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Approve and archive a completed job (admin only)"""
     job = db.query(Job).filter(Job.id == job_id).first()
@@ -554,7 +931,7 @@ def approve_job(
 def reopen_job(
     job_id: int,
     current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_audited_db)
 ):
     """Reopen a job that was marked for review (admin only)"""
     job = db.query(Job).filter(Job.id == job_id).first()
@@ -566,6 +943,258 @@ def reopen_job(
     return {"message": "Job reopened"}
 
 
+# ==================== OFFLINE SYNC ====================
+
+@app.post("/api/sync", response_model=SyncResponse)
+def sync_actions(
+    data: SyncRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_write_db)
+):
+    """Apply actions queued while offline, in order, skipping ones already synced"""
+    audit.set_actor(db, current_user.id, audit.SOURCE_SYNC)
+    results = sync.apply_actions(db, current_user.id, current_user.username, data)
+    db.commit()
+    return {"results": results}
+
+
+# ==================== KIOSK ====================
+
+@app.post("/api/kiosk/punch", response_model=KioskPunchResponse, dependencies=[Depends(kiosk.require_kiosk)])
+def kiosk_punch(data: KioskPunch, request: Request, db: Session = Depends(get_db)):
+    """Badge/PIN scan at the shared terminal: clock in or out of an assigned job"""
+    kiosk_id = request.client.host if request.client else ""
+    return kiosk.punch(db, data.credential, data.job_id, kiosk_id)
+
+
+# ==================== REPORTS (Admin) ====================
+
+@app.get("/api/reports/overlap", response_model=OverlapReport)
+def get_overlap_report(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Overlapping clocks and fair time split per job (admin only, default last 7 days)"""
+    end = timeclock.naive_utc(end) if end else datetime.utcnow()
+    start = timeclock.naive_utc(start) if start else end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return overlap.overlap_report(db, start, end, user_id)
+
+
+@app.get("/api/reports/durations", response_model=DurationReport)
+def get_duration_report(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Archived-job duration statistics behind the estimates (admin only)"""
+    stats = estimates.stats
+    names = {}
+    if stats.workers:
+        names = {
+            user_id: (username, initials) for user_id, username, initials in
+            db.query(User.id, User.username, User.initials)
+            .filter(User.id.in_([w["user_id"] for w in stats.workers])).all()
+        }
+    return {
+        "refreshed_at": estimates.refreshed_at,
+        "refresh_seconds": estimates.refresh_seconds,
+        "entries": stats.entries,
+        "jobs": stats.jobs,
+        "overall": stats.overall._asdict() if stats.overall else None,
+        "kinds": [
+            {"kind": kind, **estimate._asdict()}
+            for kind, estimate in sorted(stats.kinds.items(), key=lambda item: -item[1].samples)
+        ],
+        "workers": [
+            {**worker, "username": names.get(worker["user_id"], ("", ""))[0],
+             "initials": names.get(worker["user_id"], ("", ""))[1]}
+            for worker in stats.workers
+        ],
+    }
+
+
+@app.get("/api/reports/daily-hours", response_model=List[UserDailyHoursReport])
+def get_daily_hours(
+    first_day: date,
+    last_day: date,
+    user_id: Optional[int] = None,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Clocked hours per worker per shop-local day, closed entries only (admin only)"""
+    if last_day < first_day:
+        raise HTTPException(status_code=400, detail="last_day must not be before first_day")
+    report = {}
+    for uid, day, seconds in ledger.daily_hours(db, first_day, last_day, user_id):
+        report.setdefault(uid, []).append({"day": day, "seconds": seconds})
+    names = {}
+    if report:
+        names = {
+            uid: (username, initials) for uid, username, initials in
+            db.query(User.id, User.username, User.initials).filter(User.id.in_(list(report))).all()
+        }
+    return [
+        {
+            "user_id": uid,
+            "username": names.get(uid, ("", ""))[0],
+            "initials": names.get(uid, ("", ""))[1],
+            "total_seconds": sum(d["seconds"] for d in days),
+            "days": days,
+        }
+        for uid, days in report.items()
+    ]
+
+
+@app.get("/api/payroll", response_model=PayrollReport)
+def get_payroll(
+    first_day: date,
+    last_day: date,
+    user_id: Optional[int] = None,
+    days: bool = False,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Regular/overtime hours per worker for a pay period, in shop-local days (admin only)"""
+    if last_day < first_day:
+        raise HTTPException(status_code=400, detail="last_day must not be before first_day")
+    if (last_day - first_day).days >= PAYROLL_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Pay period is limited to {PAYROLL_MAX_DAYS} days")
+    return payroll.payroll_report(db, first_day, last_day, user_id, days)
+
+
+# ==================== BACKGROUND TASKS (Admin) ====================
+
+def task_response(task: BackgroundTask) -> dict:
+    return {
+        "id": task.id,
+        "kind": task.kind,
+        "params": json.loads(task.params),
+        "status": task.status,
+        "progress": task.progress,
+        "cancel_requested": task.cancel_requested,
+        "error": task.error,
+        "created_by": task.created_by,
+        "created_at": task.created_at,
+        "started_at": task.started_at,
+        "finished_at": task.finished_at,
+        "result_content_type": task.result_content_type,
+    }
+
+
+def get_task_or_404(db: Session, task_id: str) -> BackgroundTask:
+    task = db.get(BackgroundTask, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
+
+
+@app.get("/api/tasks", response_model=List[TaskResponse])
+def list_tasks(
+    task_status: Optional[str] = Query(None, alias="status"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Recent background tasks, newest first (admin only)"""
+    query = db.query(BackgroundTask).options(defer(BackgroundTask.result))
+    if task_status:
+        query = query.filter(BackgroundTask.status == task_status)
+    return [task_response(task) for task in query.order_by(BackgroundTask.created_at.desc()).limit(limit)]
+
+
+@app.get("/api/tasks/kinds", response_model=List[str])
+def list_task_kinds(current_user: User = Depends(require_admin)):
+    """Task kinds that can be submitted (admin only)"""
+    return tasks.task_kinds()
+
+
+@app.post("/api/tasks", response_model=TaskResponse, status_code=202)
+def submit_task(data: TaskCreate, current_user: User = Depends(require_admin)):
+    """Queue a report, export or rebuild to run in the background (admin only)"""
+    return task_response(tasks.runner.submit(data.kind, data.params, current_user.id))
+
+
+@app.get("/api/tasks/{task_id}", response_model=TaskResponse)
+def get_task(
+    task_id: str,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Status and progress of a background task (admin only)"""
+    return task_response(get_task_or_404(db, task_id))
+
+
+@app.get("/api/tasks/{task_id}/result")
+def get_task_result(
+    task_id: str,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Stored result of a finished task (admin only)"""
+    task = get_task_or_404(db, task_id)
+    if task.status != tasks.SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Task is {task.status}")
+    headers = {}
+    if task.result_content_type == "text/csv":
+        headers["Content-Disposition"] = f'attachment; filename="{task.kind}-{task.id[:8]}.csv"'
+    return Response(content=task.result, media_type=task.result_content_type, headers=headers)
+
+
+@app.delete("/api/tasks/{task_id}", response_model=TaskResponse)
+def cancel_task(
+    task_id: str,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Cancel a queued or running task (admin only)"""
+    get_task_or_404(db, task_id)
+    tasks.runner.cancel(task_id)
+    db.rollback()  # end our read snapshot to see the runner's update
+    return task_response(get_task_or_404(db, task_id))
+
+
+# ==================== AUDIT LOG (Admin) ====================
+
+@app.get("/api/audit", response_model=List[AuditEventResponse])
+def get_audit_events(
+    actor_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    job_id: Optional[int] = None,
+    action: Optional[str] = None,
+    target_type: Optional[str] = None,
+    target_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    before_id: Optional[int] = Query(None, ge=1),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Who changed what, newest first; page with before_id (admin only)"""
+    # Include this worker's buffered events (before our read snapshot starts)
+    audit_log.flush()
+    return audit.query_events(
+        db, limit, before_id,
+        timeclock.naive_utc(since) if since else None,
+        timeclock.naive_utc(until) if until else None,
+        actor_id=actor_id, user_id=user_id, job_id=job_id,
+        action=action, target_type=target_type, target_id=target_id,
+    )
+
+
+# ==================== METRICS (Admin) ====================
+
+@app.get("/api/admin/metrics")
+def get_metrics(current_user: User = Depends(require_admin)):
+    """Server metrics (admin only)"""
+    return {"coalescing": flights.metrics(), "admission": limiter.metrics(), "audit": audit_log.metrics(),
+            "stale_clocks": sweeper.metrics()}
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host=HOST, port=PORT)
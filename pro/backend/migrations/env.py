@@ -0,0 +1,71 @@
+"""Alembic environment - runs migrations against the app's engine"""
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import Base, engine
+import models  # noqa: F401 - registers tables on Base.metadata
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Job search lives outside the models (migration 0006): the FTS5 table and its
+# shadow tables on SQLite, the generated column and its GIN index on Postgres.
+# Autogenerate must not offer to drop them.
+SEARCH_INDEXES = {"ix_jobs_search"}
+SEARCH_COLUMNS = {("jobs", "search_vector")}
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """Leave the job search objects out of autogenerate's comparison"""
+    if type_ == "table" and name.startswith("jobs_fts"):
+        return False
+    if type_ == "index" and name in SEARCH_INDEXES:
+        return False
+    if type_ == "column" and (object.table.name, name) in SEARCH_COLUMNS:
+        return False
+    return True
+
+
+def run_migrations_offline() -> None:
+    """Emit SQL to stdout instead of running it (alembic upgrade --sql)"""
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        include_object=include_object,
+        render_as_batch=engine.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run migrations on a live connection"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    # SQLite cannot ALTER most things in place; batch mode rebuilds tables
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,76 @@
+"""Initial schema: users, jobs, job assignments, time entries
+
+Matches what Base.metadata.create_all() produced before migrations were
+introduced, so existing databases can be stamped at this revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(50), nullable=False),
+        sa.Column("initials", sa.String(10), nullable=False),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column("role", sa.String(20), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_name", sa.String(200), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("requirements", sa.Text(), nullable=True),
+        sa.Column("max_workers", sa.Integer(), nullable=True),
+        sa.Column("auto_review", sa.Boolean(), nullable=True),
+        sa.Column("is_complete", sa.Boolean(), nullable=True),
+        sa.Column("is_archived", sa.Boolean(), nullable=True),
+        sa.Column("marked_for_review", sa.Boolean(), nullable=True),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_jobs_id", "jobs", ["id"])
+
+    op.create_table(
+        "job_assignments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_id", sa.Integer(), sa.ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("assigned_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("assigned_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_job_assignments_id", "job_assignments", ["id"])
+
+    op.create_table(
+        "time_entries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("job_id", sa.Integer(), sa.ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("clock_in", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("clock_out", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_time_entries_id", "time_entries", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("time_entries")
+    op.drop_table("job_assignments")
+    op.drop_table("jobs")
+    op.drop_table("users")
@@ -0,0 +1,36 @@
+"""Hot-path indexes for the job board and clock routes
+
+Databases created by create_all() after these indexes were added to the
+models already have them, hence if_not_exists.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_jobs_archived_created", "jobs", ["is_archived", "created_at"], if_not_exists=True)
+    op.create_index("ix_job_assignments_job_user", "job_assignments", ["job_id", "user_id"], if_not_exists=True)
+    op.create_index("ix_time_entries_job", "time_entries", ["job_id"], if_not_exists=True)
+    op.create_index(
+        "ix_time_entries_open", "time_entries", ["user_id", "job_id"],
+        postgresql_where=sa.text("clock_out IS NULL"),
+        sqlite_where=sa.text("clock_out IS NULL"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_time_entries_open", table_name="time_entries")
+    op.drop_index("ix_time_entries_job", table_name="time_entries")
+    op.drop_index("ix_job_assignments_job_user", table_name="job_assignments")
+    op.drop_index("ix_jobs_archived_created", table_name="jobs")
@@ -0,0 +1,28 @@
+"""Indexes for the my-jobs and review-queue endpoints
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_job_assignments_user", "job_assignments", ["user_id"])
+    op.create_index(
+        "ix_jobs_review", "jobs", ["created_at"],
+        postgresql_where=sa.text("marked_for_review = true"),
+        sqlite_where=sa.text("marked_for_review = 1"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_review", table_name="jobs")
+    op.drop_index("ix_job_assignments_user", table_name="job_assignments")
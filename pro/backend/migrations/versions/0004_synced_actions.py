@@ -0,0 +1,39 @@
+"""Offline sync: record of applied/rejected queued actions
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "synced_actions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("idempotency_key", sa.String(length=64), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("action", sa.String(length=20), nullable=False),
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("client_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("applied_time", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("detail", sa.String(length=200), nullable=True),
+        sa.Column("synced_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("idempotency_key"),
+    )
+    op.create_index("ix_synced_actions_id", "synced_actions", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_synced_actions_id", table_name="synced_actions")
+    op.drop_table("synced_actions")
@@ -0,0 +1,73 @@
+"""Full-text search over job name, description and requirements
+
+PostgreSQL: a generated, weighted tsvector column on jobs with a GIN index.
+SQLite: an FTS5 table over jobs kept current by triggers.
+
+Neither is mapped on the Job model; search.py queries them directly.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# 'simple' keeps part numbers and shop jargon as typed (no stemming/stop words)
+PG_SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce(job_name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(description, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(requirements, '')), 'C')
+"""
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(f"ALTER TABLE jobs ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({PG_SEARCH_VECTOR}) STORED")
+        op.execute("CREATE INDEX ix_jobs_search ON jobs USING GIN (search_vector)")
+        return
+
+    # unicode61 splits AB-1234 into "ab" "1234"; search.py queries it as a phrase
+    op.execute("""
+        CREATE VIRTUAL TABLE jobs_fts USING fts5(
+            job_name, description, requirements,
+            content='jobs', content_rowid='id'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER jobs_fts_insert AFTER INSERT ON jobs BEGIN
+            INSERT INTO jobs_fts(rowid, job_name, description, requirements)
+            VALUES (new.id, new.job_name, new.description, new.requirements);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER jobs_fts_delete AFTER DELETE ON jobs BEGIN
+            INSERT INTO jobs_fts(jobs_fts, rowid, job_name, description, requirements)
+            VALUES ('delete', old.id, old.job_name, old.description, old.requirements);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER jobs_fts_update AFTER UPDATE OF job_name, description, requirements ON jobs BEGIN
+            INSERT INTO jobs_fts(jobs_fts, rowid, job_name, description, requirements)
+            VALUES ('delete', old.id, old.job_name, old.description, old.requirements);
+            INSERT INTO jobs_fts(rowid, job_name, description, requirements)
+            VALUES (new.id, new.job_name, new.description, new.requirements);
+        END
+    """)
+    op.execute("INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_jobs_search")
+        op.execute("ALTER TABLE jobs DROP COLUMN search_vector")
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS jobs_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS jobs_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS jobs_fts_insert")
+    op.execute("DROP TABLE IF EXISTS jobs_fts")
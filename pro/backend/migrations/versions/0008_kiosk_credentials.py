@@ -0,0 +1,26 @@
+"""Kiosk badge/PIN credential on users
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Plain ADD COLUMN + index: no table rebuild of users on SQLite
+    op.add_column("users", sa.Column("kiosk_credential_hash", sa.String(length=64), nullable=True))
+    op.create_index("ix_users_kiosk_credential_hash", "users", ["kiosk_credential_hash"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_kiosk_credential_hash", table_name="users")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("kiosk_credential_hash")
@@ -0,0 +1,21 @@
+"""Index time entries by user and clock-in for the overlap sweep
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_time_entries_user_clock_in", "time_entries", ["user_id", "clock_in"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_time_entries_user_clock_in", table_name="time_entries")
@@ -0,0 +1,46 @@
+"""Append-only audit events
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "audit_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("occurred_at", sa.DateTime(), nullable=False),
+        sa.Column("actor_id", sa.Integer(), nullable=True),
+        sa.Column("source", sa.String(length=20), nullable=False),
+        sa.Column("action", sa.String(length=50), nullable=False),
+        sa.Column("target_type", sa.String(length=50), nullable=False),
+        sa.Column("target_id", sa.Integer(), nullable=True),
+        sa.Column("job_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("before", sa.Text(), nullable=True),
+        sa.Column("after", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_audit_events_job", "audit_events", ["job_id", "id"])
+    op.create_index("ix_audit_events_user", "audit_events", ["user_id", "id"])
+    op.create_index("ix_audit_events_actor", "audit_events", ["actor_id", "id"])
+    op.create_index("ix_audit_events_target", "audit_events", ["target_type", "target_id", "id"])
+    op.create_index("ix_audit_events_occurred", "audit_events", ["occurred_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_audit_events_occurred", table_name="audit_events")
+    op.drop_index("ix_audit_events_target", table_name="audit_events")
+    op.drop_index("ix_audit_events_actor", table_name="audit_events")
+    op.drop_index("ix_audit_events_user", table_name="audit_events")
+    op.drop_index("ix_audit_events_job", table_name="audit_events")
+    op.drop_table("audit_events")
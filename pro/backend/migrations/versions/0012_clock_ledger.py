@@ -0,0 +1,94 @@
+"""Time clock ledger and its projections
+
+Existing time entries become clock_in (and clock_out) events. The projection
+tables start empty with projection_state marked unbuilt; the first server to
+start replays the ledger into them (ledger.ensure_projections).
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "clock_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=20), nullable=False),
+        sa.Column("entry_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("clock_in", sa.DateTime(), nullable=False),
+        sa.Column("clock_out", sa.DateTime(), nullable=True),
+        sa.Column("recorded_at", sa.DateTime(), nullable=False),
+        sa.Column("recorded_by", sa.Integer(), nullable=True),
+        sa.Column("reason", sa.String(length=200), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_clock_events_entry", "clock_events", ["entry_id", "id"])
+    op.create_table(
+        "open_clocks",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("entry_id", sa.Integer(), nullable=False),
+        sa.Column("clock_in", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "job_id"),
+        sa.UniqueConstraint("entry_id"),
+    )
+    op.create_index("ix_open_clocks_job", "open_clocks", ["job_id"])
+    op.create_table(
+        "job_time_totals",
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("closed_seconds", sa.Float(), nullable=False),
+        sa.Column("closed_entries", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("job_id"),
+    )
+    op.create_table(
+        "user_daily_hours",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("seconds", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "day"),
+    )
+    op.create_table(
+        "projection_state",
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("rebuilt_at", sa.DateTime(), nullable=True),
+        sa.Column("last_event_id", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+    # Ledger columns are naive UTC; PostgreSQL stores entries as timestamptz
+    if op.get_bind().dialect.name == "postgresql":
+        clock_in, clock_out = "clock_in AT TIME ZONE 'UTC'", "clock_out AT TIME ZONE 'UTC'"
+    else:
+        clock_in, clock_out = "clock_in", "clock_out"
+    op.execute(f"""
+        INSERT INTO clock_events (kind, entry_id, user_id, job_id, clock_in, clock_out, recorded_at)
+        SELECT 'clock_in', id, user_id, job_id, {clock_in}, NULL, {clock_in}
+        FROM time_entries WHERE clock_in IS NOT NULL ORDER BY id
+    """)
+    op.execute(f"""
+        INSERT INTO clock_events (kind, entry_id, user_id, job_id, clock_in, clock_out, recorded_at)
+        SELECT 'clock_out', id, user_id, job_id, {clock_in}, {clock_out}, {clock_out}
+        FROM time_entries WHERE clock_in IS NOT NULL AND clock_out IS NOT NULL ORDER BY id
+    """)
+    op.execute("INSERT INTO projection_state (name, rebuilt_at, last_event_id) VALUES ('clock', NULL, NULL)")
+
+
+def downgrade() -> None:
+    op.drop_table("projection_state")
+    op.drop_table("user_daily_hours")
+    op.drop_table("job_time_totals")
+    op.drop_index("ix_open_clocks_job", table_name="open_clocks")
+    op.drop_table("open_clocks")
+    op.drop_index("ix_clock_events_entry", table_name="clock_events")
+    op.drop_table("clock_events")
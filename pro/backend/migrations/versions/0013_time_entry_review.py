@@ -0,0 +1,29 @@
+"""Review flag on automatically closed time entries
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("time_entries", sa.Column("review_reason", sa.String(length=100), nullable=True))
+    op.create_index(
+        "ix_time_entries_review", "time_entries", ["clock_in"],
+        postgresql_where=sa.text("review_reason IS NOT NULL"),
+        sqlite_where=sa.text("review_reason IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_time_entries_review", table_name="time_entries")
+    with op.batch_alter_table("time_entries") as batch:
+        batch.drop_column("review_reason")
@@ -1,5 +1,5 @@
 """Database models for HoneyBadger Pro"""
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Text, Float, Index, LargeBinary, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -16,9 +16,10 @@ class User(Base):
     role = Column(String(20), default="basic")  # "admin" or "basic"
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    kiosk_credential_hash = Column(String(64), unique=True, index=True, nullable=True)  # HMAC of badge code/PIN
     
     # Relationships
-    job_assignments = relationship("JobAssignment", back_populates="user")
+    job_assignments = relationship("JobAssignment", back_populates="user", foreign_keys="JobAssignment.user_id")
     time_entries = relationship("TimeEntry", back_populates="user")
     created_jobs = relationship("Job", back_populates="created_by_user")
 
@@ -44,6 +45,17 @@ class Job(Base):
     created_by_user = relationship("User", back_populates="created_jobs")
     assignments = relationship("JobAssignment", back_populates="job", cascade="all, delete-orphan")
     time_entries = relationship("TimeEntry", back_populates="job", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Job board: open jobs newest first
+        Index("ix_jobs_archived_created", "is_archived", "created_at"),
+        # Review queue: only the handful of jobs awaiting approval
+        Index(
+            "ix_jobs_review", "created_at",
+            postgresql_where=text("marked_for_review = true"),
+            sqlite_where=text("marked_for_review = 1"),
+        ),
+    )
 
 
 class JobAssignment(Base):
@@ -59,6 +71,37 @@ class JobAssignment(Base):
     # Relationships
     job = relationship("Job", back_populates="assignments")
     user = relationship("User", back_populates="job_assignments", foreign_keys=[user_id])
+    
+    __table_args__ = (
+        Index("ix_job_assignments_job_user", "job_id", "user_id"),
+        Index("ix_job_assignments_user", "user_id"),
+    )
+
+
+class JobTemplate(Base):
+    """Job template - a repeating job's settings and usual crew, cloned into jobs"""
+    __tablename__ = "job_templates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200), unique=True, nullable=False)
+    job_name = Column(String(200), nullable=False)
+    description = Column(Text, nullable=True)
+    requirements = Column(Text, nullable=True)
+    max_workers = Column(Integer, nullable=False, default=1)
+    auto_review = Column(Boolean, nullable=False, default=False)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    members = relationship("JobTemplateMember", cascade="all, delete-orphan")
+
+
+class JobTemplateMember(Base):
+    """Default crew of a job template - assigned to every job cloned from it"""
+    __tablename__ = "job_template_members"
+    
+    template_id = Column(Integer, ForeignKey("job_templates.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
 
 
 class TimeEntry(Base):
@@ -70,7 +113,192 @@ class TimeEntry(Base):
     job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False)
     clock_in = Column(DateTime(timezone=True), server_default=func.now())
     clock_out = Column(DateTime(timezone=True), nullable=True)
+    review_reason = Column(String(100), nullable=True)  # set when closed automatically
     
     # Relationships
     user = relationship("User", back_populates="time_entries")
     job = relationship("Job", back_populates="time_entries")
+    
+    __table_args__ = (
+        Index("ix_time_entries_job", "job_id"),
+        # Per-user entries in clock-in order (overlap sweep, reports)
+        Index("ix_time_entries_user_clock_in", "user_id", "clock_in"),
+        # Partial index over open entries only (clock-in checks, active clocks)
+        Index(
+            "ix_time_entries_open", "user_id", "job_id",
+            postgresql_where=text("clock_out IS NULL"),
+            sqlite_where=text("clock_out IS NULL"),
+        ),
+        # Entries awaiting review (auto clock-outs) only
+        Index(
+            "ix_time_entries_review", "clock_in",
+            postgresql_where=text("review_reason IS NOT NULL"),
+            sqlite_where=text("review_reason IS NOT NULL"),
+        ),
+    )
+
+
+class SyncedAction(Base):
+    """Offline action replayed through /api/sync - the key makes replays no-ops"""
+    __tablename__ = "synced_actions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String(64), unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    action = Column(String(20), nullable=False)  # "join", "clock_in" or "clock_out"
+    job_id = Column(Integer, nullable=False)
+    client_time = Column(DateTime(timezone=True), nullable=False)  # as sent by the device
+    applied_time = Column(DateTime(timezone=True), nullable=True)  # after skew correction
+    status = Column(String(20), nullable=False)  # "applied" or "rejected"
+    detail = Column(String(200), nullable=True)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IdempotencyKey(Base):
+    """Stored response for a mutation sent with an Idempotency-Key header"""
+    __tablename__ = "idempotency_keys"
+    
+    key_hash = Column(String(64), primary_key=True)  # sha256 of key + caller + method + path
+    request_hash = Column(String(64), nullable=False)  # sha256 of the body, to catch reused keys
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is running
+    content_type = Column(String(100), nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, nullable=False)  # naive UTC, compared by the expiry sweep
+    
+    __table_args__ = (
+        Index("ix_idempotency_keys_created", "created_at"),
+    )
+
+
+class UserSession(Base):
+    """Login session - one per device, renewed with a rotating refresh token"""
+    __tablename__ = "sessions"
+    
+    id = Column(String(32), primary_key=True)  # "sid" claim in access tokens
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    refresh_token_hash = Column(String(64), nullable=False)  # sha256 of the current secret
+    previous_token_hash = Column(String(64), nullable=True)  # the one it replaced
+    created_at = Column(DateTime, nullable=False)  # naive UTC, like the other times below
+    rotated_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_sessions_user", "user_id"),
+    )
+
+
+class BackgroundTask(Base):
+    """Heavy admin operation run off the request path - status and stored result"""
+    __tablename__ = "background_tasks"
+    
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(50), nullable=False)  # registered name, e.g. "payroll_report"
+    params = Column(Text, nullable=False)  # JSON
+    status = Column(String(20), nullable=False)  # queued, running, succeeded, failed, cancelled
+    progress = Column(Float, nullable=True)  # 0..1 when the task reports it
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    result = Column(LargeBinary, nullable=True)
+    result_content_type = Column(String(100), nullable=True)
+    error = Column(Text, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    # Naive UTC; heartbeat_at is touched while running so dead workers' tasks can be failed
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_background_tasks_created", "created_at"),
+        Index("ix_background_tasks_status", "status"),
+    )
+
+
+class AuditEvent(Base):
+    """Append-only record of a change: who did what to which row, before and after"""
+    __tablename__ = "audit_events"
+    
+    id = Column(Integer, primary_key=True)
+    occurred_at = Column(DateTime, nullable=False)  # naive UTC
+    actor_id = Column(Integer, nullable=True)  # user who made the change; NULL for the system
+    source = Column(String(20), nullable=False)  # "api", "sync", "kiosk" or "system"
+    action = Column(String(50), nullable=False)  # e.g. "clock_out", "job.update"
+    target_type = Column(String(50), nullable=False)  # table name
+    target_id = Column(Integer, nullable=True)
+    # The job and user the change concerns, for "what happened to job X / user Y"
+    job_id = Column(Integer, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    before = Column(Text, nullable=True)  # JSON of changed columns; NULL for creates
+    after = Column(Text, nullable=True)  # JSON; NULL for deletes
+    
+    # No foreign keys: events outlive the users and jobs they mention
+    __table_args__ = (
+        Index("ix_audit_events_job", "job_id", "id"),
+        Index("ix_audit_events_user", "user_id", "id"),
+        Index("ix_audit_events_actor", "actor_id", "id"),
+        Index("ix_audit_events_target", "target_type", "target_id", "id"),
+        Index("ix_audit_events_occurred", "occurred_at"),
+    )
+
+
+class ClockEvent(Base):
+    """Append-only time clock ledger (see ledger.py) - never updated or deleted"""
+    __tablename__ = "clock_events"
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)  # "clock_in", "clock_out", "correct" or "void"
+    entry_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    job_id = Column(Integer, nullable=False)
+    # The entry's times after this event (naive UTC), so its latest event is its state
+    clock_in = Column(DateTime, nullable=False)
+    clock_out = Column(DateTime, nullable=True)
+    recorded_at = Column(DateTime, nullable=False)
+    recorded_by = Column(Integer, nullable=True)  # admin who corrected/voided
+    reason = Column(String(200), nullable=True)
+    
+    __table_args__ = (
+        # Latest event per entry (projection rebuilds, entry history)
+        Index("ix_clock_events_entry", "entry_id", "id"),
+    )
+
+
+class OpenClock(Base):
+    """Projection of the clock ledger: one row per clock currently open"""
+    __tablename__ = "open_clocks"
+    
+    user_id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, primary_key=True)
+    entry_id = Column(Integer, nullable=False, unique=True)
+    clock_in = Column(DateTime, nullable=False)  # naive UTC
+    
+    __table_args__ = (
+        Index("ix_open_clocks_job", "job_id"),
+    )
+
+
+class JobTimeTotal(Base):
+    """Projection of the clock ledger: closed time per job"""
+    __tablename__ = "job_time_totals"
+    
+    job_id = Column(Integer, primary_key=True)
+    closed_seconds = Column(Float, nullable=False, default=0)
+    closed_entries = Column(Integer, nullable=False, default=0)
+
+
+class UserDailyHours(Base):
+    """Projection of the clock ledger: closed time per user per shop-local day"""
+    __tablename__ = "user_daily_hours"
+    
+    user_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)  # in SHOP_TIMEZONE
+    seconds = Column(Float, nullable=False, default=0)
+
+
+class ProjectionState(Base):
+    """When a set of projections was last rebuilt from its ledger"""
+    __tablename__ = "projection_state"
+    
+    name = Column(String(50), primary_key=True)  # e.g. "clock"
+    rebuilt_at = Column(DateTime, nullable=True)  # NULL: never built; rebuilt at startup
+    last_event_id = Column(Integer, nullable=True)  # newest event folded in by that rebuild
@@ -0,0 +1,244 @@
+"""Overlapping clocks: detection and fair time attribution
+
+Workers can be clocked in to several jobs at once, so adding up each job's
+entries counts those hours once per job. OverlapSweep walks a user's entries
+in clock-in order with a sweep line (a heap of the active entries' ends):
+between two consecutive start/end points the same k entries are open, so the
+stretch is worked time once, clocked time k times, and each of those jobs is
+apportioned 1/k of it.
+
+Entries must arrive ordered by (user_id, clock_in); memory is bounded by the
+most clocks a user has open at once, so millions of rows stream through in a
+single pass.
+"""
+import heapq
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from models import Job, TimeEntry, User
+from timeclock import epoch_seconds
+
+# Rows fetched per round trip when streaming entries
+STREAM_BATCH = 5000
+# Overlap periods kept for a report; totals always cover everything
+MAX_PERIODS = 1000
+
+
+class UserTotals:
+    __slots__ = ("clocked_seconds", "worked_seconds", "overlap_seconds", "overlap_periods")
+
+    def __init__(self):
+        self.clocked_seconds = 0.0  # sum of entry lengths
+        self.worked_seconds = 0.0  # union of entries: time actually on the clock
+        self.overlap_seconds = 0.0  # time with two or more clocks open
+        self.overlap_periods = 0
+
+
+class OverlapSweep:
+    """Single-pass sweep over entries ordered by (user_id, start)"""
+
+    def __init__(self, keep_periods: int = 0):
+        self.job_raw = defaultdict(float)  # job_id -> sum of entry lengths
+        self.job_apportioned = defaultdict(float)  # job_id -> fair share
+        self.users = defaultdict(UserTotals)
+        self.periods = []  # (user_id, start, end, [job_ids]) of overlaps
+        self.keep_periods = keep_periods
+        # user_id -> jobs of the user's still-open entries (clock_out NULL)
+        self.open_jobs = defaultdict(list)
+        self._user_id = None
+        self._active = []  # heap of (end, seq, job_id, is_open)
+        self._seq = 0
+        self._cursor = 0.0
+        self._period = None  # overlap period being extended: [start, end, job_ids]
+
+    def add(self, user_id: int, job_id: int, start: float, end: float, is_open: bool = False) -> None:
+        """Feed one entry (times in epoch seconds)"""
+        if user_id != self._user_id:
+            self._finish_user()
+            self._user_id = user_id
+        if end < start:
+            end = start
+        self.job_raw[job_id] += end - start
+        self.users[user_id].clocked_seconds += end - start
+        self._advance(start)
+        if not self._active:
+            # Nothing open (first entry, or all ended before start): skip the gap
+            self._cursor = start
+        self._seq += 1
+        heapq.heappush(self._active, (end, self._seq, job_id, is_open))
+        if is_open:
+            self.open_jobs[user_id].append(job_id)
+
+    def finish(self) -> "OverlapSweep":
+        """Flush the last user; call once after the final add()"""
+        self._finish_user()
+        self._user_id = None
+        return self
+
+    def _finish_user(self) -> None:
+        if self._active:
+            self._advance(max(end for end, _, _, _ in self._active))
+        self._close_period()
+
+    def _advance(self, to: float) -> None:
+        """Move the sweep line to `to`, attributing each stretch on the way"""
+        active = self._active
+        totals = self.users[self._user_id]
+        while active and self._cursor < to:
+            step_end = min(active[0][0], to)
+            length = step_end - self._cursor
+            k = len(active)
+            if length > 0:
+                share = length / k
+                for _, _, job_id, _ in active:
+                    self.job_apportioned[job_id] += share
+                totals.worked_seconds += length
+                if k > 1:
+                    totals.overlap_seconds += length
+                    self._extend_period(self._cursor, step_end, active)
+                else:
+                    self._close_period()
+            self._cursor = step_end
+            while active and active[0][0] <= self._cursor:
+                heapq.heappop(active)
+        if not active:
+            self._close_period()
+
+    def _extend_period(self, start: float, end: float, active: list) -> None:
+        period = self._period
+        if period is None or period[1] != start:
+            self._close_period()
+            period = self._period = [start, end, set()]
+        period[1] = end
+        if len(self.periods) < self.keep_periods:  # job ids only matter if it is kept
+            period[2].update(job_id for _, _, job_id, _ in active)
+
+    def _close_period(self) -> None:
+        if self._period is None:
+            return
+        start, end, job_ids = self._period
+        self._period = None
+        self.users[self._user_id].overlap_periods += 1
+        if len(self.periods) < self.keep_periods:
+            self.periods.append((self._user_id, start, end, sorted(job_ids)))
+
+
+def stream_entries(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   user_ids=None) -> Iterable[tuple]:
+    """(user_id, job_id, clock_in, clock_out) touching [start, end), in sweep order
+
+    user_ids may be a list or a subquery of user ids.
+    """
+    query = db.query(TimeEntry.user_id, TimeEntry.job_id, TimeEntry.clock_in, TimeEntry.clock_out)
+    if user_ids is not None:
+        query = query.filter(TimeEntry.user_id.in_(user_ids))
+    if start is not None:
+        query = query.filter(or_(TimeEntry.clock_out.is_(None), TimeEntry.clock_out > start))
+    if end is not None:
+        query = query.filter(TimeEntry.clock_in < end)
+    # ix_time_entries_user_clock_in serves the order without a sort
+    return query.order_by(TimeEntry.user_id, TimeEntry.clock_in, TimeEntry.id).yield_per(STREAM_BATCH)
+
+
+def sweep(rows: Iterable[tuple], now: float, window_start: float = None, window_end: float = None,
+          keep_periods: int = 0) -> OverlapSweep:
+    """Run the sweep over streamed rows; open entries run to `now`, all clipped to the window"""
+    engine = OverlapSweep(keep_periods)
+    for user_id, job_id, clock_in, clock_out in rows:
+        if clock_in is None:
+            continue
+        start = epoch_seconds(clock_in)
+        end = epoch_seconds(clock_out) if clock_out is not None else now
+        if window_start is not None:
+            start = max(start, window_start)
+        if window_end is not None:
+            end = min(end, window_end)
+        if end < start or (end == start and clock_out is not None):
+            continue  # outside the window, or zero length
+        engine.add(user_id, job_id, start, end, is_open=clock_out is None)
+    return engine.finish()
+
+
+def apportioned_job_time(db: Session, job_ids: List[int], now: float):
+    """Fair-share time per job, counting overlapping clocks once per person
+
+    Returns (closed seconds up to `now`, open rates) where open rates maps a job
+    to the share of a second each of its open clocks earns from `now` on
+    (1/k while the worker has k clocks open), as [(now, rate), ...].
+    """
+    job_filter = TimeEntry.job_id.in_(job_ids)
+    since = db.query(TimeEntry.clock_in).filter(job_filter).order_by(TimeEntry.clock_in).first()
+    if since is None:
+        return defaultdict(float), defaultdict(list)
+    users = db.query(TimeEntry.user_id).filter(job_filter).distinct().scalar_subquery()
+    engine = sweep(stream_entries(db, start=since[0], user_ids=users), now)
+
+    open_rates = defaultdict(list)
+    for open_jobs in engine.open_jobs.values():
+        for job_id in open_jobs:
+            open_rates[job_id].append((now, 1.0 / len(open_jobs)))
+    return engine.job_apportioned, open_rates
+
+
+def _naive_utc(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+
+def overlap_report(db: Session, start: datetime, end: datetime, user_id: Optional[int] = None,
+                   max_periods: int = MAX_PERIODS) -> dict:
+    """Per-user overlap totals and per-job raw vs apportioned time within [start, end)"""
+    now = min(time.time(), epoch_seconds(end))
+    engine = sweep(
+        stream_entries(db, start, end, [user_id] if user_id is not None else None),
+        now, epoch_seconds(start), epoch_seconds(end), keep_periods=max_periods,
+    )
+    user_names = {}
+    if engine.users:
+        user_names = {
+            uid: (username, initials) for uid, username, initials in
+            db.query(User.id, User.username, User.initials).filter(User.id.in_(list(engine.users))).all()
+        }
+    job_names = {}
+    if engine.job_raw:
+        job_names = dict(db.query(Job.id, Job.job_name).filter(Job.id.in_(list(engine.job_raw))).all())
+
+    return {
+        "start": start,
+        "end": end,
+        "users": [
+            {
+                "user_id": uid,
+                "username": user_names.get(uid, ("", ""))[0],
+                "initials": user_names.get(uid, ("", ""))[1],
+                "clocked_seconds": totals.clocked_seconds,
+                "worked_seconds": totals.worked_seconds,
+                "overlap_seconds": totals.overlap_seconds,
+                "overlap_periods": totals.overlap_periods,
+            }
+            for uid, totals in sorted(engine.users.items())
+        ],
+        "jobs": [
+            {
+                "job_id": job_id,
+                "job_name": job_names.get(job_id, ""),
+                "raw_seconds": raw,
+                "apportioned_seconds": engine.job_apportioned[job_id],
+            }
+            for job_id, raw in sorted(engine.job_raw.items())
+        ],
+        "periods": [
+            {
+                "user_id": uid,
+                "start": _naive_utc(p_start),
+                "end": _naive_utc(p_end),
+                "job_ids": job_ids,
+            }
+            for uid, p_start, p_end, job_ids in engine.periods
+        ],
+        "periods_truncated": sum(t.overlap_periods for t in engine.users.values()) > len(engine.periods),
+    }
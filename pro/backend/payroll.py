@@ -0,0 +1,229 @@
+"""Payroll: regular and overtime hours per worker for a pay period
+
+Each user's entries are streamed in clock-in order (see overlap.py) and
+merged where they overlap, so a worker clocked in to two jobs is paid once
+for that time. The merged intervals are split at the shop's local midnights,
+precomputed for the period in SHOP_TIMEZONE so DST days are 23 or 25 hours,
+and the daily totals are then run through the overtime rules:
+
+  * hours past daily_overtime_hours in a day are overtime, past
+    daily_double_time_hours double time
+  * regular hours past weekly_overtime_hours in a workweek become overtime
+
+A threshold of 0 turns that rule off. Workweeks start on
+PAYROLL_WEEK_START_DAY; a week cut by the period boundary only counts the
+days inside the period.
+"""
+import time
+from bisect import bisect_right
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.orm import Session
+
+from config import (
+    SHOP_TIMEZONE, PAYROLL_DAILY_OVERTIME_HOURS, PAYROLL_DAILY_DOUBLE_TIME_HOURS,
+    PAYROLL_WEEKLY_OVERTIME_HOURS, PAYROLL_WEEK_START_DAY
+)
+from models import User
+from overlap import stream_entries
+from timeclock import epoch_seconds
+
+
+class OvertimeRules(NamedTuple):
+    daily_overtime_hours: float = PAYROLL_DAILY_OVERTIME_HOURS
+    daily_double_time_hours: float = PAYROLL_DAILY_DOUBLE_TIME_HOURS
+    weekly_overtime_hours: float = PAYROLL_WEEKLY_OVERTIME_HOURS
+    week_start_day: int = PAYROLL_WEEK_START_DAY  # 0 = Monday
+
+
+class PayTotals:
+    __slots__ = ("regular_seconds", "overtime_seconds", "double_time_seconds", "entries", "open_entries", "days")
+
+    def __init__(self):
+        self.regular_seconds = 0.0
+        self.overtime_seconds = 0.0
+        self.double_time_seconds = 0.0
+        self.entries = 0
+        self.open_entries = 0  # still clocked in; counted up to now
+        self.days = None  # worked seconds per day, if requested
+
+
+class PayPeriod:
+    """Local days of a pay period: first_day through last_day inclusive"""
+
+    def __init__(self, first_day: date, last_day: date, tz: ZoneInfo, week_start_day: int):
+        self.days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+        # Epoch seconds of each local midnight, plus the one ending the period
+        self.midnights = [
+            datetime.combine(day, dt_time(), tz).timestamp()
+            for day in self.days + [last_day + timedelta(days=1)]
+        ]
+        first_week = first_day - timedelta(days=(first_day.weekday() - week_start_day) % 7)
+        self.week_of_day = [(day - first_week).days // 7 for day in self.days]
+
+    @property
+    def start(self) -> float:
+        return self.midnights[0]
+
+    @property
+    def end(self) -> float:
+        return self.midnights[-1]
+
+
+class PayrollCalculator:
+    """Streaming calculator fed intervals ordered by (user_id, start)"""
+
+    def __init__(self, period: PayPeriod, rules: OvertimeRules = OvertimeRules(), keep_days: bool = False):
+        self.period = period
+        self.rules = rules
+        self.keep_days = keep_days
+        self.totals: Dict[int, PayTotals] = {}
+        self._user_id = None
+        self._current = None
+        self._day_seconds = None
+        self._run = None  # merged interval being extended: [start, end]
+        self._period_start = period.start
+        self._period_end = period.end
+
+    def add(self, user_id: int, start: float, end: float, is_open: bool = False) -> None:
+        """Feed one entry (epoch seconds); the caller keeps (user_id, start) order"""
+        if user_id != self._user_id:
+            self._start_user(user_id)
+        totals = self._current
+        totals.entries += 1
+        if is_open:
+            totals.open_entries += 1
+        # Hot path for millions of rows: plain comparisons instead of min()/max()
+        if start < self._period_start:
+            start = self._period_start
+        if end > self._period_end:
+            end = self._period_end
+        if end <= start:
+            return
+        run = self._run
+        if run is not None:
+            if start <= run[1]:
+                if end > run[1]:
+                    run[1] = end
+                return
+            self._split(run[0], run[1])
+        self._run = [start, end]
+
+    def _start_user(self, user_id: int) -> None:
+        self._finish_user()
+        self._user_id = user_id
+        self._day_seconds = [0.0] * len(self.period.days)
+        self._current = self.totals[user_id] = PayTotals()
+
+    def finish(self) -> Dict[int, PayTotals]:
+        """Flush the last user; call once after the final add()"""
+        self._finish_user()
+        self._user_id = None
+        return self.totals
+
+    def _split(self, start: float, end: float) -> None:
+        """Add a merged interval to the local days it covers"""
+        midnights = self.period.midnights
+        day_seconds = self._day_seconds
+        index = bisect_right(midnights, start) - 1
+        while start < end:
+            boundary = midnights[index + 1]
+            if end <= boundary:
+                day_seconds[index] += end - start
+                return
+            day_seconds[index] += boundary - start
+            start = boundary
+            index += 1
+
+    def _finish_user(self) -> None:
+        if self._user_id is None:
+            return
+        if self._run is not None:
+            self._split(*self._run)
+            self._run = None
+        totals = self.totals[self._user_id]
+        apply_overtime(self._day_seconds, self.period.week_of_day, self.rules, totals)
+        if self.keep_days:
+            totals.days = self._day_seconds
+
+
+def apply_overtime(day_seconds: List[float], week_of_day: List[int], rules: OvertimeRules,
+                   totals: PayTotals) -> None:
+    """Split worked seconds per day into regular/overtime/double time"""
+    daily_ot = rules.daily_overtime_hours * 3600 or float("inf")
+    daily_dt = rules.daily_double_time_hours * 3600 or float("inf")
+    weekly_ot = rules.weekly_overtime_hours * 3600 or float("inf")
+    week, week_regular = None, 0.0
+    for seconds, week_index in zip(day_seconds, week_of_day):
+        if week_index != week:
+            week, week_regular = week_index, 0.0
+        if not seconds:
+            continue
+        double_time = max(0.0, seconds - daily_dt)
+        overtime = max(0.0, min(seconds, daily_dt) - daily_ot)
+        regular = seconds - double_time - overtime
+        # Regular hours beyond the weekly threshold are overtime too
+        weekly_excess = max(0.0, week_regular + regular - weekly_ot)
+        regular -= weekly_excess
+        overtime += weekly_excess
+        week_regular += regular
+        totals.regular_seconds += regular
+        totals.overtime_seconds += overtime
+        totals.double_time_seconds += double_time
+
+
+def calculate(rows: Iterable[tuple], period: PayPeriod, now: float, rules: OvertimeRules = OvertimeRules(),
+              keep_days: bool = False) -> Dict[int, PayTotals]:
+    """Run (user_id, job_id, clock_in, clock_out) rows in sweep order through the calculator"""
+    calculator = PayrollCalculator(period, rules, keep_days)
+    add = calculator.add
+    for user_id, _job_id, clock_in, clock_out in rows:
+        if clock_out is None:
+            add(user_id, epoch_seconds(clock_in), now, True)
+        else:
+            add(user_id, epoch_seconds(clock_in), epoch_seconds(clock_out))
+    return calculator.finish()
+
+
+def payroll_report(db: Session, first_day: date, last_day: date, user_id: Optional[int] = None,
+                   include_days: bool = False, rules: OvertimeRules = OvertimeRules()) -> dict:
+    """Regular/overtime totals per user for local days first_day..last_day"""
+    tz = ZoneInfo(SHOP_TIMEZONE)
+    period = PayPeriod(first_day, last_day, tz, rules.week_start_day)
+    start = datetime.fromtimestamp(period.start, timezone.utc).replace(tzinfo=None)
+    end = datetime.fromtimestamp(period.end, timezone.utc).replace(tzinfo=None)
+    rows = stream_entries(db, start, end, [user_id] if user_id is not None else None)
+    results = calculate(rows, period, time.time(), rules, include_days)
+
+    users = {}
+    if results:
+        users = {
+            uid: (username, initials) for uid, username, initials in
+            db.query(User.id, User.username, User.initials).filter(User.id.in_(list(results))).all()
+        }
+    return {
+        "first_day": first_day,
+        "last_day": last_day,
+        "timezone": SHOP_TIMEZONE,
+        "rules": rules._asdict(),
+        "users": [
+            {
+                "user_id": uid,
+                "username": users.get(uid, ("", ""))[0],
+                "initials": users.get(uid, ("", ""))[1],
+                "regular_seconds": totals.regular_seconds,
+                "overtime_seconds": totals.overtime_seconds,
+                "double_time_seconds": totals.double_time_seconds,
+                "total_seconds": totals.regular_seconds + totals.overtime_seconds + totals.double_time_seconds,
+                "entries": totals.entries,
+                "open_entries": totals.open_entries,
+                "days": (
+                    [{"day": day, "seconds": seconds} for day, seconds in zip(period.days, totals.days)]
+                    if include_days else None
+                ),
+            }
+            for uid, totals in sorted(results.items())
+        ],
+    }
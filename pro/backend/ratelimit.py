@@ -0,0 +1,196 @@
+"""Per-client rate limits and admission control for /api requests
+
+Rate limits: every client gets two token buckets, one for reads (GET/HEAD)
+and one for mutations, refilled continuously up to a burst size (a rate of 0
+turns that limit off). A client is its user (from a valid bearer token) or,
+without one, its IP address, so one stuck tablet script can only spend its
+own budget. Over budget: 429 with Retry-After.
+
+Admission control: when the database pool is busy, reads are shed before
+they take a connection, lowest priority first - archive, search, reports and
+payroll once the pool is ADMISSION_SHED_LOW_AT full (or too many of them are
+already running), ordinary reads only when every connection is checked out.
+Mutations (clock in/out, join, sync, kiosk) and clock/auth reads are never
+shed. Shed requests get 503 with Retry-After.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from jose import JWTError, jwt
+
+from config import (
+    SECRET_KEY, ALGORITHM,
+    RATE_LIMIT_READS_PER_SECOND, RATE_LIMIT_READ_BURST,
+    RATE_LIMIT_WRITES_PER_SECOND, RATE_LIMIT_WRITE_BURST,
+    ADMISSION_SHED_LOW_AT, ADMISSION_LOW_PRIORITY_CONCURRENCY
+)
+from database import engine
+
+READ_METHODS = ("GET", "HEAD")
+MAX_CLIENTS = 10000  # buckets kept; the least recently seen are dropped
+
+HIGH = "high"
+NORMAL = "normal"
+LOW = "low"
+
+# Kiosks punch for a whole shift from one address; they have their own
+# failed-scan throttle (kiosk.py)
+_EXEMPT = ("/api/kiosk/",)
+# Reads that must stay fast whatever the load
+_HIGH_PRIORITY_READS = ("/api/time/", "/api/auth/")
+# Reads that can wait: large scans and admin reporting
+_LOW_PRIORITY_READS = (
+    "/api/jobs/archived", "/api/jobs/search", "/api/reports/", "/api/payroll",
+    "/api/tasks", "/api/admin/", "/api/audit",
+)
+
+
+def read_priority(path: str) -> str:
+    if path.startswith(_HIGH_PRIORITY_READS):
+        return HIGH
+    if path.startswith(_LOW_PRIORITY_READS):
+        return LOW
+    return NORMAL
+
+
+class TokenBuckets:
+    """Token bucket per client key, bounded LRU"""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # key -> [tokens, last refill (monotonic)]
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Spend one token; returns 0, or seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+
+def pool_utilization() -> float:
+    """Fraction of the pool's connections (including overflow) checked out"""
+    pool = engine.pool
+    try:
+        capacity = pool.size() + max(0, getattr(pool, "_max_overflow", 0))
+        return pool.checkedout() / capacity if capacity else 0.0
+    except (AttributeError, NotImplementedError):
+        return 0.0  # pool without these counters (e.g. StaticPool)
+
+
+class Limiter:
+    """Buckets, in-flight count and counters shared by the middleware"""
+
+    def __init__(self):
+        self.reads = TokenBuckets(RATE_LIMIT_READS_PER_SECOND, RATE_LIMIT_READ_BURST)
+        self.writes = TokenBuckets(RATE_LIMIT_WRITES_PER_SECOND, RATE_LIMIT_WRITE_BURST)
+        self._lock = threading.Lock()
+        self._low_in_flight = 0
+        self._stats = {"rate_limited": 0, "shed_low": 0, "shed_normal": 0}
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {**self._stats, "low_priority_in_flight": self._low_in_flight,
+                    "pool_utilization": round(pool_utilization(), 2)}
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def admit_low(self, utilization: float) -> bool:
+        """Take a low-priority slot if the pool and the slot count allow it"""
+        with self._lock:
+            if utilization < ADMISSION_SHED_LOW_AT and self._low_in_flight < ADMISSION_LOW_PRIORITY_CONCURRENCY:
+                self._low_in_flight += 1
+                return True
+            self._stats["shed_low"] += 1
+            return False
+
+    def release_low(self) -> None:
+        with self._lock:
+            self._low_in_flight -= 1
+
+
+limiter = Limiter()
+
+
+class RateLimitMiddleware:
+    """ASGI middleware: per-client token buckets, then priority-based shedding"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith("/api/") or path.startswith(_EXEMPT):
+            return await self.app(scope, receive, send)
+
+        is_read = scope["method"] in READ_METHODS
+        buckets = limiter.reads if is_read else limiter.writes
+        if buckets.rate > 0:
+            wait = buckets.take(_client_key(scope))
+            if wait:
+                limiter.count("rate_limited")
+                return await _reject(send, 429, "Too many requests, slow down", wait)
+
+        if not is_read:
+            return await self.app(scope, receive, send)
+        priority = read_priority(path)
+        if priority == HIGH:
+            return await self.app(scope, receive, send)
+        utilization = pool_utilization()
+        if priority == NORMAL:
+            if utilization >= 1.0:
+                limiter.count("shed_normal")
+                return await _reject(send, 503, "Server busy, try again shortly", 1)
+            return await self.app(scope, receive, send)
+
+        if not limiter.admit_low(utilization):
+            return await _reject(send, 503, "Server busy, try again shortly", 2)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release_low()
+
+
+def _client_key(scope) -> str:
+    """"u:<username>" for a valid bearer token, else "ip:<address>" """
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    username = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+                except JWTError:
+                    username = None
+                if username:
+                    return f"u:{username}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+async def _reject(send, status_code: int, detail: str, retry_after: float):
+    body = ('{"detail": "%s"}' % detail).encode()
+    await send({"type": "http.response.start", "status": status_code, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
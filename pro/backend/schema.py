@@ -0,0 +1,94 @@
+"""Schema revision checks and migrations (Alembic)
+
+Worker startup only runs check_schema(): one SELECT against alembic_version
+compared with the newest file in migrations/versions. Alembic itself (about
+100 ms of imports) is only loaded when there is something to migrate.
+"""
+import os
+import re
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+from config import AUTO_MIGRATE
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+VERSIONS_DIR = os.path.join(BACKEND_DIR, "migrations", "versions")
+
+# Revision matching the tables create_all() built before migrations existed
+BASELINE_REVISION = "0001"
+
+_REVISION_RE = re.compile(r'^revision\s*=\s*["\'](\w+)["\']', re.M)
+_DOWN_REVISION_RE = re.compile(r'^down_revision\s*=\s*["\'](\w+)["\']', re.M)
+
+
+def alembic_config(connection=None):
+    """Build an Alembic config that works from any working directory"""
+    from alembic.config import Config
+
+    cfg = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    cfg.attributes["configure_logger"] = False
+    if connection is not None:
+        cfg.attributes["connection"] = connection
+    return cfg
+
+
+def head_revision() -> str:
+    """Latest revision in migrations/versions, read without importing Alembic"""
+    revisions, parents = set(), set()
+    for name in os.listdir(VERSIONS_DIR):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(VERSIONS_DIR, name), encoding="utf-8") as f:
+            source = f.read()
+        match = _REVISION_RE.search(source)
+        if match:
+            revisions.add(match.group(1))
+        parent = _DOWN_REVISION_RE.search(source)
+        if parent:
+            parents.add(parent.group(1))
+    heads = revisions - parents
+    if len(heads) != 1:
+        raise RuntimeError(f"Expected one migration head, found {sorted(heads)}")
+    return heads.pop()
+
+
+def current_revision(engine):
+    """Revision recorded in the database (None if never migrated)"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except DBAPIError:
+        return None
+
+
+def upgrade_database(engine) -> None:
+    """Upgrade to head, stamping databases created by the old create_all()"""
+    from alembic import command
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.begin() as conn:
+        cfg = alembic_config(conn)
+        if MigrationContext.configure(conn).get_current_revision() is None \
+                and inspect(conn).has_table("users"):
+            command.stamp(cfg, BASELINE_REVISION)
+        command.upgrade(cfg, "head")
+
+
+def check_schema(engine) -> None:
+    """Startup check against the stored revision.
+
+    Upgrades in place when AUTO_MIGRATE is on, otherwise refuses to start
+    against a database that is behind the code.
+    """
+    current = current_revision(engine)
+    head = head_revision()
+    if current == head:
+        return
+    if not AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}. "
+            "Run 'alembic upgrade head' from pro/backend."
+        )
+    upgrade_database(engine)
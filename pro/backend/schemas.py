@@ -1,7 +1,7 @@
 """Pydantic schemas for API request/response validation"""
-from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal, Union
+from datetime import date, datetime
 
 
 # ============ User Schemas ============
@@ -29,10 +29,33 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class UserImportRow(BaseModel):
+    line: int  # line in the CSV file; the header is line 1
+    username: Optional[str] = None
+    status: Literal["created", "duplicate", "invalid", "valid"]  # valid: dry run only
+    detail: Optional[str] = None
+    user_id: Optional[int] = None
+
+
+class UserImportResponse(BaseModel):
+    created: int
+    duplicate: int
+    invalid: int
+    valid: int
+    dry_run: bool
+    rows: List[UserImportRow]
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
     user: UserResponse
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # access token lifetime, seconds
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 # ============ Job Schemas ============
@@ -92,12 +115,76 @@ class JobResponse(BaseModel):
     completed_at: Optional[datetime]
     current_workers: int = 0
     assignments: List[JobAssignmentResponse] = []
+    # Median / 90th percentile total time of similar archived jobs (open jobs only)
+    estimated_total_seconds: Optional[float] = None
+    estimated_total_seconds_p90: Optional[float] = None
+    estimate_samples: int = 0
     total_time_seconds: float = 0
     
     class Config:
         from_attributes = True
 
 
+class JobCardResponse(BaseModel):
+    # Compact job for board cards (view=card)
+    id: int
+    job_name: str
+    max_workers: int
+    is_complete: bool
+    is_archived: bool
+    marked_for_review: bool
+    completed_at: Optional[datetime]
+    current_workers: int = 0
+    clocked_in_workers: int = 0
+    total_time_seconds: float = 0
+
+
+# ============ Job Template Schemas ============
+
+class JobTemplateCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200)
+    job_name: str = Field(..., min_length=1, max_length=200)
+    description: Optional[str] = None
+    requirements: Optional[str] = None
+    max_workers: int = 1
+    auto_review: bool = False
+    user_ids: List[int] = []  # default crew
+
+
+class JobTemplateUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=200)
+    job_name: Optional[str] = Field(None, min_length=1, max_length=200)
+    description: Optional[str] = None
+    requirements: Optional[str] = None
+    max_workers: Optional[int] = None
+    auto_review: Optional[bool] = None
+    user_ids: Optional[List[int]] = None  # replaces the crew
+
+
+class JobTemplateResponse(BaseModel):
+    id: int
+    name: str
+    job_name: str
+    description: Optional[str]
+    requirements: Optional[str]
+    max_workers: int
+    auto_review: bool
+    created_by: Optional[int]
+    created_at: datetime
+    user_ids: List[int] = []
+
+
+class JobClone(BaseModel):
+    count: int = Field(1, ge=1, le=100)
+    user_ids: Optional[List[int]] = None  # None: the source's crew; []: nobody
+    job_name: Optional[str] = Field(None, min_length=1, max_length=200)  # default: the source's
+
+
+class JobCloneResponse(BaseModel):
+    job_ids: List[int]
+    assigned: int  # assignments created across all the new jobs
+
+
 # ============ Time Entry Schemas ============
 
 class ClockIn(BaseModel):
@@ -115,3 +202,263 @@ class ActiveClockResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class EntryCorrection(BaseModel):
+    # Omitted times stay as they are; void removes the entry altogether
+    clock_in: Optional[datetime] = None
+    clock_out: Optional[datetime] = None
+    void: bool = False
+    reason: Optional[str] = Field(None, max_length=200)
+
+
+class FlaggedEntryResponse(BaseModel):
+    # Entry closed automatically, waiting for an admin to correct or accept it
+    id: int
+    user_id: int
+    username: str
+    initials: str
+    job_id: int
+    job_name: str
+    clock_in: datetime
+    clock_out: Optional[datetime]
+    review_reason: str
+
+
+class ClockEventResponse(BaseModel):
+    id: int
+    kind: Literal["clock_in", "clock_out", "correct", "void"]
+    entry_id: int
+    user_id: int
+    job_id: int
+    clock_in: datetime  # the entry's times after this event
+    clock_out: Optional[datetime] = None
+    recorded_at: datetime
+    recorded_by: Optional[int] = None
+    reason: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+
+# ============ Dashboard Schemas ============
+
+class ArchivedJobsPage(BaseModel):
+    items: List[Union[JobResponse, JobCardResponse]]
+    total: int
+    limit: int
+    offset: int
+
+
+class DashboardResponse(BaseModel):
+    # Job lists are JobCardResponse with view=card
+    jobs: List[Union[JobResponse, JobCardResponse]]
+    archived: ArchivedJobsPage
+    active_clocks: List[ActiveClockResponse]
+    my_jobs: List[Union[JobResponse, JobCardResponse]]  # only the caller's own assignment per job
+    review_queue: Optional[List[Union[JobResponse, JobCardResponse]]] = None  # admins only
+    users: Optional[List[UserResponse]] = None  # admins only
+
+
+# ============ Offline Sync Schemas ============
+
+class QueuedAction(BaseModel):
+    idempotency_key: str = Field(..., min_length=8, max_length=64)
+    action: Literal["join", "clock_in", "clock_out"]
+    job_id: int
+    client_time: datetime  # device clock when the action was taken
+
+
+class SyncRequest(BaseModel):
+    sent_at: datetime  # device clock at upload, used to correct skew
+    actions: List[QueuedAction] = Field(..., max_length=500)
+
+
+class SyncResult(BaseModel):
+    idempotency_key: str
+    status: Literal["applied", "rejected", "duplicate"]
+    detail: Optional[str] = None
+
+
+class SyncResponse(BaseModel):
+    results: List[SyncResult]
+
+
+# ============ Kiosk Schemas ============
+
+class KioskPunch(BaseModel):
+    credential: str = Field(..., max_length=128)  # badge code or PIN
+    job_id: Optional[int] = None
+
+
+class KioskJob(BaseModel):
+    id: int
+    job_name: str
+    is_clocked_in: bool
+
+
+class KioskPunchResponse(BaseModel):
+    status: Literal["clock_in", "clock_out", "choose_job"]
+    username: str
+    initials: str
+    job_id: Optional[int] = None
+    job_name: Optional[str] = None
+    at: Optional[datetime] = None
+    jobs: Optional[List[KioskJob]] = None  # only with "choose_job"
+
+
+class KioskCredential(BaseModel):
+    credential: str = Field(..., min_length=4, max_length=128)
+
+
+# ============ Report Schemas ============
+
+class UserOverlapTotals(BaseModel):
+    user_id: int
+    username: str
+    initials: str
+    clocked_seconds: float  # sum of entry lengths
+    worked_seconds: float  # time on the clock, overlaps counted once
+    overlap_seconds: float  # time with two or more clocks open
+    overlap_periods: int
+
+
+class JobTimeSplit(BaseModel):
+    job_id: int
+    job_name: str
+    raw_seconds: float
+    apportioned_seconds: float  # overlapping time split evenly between the jobs
+
+
+class OverlapPeriod(BaseModel):
+    user_id: int
+    start: datetime
+    end: datetime
+    job_ids: List[int]
+
+
+class OverlapReport(BaseModel):
+    start: datetime
+    end: datetime
+    users: List[UserOverlapTotals]
+    jobs: List[JobTimeSplit]
+    periods: List[OverlapPeriod]
+    periods_truncated: bool = False
+
+
+class DurationEstimate(BaseModel):
+    p50_seconds: float
+    p90_seconds: float
+    samples: int
+
+
+class JobKindDurations(DurationEstimate):
+    kind: str
+
+
+class WorkerDurations(BaseModel):
+    user_id: int
+    username: str
+    initials: str
+    jobs: int
+    entries: int
+    total_seconds: float
+    p50_job_seconds: float  # time put into one job
+    p90_job_seconds: float
+
+
+class DurationReport(BaseModel):
+    refreshed_at: Optional[datetime]
+    refresh_seconds: float
+    entries: int
+    jobs: int
+    overall: Optional[DurationEstimate]
+    kinds: List[JobKindDurations]
+    workers: List[WorkerDurations]
+
+
+class DailyHours(BaseModel):
+    day: date
+    seconds: float
+
+
+class UserDailyHoursReport(BaseModel):
+    user_id: int
+    username: str
+    initials: str
+    total_seconds: float
+    days: List[DailyHours]  # only days with closed time
+
+
+# ============ Payroll Schemas ============
+
+class PayrollDay(BaseModel):
+    day: date
+    seconds: float
+
+
+class PayrollRules(BaseModel):
+    daily_overtime_hours: float
+    daily_double_time_hours: float
+    weekly_overtime_hours: float
+    week_start_day: int
+
+
+class PayrollUser(BaseModel):
+    user_id: int
+    username: str
+    initials: str
+    regular_seconds: float
+    overtime_seconds: float
+    double_time_seconds: float
+    total_seconds: float  # overlapping clocks counted once
+    entries: int
+    open_entries: int  # still clocked in, counted up to now
+    days: Optional[List[PayrollDay]] = None
+
+
+class PayrollReport(BaseModel):
+    first_day: date
+    last_day: date
+    timezone: str
+    rules: PayrollRules
+    users: List[PayrollUser]
+
+
+# ============ Background Task Schemas ============
+
+class TaskCreate(BaseModel):
+    kind: str
+    params: dict = {}
+
+
+class TaskResponse(BaseModel):
+    id: str
+    kind: str
+    params: dict
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"]
+    progress: Optional[float] = None
+    cancel_requested: bool = False
+    error: Optional[str] = None
+    created_by: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result_content_type: Optional[str] = None  # set once a result is stored
+
+
+# ============ Audit Schemas ============
+
+class AuditEventResponse(BaseModel):
+    id: int
+    occurred_at: datetime
+    actor_id: Optional[int] = None  # None: the system, or self-registration
+    actor_username: Optional[str] = None
+    source: Literal["api", "sync", "kiosk", "system"]
+    action: str
+    target_type: str
+    target_id: Optional[int] = None
+    job_id: Optional[int] = None
+    user_id: Optional[int] = None
+    before: Optional[dict] = None  # changed columns; None for creates
+    after: Optional[dict] = None  # None for deletes
@@ -0,0 +1,99 @@
+"""Full-text job search
+
+Backed by the index from migration 0006: a weighted tsvector column with a
+GIN index on PostgreSQL, an FTS5 table on SQLite. Every search word is
+matched as a prefix, so "AB-12" finds part AB-1234. Matches in the job name
+rank above description matches, which rank above requirements.
+"""
+import re
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from board import job_query, VIEW_FULL
+from models import Job
+
+STATE_ALL = "all"
+STATE_OPEN = "open"
+STATE_REVIEW = "review"
+STATE_ARCHIVED = "archived"
+
+_STATE_FILTERS = {
+    STATE_ALL: "",
+    STATE_OPEN: "AND jobs.is_archived = :false AND jobs.marked_for_review = :false",
+    STATE_REVIEW: "AND jobs.marked_for_review = :true",
+    STATE_ARCHIVED: "AND jobs.is_archived = :true",
+}
+
+# Words are letters/digits plus the joiners used in part numbers
+_TERM_RE = re.compile(r"[\w-]+")
+MAX_TERMS = 8
+
+_PG_SEARCH = """
+    SELECT jobs.id
+    FROM jobs, to_tsquery('simple', :query) AS query
+    WHERE jobs.search_vector @@ query {state}
+    ORDER BY ts_rank_cd(jobs.search_vector, query) DESC, jobs.id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+# bm25() is lower-is-better; column weights favour name, then description
+_SQLITE_SEARCH = """
+    SELECT jobs.id
+    FROM jobs_fts JOIN jobs ON jobs.id = jobs_fts.rowid
+    WHERE jobs_fts MATCH :query {state}
+    ORDER BY bm25(jobs_fts, 10.0, 4.0, 2.0), jobs.id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+
+def search_terms(q: str) -> List[str]:
+    """Words of a query, with leading/trailing joiners dropped"""
+    terms = [term.strip("-_") for term in _TERM_RE.findall(q.lower())]
+    return [term for term in terms if term][:MAX_TERMS]
+
+
+def _pg_query(terms: List[str]) -> str:
+    # Hyphenated terms are split by the tsquery parser, like they were when indexed
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def _sqlite_query(terms: List[str]) -> str:
+    # A quoted term is a phrase: "ab-12"* matches "ab" followed by a word starting "12"
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_job_ids(db: Session, q: str, state: str = STATE_ALL,
+                   limit: int = 20, offset: int = 0) -> List[int]:
+    """Ids of matching jobs, best match first"""
+    terms = search_terms(q)
+    if not terms:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        sql, query = _PG_SEARCH, _pg_query(terms)
+    else:
+        sql, query = _SQLITE_SEARCH, _sqlite_query(terms)
+    rows = db.execute(text(sql.format(state=_STATE_FILTERS[state])), {
+        "query": query, "limit": limit, "offset": offset, "true": True, "false": False,
+    })
+    return [job_id for (job_id,) in rows]
+
+
+def search_jobs(db: Session, q: str, state: str = STATE_ALL, limit: int = 20,
+                offset: int = 0, view: str = VIEW_FULL) -> List[Job]:
+    """Matching jobs, best match first, loaded for the given view"""
+    ids = search_job_ids(db, q, state, limit, offset)
+    if not ids:
+        return []
+    jobs = {job.id: job for job in job_query(db, view).filter(Job.id.in_(ids)).all()}
+    return [jobs[job_id] for job_id in ids if job_id in jobs]
+
+
+def rebuild_index(db: Session) -> None:
+    """Rebuild the search index from the jobs table (caller commits)"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("REINDEX INDEX ix_jobs_search"))
+    else:
+        db.execute(text("INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')"))
+        db.execute(text("INSERT INTO jobs_fts(jobs_fts) VALUES ('optimize')"))
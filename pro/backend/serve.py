@@ -0,0 +1,41 @@
+"""Production server entrypoint - runs several uvicorn worker processes
+
+    python serve.py                    # workers sized to the machine
+    WEB_CONCURRENCY=4 python serve.py  # explicit worker count
+
+Migrations run once here, before the workers start, so each worker's
+startup is only the schema revision check. In SQLite mode a single worker is
+used: SQLite has one writer at a time, and caches are invalidated in-process.
+"""
+import os
+
+import uvicorn
+
+from config import HOST, PORT, WEB_CONCURRENCY, IS_SQLITE
+from database import engine
+from schema import check_schema
+
+# More workers than this mostly adds DB connections, not throughput
+MAX_AUTO_WORKERS = 8
+
+
+def worker_count() -> int:
+    """Number of uvicorn worker processes to run"""
+    if IS_SQLITE:
+        return 1
+    if WEB_CONCURRENCY > 0:
+        return WEB_CONCURRENCY
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    return max(2, min(cpus * 2, MAX_AUTO_WORKERS))
+
+
+def main():
+    check_schema(engine)
+    engine.dispose()  # don't hand pooled connections to the worker processes
+    workers = worker_count()
+    print(f"Starting HoneyBadger Pro on {HOST}:{PORT} with {workers} worker(s)")
+    uvicorn.run("main:app", host=HOST, port=PORT, workers=workers, proxy_headers=True)
+
+
+if __name__ == "__main__":
+    main()
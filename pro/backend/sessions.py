@@ -0,0 +1,125 @@
+"""Login sessions and refresh tokens
+
+A login opens a session row; the client gets a short-lived access token
+carrying the session id ("sid") and a refresh token "<sid>.<secret>". Only a
+hash of the secret is stored. Each refresh replaces the secret, so a stolen
+token stops working once the real client refreshes; presenting a replaced
+secret after the grace period revokes the whole session.
+
+Every authenticated request checks that its session is still live through an
+in-memory cache, cleared whenever any worker commits to the sessions table.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from config import (
+    REFRESH_TOKEN_EXPIRE_DAYS, REFRESH_TOKEN_REUSE_GRACE_SECONDS, SESSION_CACHE_TTL_SECONDS
+)
+from database import SessionLocal
+from invalidation import bus
+from models import UserSession
+
+# sid -> (expires_at monotonic, is_live)
+_live_cache = {}
+_live_cache_lock = threading.Lock()
+_live_cache_generation = 0
+
+
+def _clear_live_cache(table: str = "sessions") -> None:
+    global _live_cache_generation
+    with _live_cache_lock:
+        _live_cache.clear()
+        _live_cache_generation += 1
+
+
+bus.subscribe("sessions", _clear_live_cache)
+
+
+def _hash(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+def _is_live(row: Optional[UserSession], now: datetime) -> bool:
+    return row is not None and row.revoked_at is None and row.expires_at > now
+
+
+def is_session_live(sid: str) -> bool:
+    """Whether a session is still usable (not revoked or expired), via the cache"""
+    now = time.monotonic()
+    cached = _live_cache.get(sid)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    generation = _live_cache_generation
+    db = SessionLocal()
+    try:
+        live = _is_live(db.get(UserSession, sid), datetime.utcnow())
+    finally:
+        db.close()
+    with _live_cache_lock:
+        if generation == _live_cache_generation:
+            _live_cache[sid] = (now + SESSION_CACHE_TTL_SECONDS, live)
+    return live
+
+
+def open_session(db: Session, user_id: int) -> Tuple[UserSession, str]:
+    """Start a session; returns it and its first refresh token (caller commits)"""
+    now = datetime.utcnow()
+    secret = secrets.token_urlsafe(32)
+    row = UserSession(
+        id=secrets.token_hex(16),
+        user_id=user_id,
+        refresh_token_hash=_hash(secret),
+        created_at=now,
+        rotated_at=now,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    db.add(row)
+    return row, f"{row.id}.{secret}"
+
+
+def rotate_session(db: Session, refresh_token: str) -> Tuple[UserSession, str]:
+    """Swap a refresh token for a new one (caller commits)"""
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+    )
+    sid, _, secret = refresh_token.partition(".")
+    if not sid or not secret:
+        raise invalid
+    row = db.get(UserSession, sid)
+    now = datetime.utcnow()
+    if not _is_live(row, now):
+        raise invalid
+
+    presented = _hash(secret)
+    if presented != row.refresh_token_hash:
+        grace = timedelta(seconds=REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+        if presented == row.previous_token_hash and row.rotated_at + grace > now:
+            pass  # retry of a refresh whose response never arrived
+        else:
+            # An old token came back: someone else may hold a copy
+            row.revoked_at = now
+            db.commit()
+            raise invalid
+
+    secret = secrets.token_urlsafe(32)
+    row.previous_token_hash = row.refresh_token_hash
+    row.refresh_token_hash = _hash(secret)
+    row.rotated_at = now
+    row.expires_at = now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    return row, f"{row.id}.{secret}"
+
+
+def revoke_session(db: Session, sid: str) -> None:
+    """End a session (caller commits)"""
+    row = db.get(UserSession, sid)
+    if row is not None and row.revoked_at is None:
+        row.revoked_at = datetime.utcnow()
@@ -0,0 +1,195 @@
+"""Stale clock sweeper: closes forgotten clock-ins
+
+Every SWEEP_INTERVAL_SECONDS a background thread in each worker looks at
+open_clocks (one row per open clock, so the scan is tiny) and closes the
+entries that ran past a limit:
+
+  * open longer than AUTO_CLOCK_OUT_HOURS - closed at clock_in + the limit
+  * still open SHIFT_END_GRACE_MINUTES after the first SHIFT_END_TIME (shop
+    time) following the clock-in - closed at that shift end
+
+The worker did not really work until the sweep found them, so the entry ends
+at the limit, not at now. Closed entries get a review_reason for an admin to
+correct or accept. Entries are closed SWEEP_BATCH at a time with set-based
+statements (ledger.close_many), each batch its own short transaction, so
+clock-ins wait at most one batch.
+
+Every worker runs the timer, but on PostgreSQL each batch first takes a
+transaction-level advisory lock and a worker that doesn't get it skips the
+round, so the sweep runs once per interval however many workers there are.
+"""
+import logging
+import threading
+from datetime import datetime, time as dt_time, timedelta, timezone
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text, update
+from sqlalchemy.orm import Session
+
+from config import (
+    AUTO_CLOCK_OUT_HOURS, SHIFT_END_TIME, SHIFT_END_GRACE_MINUTES, SWEEP_INTERVAL_SECONDS, SHOP_TIMEZONE
+)
+from database import write_session
+from models import OpenClock, TimeEntry
+import audit
+import ledger
+
+logger = logging.getLogger("honeybadger.sweeper")
+
+SWEEP_BATCH = 500
+# pg_try_advisory_xact_lock key held by the worker sweeping right now
+SWEEP_LOCK_KEY = 0x48425357  # "HBSW"
+
+MAX_HOURS_REASON = "Auto clock-out: open over {hours:g}h"
+SHIFT_END_REASON = "Auto clock-out: shift ended"
+
+
+def _shift_end() -> Optional[dt_time]:
+    if not SHIFT_END_TIME:
+        return None
+    hour, _, minute = SHIFT_END_TIME.partition(":")
+    return dt_time(int(hour), int(minute or 0))
+
+
+class StaleClockRules:
+    """When an open clock counts as forgotten, and where it should end"""
+
+    def __init__(self, max_hours: float = AUTO_CLOCK_OUT_HOURS, shift_end: Optional[dt_time] = _shift_end(),
+                 grace_minutes: int = SHIFT_END_GRACE_MINUTES, tz: ZoneInfo = ZoneInfo(SHOP_TIMEZONE)):
+        self.max_open = timedelta(hours=max_hours) if max_hours else None
+        self.max_hours = max_hours
+        self.shift_end = shift_end
+        self.grace = timedelta(minutes=grace_minutes)
+        self.tz = tz
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_open is not None or self.shift_end is not None
+
+    def _next_shift_end(self, clock_in: datetime) -> datetime:
+        """First shift end after clock_in, as naive UTC"""
+        local = clock_in.replace(tzinfo=timezone.utc).astimezone(self.tz)
+        end = datetime.combine(local.date(), self.shift_end, self.tz)
+        if end <= local:
+            end = datetime.combine(local.date() + timedelta(days=1), self.shift_end, self.tz)
+        return end.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def close_at(self, clock_in: datetime, now: datetime) -> Optional[Tuple[datetime, str]]:
+        """(clock_out, reason) if the clock is stale at now, else None"""
+        candidates = []
+        if self.max_open is not None and now - clock_in >= self.max_open:
+            candidates.append((clock_in + self.max_open, MAX_HOURS_REASON.format(hours=self.max_hours)))
+        if self.shift_end is not None:
+            shift_end = self._next_shift_end(clock_in)
+            if now >= shift_end + self.grace:
+                candidates.append((shift_end, SHIFT_END_REASON))
+        return min(candidates) if candidates else None
+
+
+def find_stale(db: Session, rules: StaleClockRules, now: datetime, limit: int) -> List[tuple]:
+    """Open clocks to close: (entry_id, user_id, job_id, clock_in, clock_out, reason)"""
+    # The shortest a clock can be open before a rule applies
+    windows = [rules.max_open] if rules.max_open is not None else []
+    if rules.shift_end is not None:
+        windows.append(rules.grace)
+    query = db.query(OpenClock.entry_id, OpenClock.user_id, OpenClock.job_id, OpenClock.clock_in).filter(
+        OpenClock.clock_in <= now - min(windows)
+    ).order_by(OpenClock.clock_in)
+    stale = []
+    for entry_id, user_id, job_id, clock_in in query:
+        closing = rules.close_at(clock_in, now)
+        if closing is not None:
+            stale.append((entry_id, user_id, job_id, clock_in, *closing))
+            if len(stale) >= limit:
+                break
+    return stale
+
+
+def _take_sweep_lock(db: Session) -> bool:
+    """False if another worker is sweeping (PostgreSQL); SQLite has one worker"""
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": SWEEP_LOCK_KEY}).scalar())
+
+
+def sweep(rules: StaleClockRules = None, now: Optional[datetime] = None, batch: int = SWEEP_BATCH) -> int:
+    """Close every stale clock, one batch per transaction; returns how many"""
+    rules = rules or StaleClockRules()
+    if not rules.enabled:
+        return 0
+    now = now or datetime.utcnow()
+    closed = 0
+    while True:
+        with write_session() as db:
+            if not _take_sweep_lock(db):
+                return closed
+            stale = find_stale(db, rules, now, batch)
+            if not stale:
+                return closed
+            audit.set_actor(db, None, audit.SOURCE_SYSTEM)
+            by_reason = {}
+            for entry_id, user_id, job_id, clock_in, clock_out, reason in stale:
+                by_reason.setdefault(reason, []).append((entry_id, user_id, job_id, clock_in, clock_out))
+            for reason, closures in by_reason.items():
+                ledger.close_many(db, closures, reason)
+                db.execute(
+                    update(TimeEntry)
+                    .where(TimeEntry.id.in_([closure[0] for closure in closures]))
+                    .values(review_reason=reason)
+                )
+                for entry_id, user_id, job_id, _clock_in, clock_out in closures:
+                    audit.record(db, "clock_out", "time_entries", entry_id, job_id, user_id,
+                                 {"clock_out": None},
+                                 {"clock_out": clock_out.isoformat(), "review_reason": reason})
+            db.commit()
+        closed += len(stale)
+        if len(stale) < batch:
+            return closed
+
+
+class Sweeper:
+    """Runs sweep() every interval on a background thread"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last_run: Optional[datetime] = None
+        self.last_closed = 0
+        self.total_closed = 0
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def metrics(self) -> dict:
+        return {"last_run": self.last_run, "last_closed": self.last_closed, "total_closed": self.total_closed}
+
+    def run_once(self) -> int:
+        closed = sweep()
+        self.last_run = datetime.utcnow()
+        self.last_closed = closed
+        self.total_closed += closed
+        if closed:
+            logger.info("Closed %d stale clocks", closed)
+        return closed
+
+    def start(self) -> None:
+        if self._thread is not None or not StaleClockRules().enabled:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._sweep_forever, name="stale-clock-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _sweep_forever(self) -> None:
+        while not self._stopping.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Stale clock sweep failed; retrying next interval")
+
+
+sweeper = Sweeper(SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,106 @@
+"""Batch sync of actions queued by the frontend while offline
+
+Actions are applied in the order the device queued them, each in its own
+savepoint so one rejected action doesn't undo the rest. Every action carries
+an idempotency key; keys are recorded in synced_actions with the outcome, and
+a key seen before is reported as a duplicate without being applied again.
+
+The app queues an action after its direct request failed to get an answer,
+reusing that request's Idempotency-Key. If the request did reach the server
+after all, its stored response (idempotency.py, kept IDEMPOTENCY_TTL_HOURS)
+marks the action as a duplicate too.
+"""
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import SYNC_MAX_ACTION_AGE_HOURS
+from idempotency import hash_key, store
+from models import SyncedAction
+from schemas import QueuedAction, SyncRequest
+import timeclock
+
+APPLIED = "applied"
+REJECTED = "rejected"
+DUPLICATE = "duplicate"
+
+_HANDLERS = {
+    "join": lambda db, action, user_id, at: timeclock.join_job(db, action.job_id, user_id),
+    "clock_in": lambda db, action, user_id, at: timeclock.clock_in(db, action.job_id, user_id, at),
+    "clock_out": lambda db, action, user_id, at: timeclock.clock_out(db, action.job_id, user_id, at),
+}
+
+
+# Route each action would have been sent to directly (method, path)
+_DIRECT_ROUTES = {
+    "join": lambda action: ("POST", f"/api/jobs/{action.job_id}/join"),
+    "clock_in": lambda action: ("POST", "/api/time/clockin"),
+    "clock_out": lambda action: ("POST", "/api/time/clockout"),
+}
+
+
+def _applied_directly(action: QueuedAction, username: str) -> bool:
+    """The direct request with this action's key succeeded after all"""
+    method, path = _DIRECT_ROUTES[action.action](action)
+    status_code = store.status_of(hash_key(action.idempotency_key.encode(), method, path, username.encode()))
+    return status_code is not None and status_code < 300
+
+
+def _result(action: QueuedAction, status: str, detail: str = None) -> dict:
+    return {"idempotency_key": action.idempotency_key, "status": status, "detail": detail}
+
+
+def apply_actions(db: Session, user_id: int, username: str, request: SyncRequest) -> List[dict]:
+    """Apply a device's queued actions; the caller commits"""
+    now = datetime.utcnow()
+    # Device clocks are often off; shift client times by the upload skew
+    skew = now - timeclock.naive_utc(request.sent_at)
+    oldest = now - timedelta(hours=SYNC_MAX_ACTION_AGE_HOURS)
+
+    keys = [action.idempotency_key for action in request.actions]
+    seen = {
+        key for (key,) in
+        db.query(SyncedAction.idempotency_key).filter(SyncedAction.idempotency_key.in_(keys)).all()
+    } if keys else set()
+
+    results = []
+    for action in request.actions:
+        if action.idempotency_key in seen:
+            results.append(_result(action, DUPLICATE, "Already synced"))
+            continue
+        seen.add(action.idempotency_key)
+        if _applied_directly(action, username):
+            results.append(_result(action, DUPLICATE, "Already applied when first sent"))
+            continue
+
+        at = min(timeclock.naive_utc(action.client_time) + skew, now)
+        status, detail = APPLIED, None
+        if at < oldest:
+            status, detail = REJECTED, "Action is too old to sync"
+        else:
+            try:
+                with db.begin_nested():
+                    _HANDLERS[action.action](db, action, user_id, at)
+            except HTTPException as exc:
+                status, detail = REJECTED, exc.detail
+
+        try:
+            with db.begin_nested():
+                db.add(SyncedAction(
+                    idempotency_key=action.idempotency_key,
+                    user_id=user_id,
+                    action=action.action,
+                    job_id=action.job_id,
+                    client_time=timeclock.naive_utc(action.client_time),
+                    applied_time=at if status == APPLIED else None,
+                    status=status,
+                    detail=detail,
+                ))
+        except IntegrityError:
+            # The same key committed by a concurrent sync in the meantime
+            raise HTTPException(status_code=409, detail="Sync already in progress, retry")
+        results.append(_result(action, status, detail))
+    return results
@@ -0,0 +1,390 @@
+"""Background tasks: heavy admin operations off the request path
+
+Reports, exports and rebuilds are submitted as tasks and run on the task
+runner's own threads (at most TASK_WORKERS at once, and at most
+max_concurrent per kind), each with its own database session, so they never
+hold a request threadpool slot and never queue clock-ins behind them.
+
+Every task has a row in background_tasks holding its status, progress and,
+when it succeeds, its result, so any worker can answer status and result
+requests. Tasks run in the worker that accepted them; that worker touches the
+row's heartbeat while it is queued or running, and rows whose heartbeat stops
+(the worker died) are marked failed by the next worker to start.
+
+Cancellation is cooperative: a queued task is dropped, a running one stops
+at its next ctx.progress()/ctx.check_cancelled() call.
+"""
+import csv
+import io
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, NamedTuple, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, update
+
+from analytics import estimates
+from config import (
+    TASK_WORKERS, TASK_MAX_QUEUED, TASK_HEARTBEAT_SECONDS, TASK_RETENTION_DAYS, PAYROLL_MAX_DAYS
+)
+from database import SessionLocal, write_session
+from models import BackgroundTask, Job, TimeEntry, User
+from sweeper import sweeper
+from timeclock import naive_utc
+import ledger
+import overlap
+import payroll
+import search
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# A queued/running task whose heartbeat is older than this belongs to a dead worker
+STALE_AFTER = timedelta(seconds=TASK_HEARTBEAT_SECONDS * 6)
+PURGE_EVERY = timedelta(hours=1)
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task when it has been cancelled"""
+
+
+class TaskKind(NamedTuple):
+    name: str
+    fn: Callable
+    max_concurrent: int
+    content_type: str
+
+
+_kinds: Dict[str, TaskKind] = {}
+
+
+def task_kind(name: str, max_concurrent: int = 1, content_type: str = "application/json"):
+    """Register fn(ctx, **params) as a task kind
+
+    fn returns something JSON-serializable, or bytes of content_type.
+    """
+    def register(fn):
+        _kinds[name] = TaskKind(name, fn, max_concurrent, content_type)
+        return fn
+    return register
+
+
+def task_kinds() -> list:
+    return sorted(_kinds)
+
+
+class TaskContext:
+    """Handed to a running task: progress reporting and cancellation checks"""
+
+    def __init__(self, task_id: str, kind: TaskKind, params: dict):
+        self.task_id = task_id
+        self.kind = kind
+        self.params = params
+        self.progress_value: Optional[float] = None
+        self._cancel = threading.Event()
+
+    def progress(self, fraction: float) -> None:
+        """Record progress (0..1); also a cancellation point"""
+        self.progress_value = max(0.0, min(1.0, fraction))
+        self.check_cancelled()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise TaskCancelled()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+
+def _finish(task_id: str, status: str, **values) -> None:
+    with write_session() as db:
+        db.execute(
+            update(BackgroundTask).where(BackgroundTask.id == task_id)
+            .values(status=status, finished_at=datetime.utcnow(), **values)
+        )
+        db.commit()
+
+
+class TaskRunner:
+    """Runs submitted tasks on a bounded set of threads, per-kind limits apply"""
+
+    def __init__(self, workers: int, max_queued: int):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._pending = deque()  # TaskContext, in submission order
+        self._running: Dict[str, TaskContext] = {}
+        self._running_kinds = Counter()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._last_purge = datetime.min
+
+    def submit(self, kind: str, params: dict, user_id: Optional[int]) -> BackgroundTask:
+        """Queue a task; its row is committed before this returns"""
+        if kind not in _kinds:
+            raise HTTPException(status_code=400, detail=f"Unknown task kind: {kind}")
+        with self._lock:
+            if len(self._pending) >= self.max_queued:
+                raise HTTPException(status_code=429, detail="Too many background tasks queued, try again later")
+        now = datetime.utcnow()
+        row = BackgroundTask(
+            id=uuid.uuid4().hex, kind=kind, params=json.dumps(params), status=QUEUED,
+            cancel_requested=False, created_by=user_id, created_at=now, heartbeat_at=now,
+        )
+        with write_session() as db:
+            db.add(row)
+            db.commit()
+            db.refresh(row)
+            db.expunge(row)
+        with self._lock:
+            self._pending.append(TaskContext(row.id, _kinds[kind], params))
+            self._dispatch()
+        return row
+
+    def cancel(self, task_id: str) -> None:
+        """Request cancellation; takes effect here or in whichever worker runs the task"""
+        with write_session() as db:
+            db.execute(
+                update(BackgroundTask)
+                .where(BackgroundTask.id == task_id, BackgroundTask.status.in_((QUEUED, RUNNING)))
+                .values(cancel_requested=True)
+            )
+            db.commit()
+        self._apply_cancellations({task_id})
+
+    def _apply_cancellations(self, task_ids: set) -> None:
+        dropped = []
+        with self._lock:
+            for ctx in list(self._pending):
+                if ctx.task_id in task_ids:
+                    self._pending.remove(ctx)
+                    dropped.append(ctx.task_id)
+            for task_id in task_ids:
+                if task_id in self._running:
+                    self._running[task_id].cancel()
+        for task_id in dropped:
+            _finish(task_id, CANCELLED)
+
+    def _dispatch(self) -> None:
+        """Start pending tasks while there are free slots (caller holds the lock)"""
+        for ctx in list(self._pending):
+            if len(self._running) >= self.workers:
+                return
+            if self._running_kinds[ctx.kind.name] >= ctx.kind.max_concurrent:
+                continue
+            self._pending.remove(ctx)
+            self._running[ctx.task_id] = ctx
+            self._running_kinds[ctx.kind.name] += 1
+            threading.Thread(target=self._run, args=(ctx,), name=f"task-{ctx.kind.name}", daemon=True).start()
+
+    def _run(self, ctx: TaskContext) -> None:
+        try:
+            now = datetime.utcnow()
+            with write_session() as db:
+                db.execute(
+                    update(BackgroundTask).where(BackgroundTask.id == ctx.task_id)
+                    .values(status=RUNNING, started_at=now, heartbeat_at=now)
+                )
+                db.commit()
+            result = ctx.kind.fn(ctx, **ctx.params)
+            if isinstance(result, bytes):
+                body, content_type = result, ctx.kind.content_type
+            else:
+                body, content_type = json.dumps(jsonable_encoder(result)).encode(), "application/json"
+            _finish(ctx.task_id, SUCCEEDED, progress=1.0, result=body, result_content_type=content_type)
+        except TaskCancelled:
+            _finish(ctx.task_id, CANCELLED, progress=ctx.progress_value)
+        except (HTTPException, ValueError, TypeError) as exc:
+            # Bad parameters: report them rather than a stack trace
+            detail = exc.detail if isinstance(exc, HTTPException) else str(exc)
+            _finish(ctx.task_id, FAILED, progress=ctx.progress_value, error=str(detail))
+        except Exception as exc:
+            logger.exception("Background task %s (%s) failed", ctx.task_id, ctx.kind.name)
+            _finish(ctx.task_id, FAILED, progress=ctx.progress_value, error=f"{type(exc).__name__}: {exc}")
+        finally:
+            with self._lock:
+                del self._running[ctx.task_id]
+                self._running_kinds[ctx.kind.name] -= 1
+                self._dispatch()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._heartbeat_forever, name="task-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        with self._lock:
+            for ctx in self._running.values():
+                ctx.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _heartbeat_forever(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._heartbeat()
+            except Exception:
+                logger.exception("Background task heartbeat failed")
+            self._stopping.wait(TASK_HEARTBEAT_SECONDS)
+
+    def _heartbeat(self) -> None:
+        """Keep our tasks' rows alive, pick up cancellations, fail dead workers' tasks"""
+        with self._lock:
+            progress = {task_id: ctx.progress_value for task_id, ctx in self._running.items()}
+            ours = set(progress) | {ctx.task_id for ctx in self._pending}
+        now = datetime.utcnow()
+        with write_session() as db:
+            for task_id, value in progress.items():
+                db.execute(
+                    update(BackgroundTask).where(BackgroundTask.id == task_id, BackgroundTask.status == RUNNING)
+                    .values(heartbeat_at=now, progress=value)
+                )
+            queued = ours - set(progress)
+            if queued:
+                db.execute(update(BackgroundTask).where(BackgroundTask.id.in_(queued)).values(heartbeat_at=now))
+            stale = update(BackgroundTask).where(
+                BackgroundTask.status.in_((QUEUED, RUNNING)),
+                BackgroundTask.heartbeat_at < now - STALE_AFTER,
+            )
+            if ours:
+                stale = stale.where(BackgroundTask.id.notin_(ours))
+            db.execute(stale.values(status=FAILED, finished_at=now, error="Interrupted: the server stopped"))
+            if now - self._last_purge > PURGE_EVERY:
+                db.execute(delete(BackgroundTask).where(
+                    BackgroundTask.status.in_(FINISHED),
+                    BackgroundTask.finished_at < now - timedelta(days=TASK_RETENTION_DAYS),
+                ))
+                self._last_purge = now
+            cancelled = set()
+            if ours:
+                cancelled = {
+                    task_id for (task_id,) in db.query(BackgroundTask.id).filter(
+                        BackgroundTask.id.in_(ours), BackgroundTask.cancel_requested == True
+                    )
+                }
+            db.commit()
+        if cancelled:
+            self._apply_cancellations(cancelled)
+
+
+runner = TaskRunner(TASK_WORKERS, TASK_MAX_QUEUED)
+
+
+# ==================== Task kinds ====================
+
+def _day(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _moment(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+@task_kind("payroll_report")
+def _payroll_report(ctx: TaskContext, first_day, last_day, user_id: int = None, days: bool = False):
+    first_day, last_day = _day(first_day), _day(last_day)
+    if last_day < first_day or (last_day - first_day).days >= PAYROLL_MAX_DAYS:
+        raise ValueError(f"Pay period must be 1 to {PAYROLL_MAX_DAYS} days")
+    db = SessionLocal()
+    try:
+        return payroll.payroll_report(db, first_day, last_day, user_id, days)
+    finally:
+        db.close()
+
+
+@task_kind("overlap_report")
+def _overlap_report(ctx: TaskContext, start=None, end=None, user_id: int = None):
+    end = naive_utc(_moment(end)) if end else datetime.utcnow()
+    start = naive_utc(_moment(start)) if start else end - timedelta(days=7)
+    if start >= end:
+        raise ValueError("start must be before end")
+    db = SessionLocal()
+    try:
+        return overlap.overlap_report(db, start, end, user_id)
+    finally:
+        db.close()
+
+
+@task_kind("refresh_estimates")
+def _refresh_estimates(ctx: TaskContext):
+    estimates.refresh()
+    return {"entries": estimates.stats.entries, "jobs": estimates.stats.jobs,
+            "refresh_seconds": estimates.refresh_seconds}
+
+
+@task_kind("rebuild_search_index")
+def _rebuild_search_index(ctx: TaskContext):
+    started = time.perf_counter()
+    with write_session() as db:
+        search.rebuild_index(db)
+        db.commit()
+    return {"seconds": time.perf_counter() - started}
+
+
+@task_kind("rebuild_clock_projections")
+def _rebuild_clock_projections(ctx: TaskContext):
+    """Replay the clock ledger into open_clocks, job_time_totals and user_daily_hours"""
+    started = time.perf_counter()
+    with write_session() as db:
+        result = ledger.rebuild_projections(db, ctx.progress)
+    return {**result, "seconds": time.perf_counter() - started}
+
+
+@task_kind("sweep_stale_clocks")
+def _sweep_stale_clocks(ctx: TaskContext):
+    """Close forgotten clock-ins now instead of at the next scheduled sweep"""
+    return {"closed": sweeper.run_once()}
+
+
+EXPORT_BATCH = 5000
+
+
+@task_kind("export_time_entries", content_type="text/csv")
+def _export_time_entries(ctx: TaskContext, start=None, end=None):
+    """All time entries (optionally those starting in [start, end)) as CSV"""
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(TimeEntry.id, User.username, Job.id, Job.job_name, TimeEntry.clock_in, TimeEntry.clock_out)
+            .join(User, User.id == TimeEntry.user_id)
+            .join(Job, Job.id == TimeEntry.job_id)
+        )
+        if start:
+            query = query.filter(TimeEntry.clock_in >= _moment(start))
+        if end:
+            query = query.filter(TimeEntry.clock_in < _moment(end))
+        total = query.count() or 1
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["entry_id", "username", "job_id", "job_name", "clock_in", "clock_out", "seconds"])
+        for n, (entry_id, username, job_id, job_name, clock_in, clock_out) in enumerate(
+            query.order_by(TimeEntry.id).yield_per(EXPORT_BATCH)
+        ):
+            if n % EXPORT_BATCH == 0:
+                ctx.progress(n / total)
+            seconds = (clock_out - clock_in).total_seconds() if clock_out else ""
+            writer.writerow([
+                entry_id, username, job_id, job_name, clock_in.isoformat(),
+                clock_out.isoformat() if clock_out else "", seconds,
+            ])
+    finally:
+        db.close()
+    return out.getvalue().encode()
@@ -0,0 +1,88 @@
+"""Join and clock actions shared by the API routes and offline sync
+
+Each function validates against the current rows, stages the change on the
+session and leaves committing to the caller. Rule violations raise the same
+HTTPExceptions the routes have always returned. Clock changes go through the
+ledger (ledger.py).
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from models import Job, JobAssignment, TimeEntry
+import ledger
+
+
+def naive_utc(value: datetime) -> datetime:
+    """UTC without tzinfo, the way the app stores times it sets itself"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def epoch_seconds(value: datetime) -> float:
+    """Seconds since the epoch; naive datetimes are UTC (as stored by the app)"""
+    if value.tzinfo is None:
+        return (value - _EPOCH).total_seconds()
+    return value.timestamp()
+
+
+def _open_job(db: Session, job_id: int) -> Job:
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.is_complete or job.is_archived:
+        raise HTTPException(status_code=400, detail="Job is already complete")
+    return job
+
+
+def join_job(db: Session, job_id: int, user_id: int) -> JobAssignment:
+    """Add a user to a job's assignment list"""
+    job = _open_job(db, job_id)
+
+    existing = db.query(JobAssignment).filter(
+        JobAssignment.job_id == job_id,
+        JobAssignment.user_id == user_id
+    ).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Already assigned to this job")
+
+    current_count = db.query(JobAssignment).filter(JobAssignment.job_id == job_id).count()
+    if current_count >= job.max_workers:
+        raise HTTPException(status_code=400, detail="Job is full")
+
+    assignment = JobAssignment(job_id=job_id, user_id=user_id, assigned_by=user_id)
+    db.add(assignment)
+    return assignment
+
+
+def clock_in(db: Session, job_id: int, user_id: int, at: Optional[datetime] = None) -> TimeEntry:
+    """Open a time entry (at defaults to now)"""
+    _open_job(db, job_id)
+
+    assignment = db.query(JobAssignment).filter(
+        JobAssignment.job_id == job_id,
+        JobAssignment.user_id == user_id
+    ).first()
+    if not assignment:
+        raise HTTPException(status_code=400, detail="Not assigned to this job")
+
+    if ledger.open_entry(db, job_id, user_id):
+        raise HTTPException(status_code=400, detail="Already clocked in to this job")
+
+    return ledger.clock_in(db, user_id, job_id, at)
+
+
+def clock_out(db: Session, job_id: int, user_id: int, at: Optional[datetime] = None) -> TimeEntry:
+    """Close the user's open time entry on a job (at defaults to now)"""
+    entry = ledger.open_entry(db, job_id, user_id)
+    if not entry:
+        raise HTTPException(status_code=400, detail="Not clocked in to this job")
+
+    # Never ends an entry before it started (client clocks drift)
+    return ledger.clock_out(db, entry, at)
@@ -0,0 +1,206 @@
+"""Bulk user import from CSV
+
+    python userimport.py shift.csv             # create the users
+    python userimport.py shift.csv --dry-run   # only check the file
+
+The CSV has a header row with username, initials and password columns, and
+optionally role (basic or admin; default basic). Each row is reported on its
+own: created, duplicate (the username exists already or earlier in the
+file) or invalid. Rows that fail are skipped and the rest are still created.
+
+bcrypt is what makes creating users slow (a few hundred ms of CPU each), so
+the passwords are hashed first, in USER_IMPORT_PROCESSES processes, before
+any transaction is open. The users are then inserted in one transaction
+with multi-row INSERTs. Imports run one at a time per server worker.
+"""
+import argparse
+import csv
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from auth import get_password_hash
+from config import ROLE_ADMIN, ROLE_BASIC, USER_IMPORT_PROCESSES, USER_IMPORT_MAX_ROWS
+from database import SessionLocal, write_session
+from models import User
+import audit
+
+REQUIRED_COLUMNS = ("username", "initials", "password")
+ROLES = (ROLE_BASIC, ROLE_ADMIN)
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+VALID = "valid"  # dry run: would be created
+
+# Below this many passwords, starting processes costs more than it saves
+MIN_ROWS_FOR_PROCESSES = 4
+# Usernames per IN (...) when looking for existing users
+LOOKUP_CHUNK = 500
+
+_import_lock = threading.Lock()
+
+
+def _row_result(line: int, username: Optional[str], status: str, detail: Optional[str] = None,
+                user_id: Optional[int] = None) -> dict:
+    return {"line": line, "username": username, "status": status, "detail": detail, "user_id": user_id}
+
+
+def _cell(row: dict, columns: dict, name: str) -> str:
+    return (row.get(columns[name]) or "").strip() if name in columns else ""
+
+
+def parse_csv(data: bytes):
+    """(candidates, results): rows to create, and results for rows already rejected
+
+    Candidates are (line, username, initials, password, role), with line the
+    row's line number in the file (the header is line 1).
+    """
+    try:
+        text = data.decode("utf-8-sig")  # spreadsheet exports often start with a BOM
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8")
+    reader = csv.DictReader(io.StringIO(text))
+    columns = {(name or "").strip().lower(): name for name in reader.fieldnames or ()}
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"CSV is missing column(s): {', '.join(missing)}")
+
+    candidates, results, seen = [], [], set()
+    for row in reader:
+        line = reader.line_num
+        if len(candidates) + len(results) >= USER_IMPORT_MAX_ROWS:
+            raise HTTPException(status_code=400, detail=f"At most {USER_IMPORT_MAX_ROWS} users per import")
+        username, initials = _cell(row, columns, "username"), _cell(row, columns, "initials").upper()
+        password = _cell(row, columns, "password")
+        role = _cell(row, columns, "role").lower() or ROLE_BASIC
+        if not username and not initials and not password:
+            continue  # blank line
+        if not username or not initials or not password:
+            results.append(_row_result(line, username or None, INVALID, "username, initials and password are required"))
+        elif len(username) > 50 or len(initials) > 10:
+            results.append(_row_result(line, username, INVALID, "username is limited to 50 characters, initials to 10"))
+        elif role not in ROLES:
+            results.append(_row_result(line, username, INVALID, f"role must be one of: {', '.join(ROLES)}"))
+        elif username in seen:
+            results.append(_row_result(line, username, DUPLICATE, "username appears earlier in the file"))
+        else:
+            seen.add(username)
+            candidates.append((line, username, initials, password, role))
+    return candidates, results
+
+
+def existing_usernames(db: Session, usernames: List[str]) -> set:
+    found = set()
+    for start in range(0, len(usernames), LOOKUP_CHUNK):
+        chunk = usernames[start:start + LOOKUP_CHUNK]
+        found.update(name for (name,) in db.query(User.username).filter(User.username.in_(chunk)))
+    return found
+
+
+def hash_passwords(passwords: List[str], processes: int = USER_IMPORT_PROCESSES) -> List[str]:
+    """bcrypt hashes of passwords, in order, spread over processes"""
+    processes = min(processes, len(passwords))
+    if processes <= 1 or len(passwords) < MIN_ROWS_FOR_PROCESSES:
+        return [get_password_hash(password) for password in passwords]
+    # spawn, not fork: the server has threads (and pooled connections) a
+    # forked child must not inherit
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(get_password_hash, passwords, chunksize=max(1, len(passwords) // (processes * 4))))
+
+
+def _split_existing(candidates: list, results: list, existing: set) -> list:
+    """Candidates whose username is free; the others are reported as duplicates"""
+    remaining = []
+    for candidate in candidates:
+        if candidate[1] in existing:
+            results.append(_row_result(candidate[0], candidate[1], DUPLICATE, "username already exists"))
+        else:
+            remaining.append(candidate)
+    return remaining
+
+
+def import_users(data: bytes, actor_id: Optional[int], source: str = audit.SOURCE_API,
+                 dry_run: bool = False) -> dict:
+    """Create the users in a CSV file; returns counts and a result per row"""
+    candidates, results = parse_csv(data)
+
+    # Skip hashing passwords of users that already exist
+    db = SessionLocal()
+    try:
+        candidates = _split_existing(candidates, results, existing_usernames(db, [c[1] for c in candidates]))
+    finally:
+        db.close()
+
+    if dry_run:
+        results.extend(_row_result(c[0], c[1], VALID) for c in candidates)
+    elif candidates:
+        with _import_lock:
+            hashes = hash_passwords([c[3] for c in candidates])
+            with write_session() as db:
+                audit.set_actor(db, actor_id, source)
+                # A user may have been created while the passwords were hashed
+                existing = existing_usernames(db, [c[1] for c in candidates])
+                _split_existing(candidates, results, existing)
+                rows = [(c, password_hash) for c, password_hash in zip(candidates, hashes) if c[1] not in existing]
+                if rows:
+                    try:
+                        created = db.execute(
+                            insert(User).returning(User.id, sort_by_parameter_order=True),
+                            [
+                                {"username": username, "initials": initials, "password_hash": password_hash,
+                                 "role": role, "is_active": True}
+                                for (_line, username, initials, _password, role), password_hash in rows
+                            ],
+                        ).scalars().all()
+                    except IntegrityError:
+                        # Another worker created one of the users after the check above
+                        db.rollback()
+                        raise HTTPException(status_code=409, detail="Users changed during the import, please retry")
+                    for ((line, username, initials, _password, role), _hash), user_id in zip(rows, created):
+                        audit.record(db, "user.create", "users", user_id, None, user_id, None, {
+                            "username": username, "initials": initials, "role": role,
+                            "is_active": True, "password_hash": "***",
+                        })
+                        results.append(_row_result(line, username, CREATED, user_id=user_id))
+                db.commit()
+
+    results.sort(key=lambda result: result["line"])
+    counts = {status: 0 for status in (CREATED, DUPLICATE, INVALID, VALID)}
+    for result in results:
+        counts[result["status"]] += 1
+    return {**counts, "dry_run": dry_run, "rows": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create HoneyBadger Pro users from a CSV file")
+    parser.add_argument("csv_file", help="header row: username,initials,password[,role]")
+    parser.add_argument("--dry-run", action="store_true", help="check the file without creating anyone")
+    args = parser.parse_args()
+
+    with open(args.csv_file, "rb") as f:
+        data = f.read()
+    try:
+        report = import_users(data, None, audit.SOURCE_SYSTEM, dry_run=args.dry_run)
+    except HTTPException as exc:
+        raise SystemExit(f"Import failed: {exc.detail}")
+    finally:
+        audit.audit_log.flush()  # no background writer outside the server
+
+    for row in report["rows"]:
+        if row["status"] not in (CREATED, VALID):
+            print(f"line {row['line']}: {row['username'] or '-'}: {row['status']} ({row['detail']})")
+    summary = "would be created" if args.dry_run else "created"
+    print(f"{report[VALID] if args.dry_run else report[CREATED]} {summary}, "
+          f"{report[DUPLICATE]} duplicate(s), {report[INVALID]} invalid")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,20 @@ const API_URL = window.location.origin;
 // State
 let currentUser = null;
 let authToken = null;
+let refreshToken = null;
+let tokenExpiresAt = 0;  // ms since epoch; 0 = unknown
 let jobs = [];
 let myJobs = [];
+let reviewJobs = [];
 let archivedJobs = [];
 let users = [];
 let activeClocks = [];
-let clockTimers = {};
+let archivedTotal = 0;
+let searchResults = [];
+let searchQuery = '';
+
+const ARCHIVE_PAGE_SIZE = 20;
+const SEARCH_DEBOUNCE_MS = 250;
 
 // ==================== AUTH ====================
 
@@ -30,9 +38,8 @@ async function login(username, password) {
         }
         
         const data = await response.json();
-        authToken = data.access_token;
+        saveTokens(data);
         currentUser = data.user;
-        localStorage.setItem('token', authToken);
         localStorage.setItem('user', JSON.stringify(currentUser));
         
         showMainApp();
@@ -61,12 +68,68 @@ async function register(username, initials, password) {
     }
 }
 
+function saveTokens(data) {
+    authToken = data.access_token;
+    refreshToken = data.refresh_token || null;
+    tokenExpiresAt = data.expires_in ? Date.now() + data.expires_in * 1000 : 0;
+    localStorage.setItem('token', authToken);
+    localStorage.setItem('refreshToken', refreshToken || '');
+    localStorage.setItem('tokenExpiresAt', String(tokenExpiresAt));
+}
+
+let refreshInFlight = null;
+
+function ensureFreshToken() {
+    // Renew the access token shortly before it expires - no password, no bcrypt
+    if (!refreshToken || Date.now() < tokenExpiresAt - 60000) {
+        return Promise.resolve(true);
+    }
+    if (!refreshInFlight) {
+        refreshInFlight = refreshAccessToken().finally(() => {
+            refreshInFlight = null;
+        });
+    }
+    return refreshInFlight;
+}
+
+async function refreshAccessToken() {
+    try {
+        const response = await fetch(`${API_URL}/api/auth/refresh`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ refresh_token: refreshToken })
+        });
+        if (response.status === 401) {
+            // Session revoked or expired
+            logout();
+            return false;
+        }
+        if (!response.ok) return false;
+        saveTokens(await response.json());
+        return true;
+    } catch (error) {
+        // Offline; the same refresh token is retried later
+        console.error('Error refreshing token:', error);
+        return false;
+    }
+}
+
 function logout() {
+    if (authToken) {
+        // End the session on the server too; nothing to do if this fails
+        fetch(`${API_URL}/api/auth/logout`, { method: 'POST', headers: getAuthHeaders() }).catch(() => {});
+    }
     authToken = null;
+    refreshToken = null;
+    tokenExpiresAt = 0;
     currentUser = null;
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
+    localStorage.removeItem('tokenExpiresAt');
     localStorage.removeItem('user');
-    clearAllTimers();
+    stopPolling();
+    stopClockTicker();
+    document.getElementById('sync-status').textContent = '';
     showLoginScreen();
 }
 
@@ -77,57 +140,139 @@ function getAuthHeaders() {
     };
 }
 
+async function authedFetch(url, options = {}) {
+    // Reads: renew the token if it is about to expire, and once more if the
+    // server still answers 401, before giving up and logging out
+    await ensureFreshToken();
+    let response = await fetch(url, { ...options, headers: getAuthHeaders() });
+    if (response.status === 401 && refreshToken) {
+        tokenExpiresAt = 0;  // force the refresh
+        if (await ensureFreshToken()) {
+            response = await fetch(url, { ...options, headers: getAuthHeaders() });
+        }
+    }
+    if (response.status === 401 && authToken) {
+        logout();
+    }
+    return response;
+}
+
+const MUTATION_RETRIES = 2;
+
+async function sendMutation(url, options, idempotencyKey = newIdempotencyKey()) {
+    // Each action gets one Idempotency-Key, reused for retries after a dropped
+    // connection (and by the offline queue if every retry fails), so the
+    // server never applies it twice
+    await ensureFreshToken();
+    const headers = { ...getAuthHeaders(), 'Idempotency-Key': idempotencyKey };
+    for (let attempt = 0; ; attempt++) {
+        let delay = 1000 * 2 ** attempt;
+        try {
+            const response = await fetch(url, { ...options, headers });
+            // 409: our earlier attempt is still running on the server.
+            // 429/503: rate limited or busy - rejected before it ran, so safe to resend
+            const retryable = response.status === 429 || response.status === 503
+                || (response.status === 409 && attempt > 0);
+            if (!retryable || attempt >= MUTATION_RETRIES) {
+                return response;
+            }
+            const retryAfter = Number(response.headers.get('Retry-After'));
+            if (retryAfter > 0) delay = retryAfter * 1000;
+        } catch (error) {
+            if (attempt >= MUTATION_RETRIES) throw error;
+        }
+        await new Promise(resolve => setTimeout(resolve, delay));
+    }
+}
+
 // ==================== API CALLS ====================
 
-async function fetchJobs() {
+async function fetchDashboard(signal) {
+    // Board, archive (first page), active clocks and users in one request.
+    // Returns whether it succeeded so the poller can back off.
     try {
-        const response = await fetch(`${API_URL}/api/jobs`, {
-            headers: getAuthHeaders()
+        const response = await authedFetch(`${API_URL}/api/dashboard?view=card&archived_limit=${ARCHIVE_PAGE_SIZE}`, {
+            signal
         });
         if (response.ok) {
-            jobs = await response.json();
+            const data = await response.json();
+            jobs = data.jobs;
+            myJobs = data.my_jobs;
+            activeClocks = data.active_clocks;
+            archivedTotal = data.archived.total;
+            // Keep extra archive pages the user has loaded
+            if (archivedJobs.length <= ARCHIVE_PAGE_SIZE) {
+                archivedJobs = data.archived.items;
+            }
             renderJobBoard();
             renderMyJobs();
+            renderActiveClocks();
+            renderArchive();
+            if (data.review_queue) {
+                reviewJobs = data.review_queue;
+                renderReviewQueue();
+            }
+            if (data.users) {
+                users = data.users;
+                renderUsers();
+            }
         }
+        return response.ok;
     } catch (error) {
-        console.error('Error fetching jobs:', error);
+        if (error.name !== 'AbortError') {
+            console.error('Error fetching dashboard:', error);
+        }
+        return false;
     }
 }
 
-async function fetchArchivedJobs() {
+async function fetchMyJobs() {
+    // Only this user's jobs and assignments - much smaller than the board
     try {
-        const response = await fetch(`${API_URL}/api/jobs/archived`, {
-            headers: getAuthHeaders()
-        });
+        const response = await authedFetch(`${API_URL}/api/jobs/mine?view=card`);
         if (response.ok) {
-            archivedJobs = await response.json();
-            renderArchive();
+            myJobs = await response.json();
+            renderMyJobs();
         }
     } catch (error) {
-        console.error('Error fetching archived jobs:', error);
+        console.error('Error fetching my jobs:', error);
     }
 }
 
-async function fetchActiveClocks() {
+async function fetchReviewQueue() {
+    if (currentUser.role !== 'admin') return;
     try {
-        const response = await fetch(`${API_URL}/api/time/active`, {
-            headers: getAuthHeaders()
-        });
+        const response = await authedFetch(`${API_URL}/api/jobs/review?view=card`);
         if (response.ok) {
-            activeClocks = await response.json();
-            renderActiveClocks();
+            reviewJobs = await response.json();
+            renderReviewQueue();
+        }
+    } catch (error) {
+        console.error('Error fetching review queue:', error);
+    }
+}
+
+async function fetchArchivedJobs(loadMore = false) {
+    const offset = loadMore ? archivedJobs.length : 0;
+    try {
+        const response = await authedFetch(`${API_URL}/api/jobs/archived?view=card&limit=${ARCHIVE_PAGE_SIZE}&offset=${offset}`);
+        if (response.ok) {
+            const page = await response.json();
+            archivedJobs = loadMore ? archivedJobs.concat(page) : page;
+            if (page.length < ARCHIVE_PAGE_SIZE) {
+                archivedTotal = archivedJobs.length;
+            }
+            renderArchive();
         }
     } catch (error) {
-        console.error('Error fetching active clocks:', error);
+        console.error('Error fetching archived jobs:', error);
     }
 }
 
 async function fetchUsers() {
     if (currentUser.role !== 'admin') return;
     try {
-        const response = await fetch(`${API_URL}/api/users`, {
-            headers: getAuthHeaders()
-        });
+        const response = await authedFetch(`${API_URL}/api/users`);
         if (response.ok) {
             users = await response.json();
             renderUsers();
@@ -137,15 +282,50 @@ async function fetchUsers() {
     }
 }
 
+let searchTimer = null;
+let searchController = null;
+
+function scheduleSearch() {
+    // Wait for a pause in typing; the newest query cancels any older request
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(fetchSearch, SEARCH_DEBOUNCE_MS);
+}
+
+async function fetchSearch() {
+    searchQuery = document.getElementById('job-search').value.trim();
+    const state = document.getElementById('job-search-state').value;
+    if (searchController) searchController.abort();
+    if (!searchQuery) {
+        searchResults = [];
+        renderSearchResults();
+        return;
+    }
+    
+    searchController = new AbortController();
+    try {
+        const params = new URLSearchParams({ q: searchQuery, state, view: 'card', limit: 50 });
+        const response = await authedFetch(`${API_URL}/api/jobs/search?${params}`, {
+            signal: searchController.signal
+        });
+        if (response.ok) {
+            searchResults = await response.json();
+            renderSearchResults();
+        }
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error('Error searching jobs:', error);
+        }
+    }
+}
+
 async function createJob(jobData) {
     try {
-        const response = await fetch(`${API_URL}/api/jobs`, {
+        const response = await sendMutation(`${API_URL}/api/jobs`, {
             method: 'POST',
-            headers: getAuthHeaders(),
             body: JSON.stringify(jobData)
         });
         if (response.ok) {
-            fetchJobs();
+            refreshDashboard();
             document.getElementById('add-job-form').reset();
         } else {
             const error = await response.json();
@@ -157,13 +337,17 @@ async function createJob(jobData) {
 }
 
 async function joinJob(jobId) {
+    // Keep order behind anything already waiting to sync
+    if (await hasQueuedActions()) {
+        return queueOffline('join', jobId);
+    }
+    const idempotencyKey = newIdempotencyKey();
     try {
-        const response = await fetch(`${API_URL}/api/jobs/${jobId}/join`, {
-            method: 'POST',
-            headers: getAuthHeaders()
-        });
+        const response = await sendMutation(`${API_URL}/api/jobs/${jobId}/join`, {
+            method: 'POST'
+        }, idempotencyKey);
         if (response.ok) {
-            fetchJobs();
+            refreshDashboard();
             closeModal();
         } else {
             const error = await response.json();
@@ -171,17 +355,18 @@ async function joinJob(jobId) {
         }
     } catch (error) {
         console.error('Error joining job:', error);
+        // Same key: if an attempt did reach the server, the sync skips it
+        queueOffline('join', jobId, idempotencyKey);
     }
 }
 
 async function leaveJob(jobId) {
     try {
-        const response = await fetch(`${API_URL}/api/jobs/${jobId}/leave`, {
-            method: 'DELETE',
-            headers: getAuthHeaders()
+        const response = await sendMutation(`${API_URL}/api/jobs/${jobId}/leave`, {
+            method: 'DELETE'
         });
         if (response.ok) {
-            fetchJobs();
+            refreshDashboard();
             closeModal();
         } else {
             const error = await response.json();
@@ -193,15 +378,18 @@ async function leaveJob(jobId) {
 }
 
 async function clockIn(jobId) {
+    // Keep order behind anything already waiting to sync
+    if (await hasQueuedActions()) {
+        return queueOffline('clock_in', jobId);
+    }
+    const idempotencyKey = newIdempotencyKey();
     try {
-        const response = await fetch(`${API_URL}/api/time/clockin`, {
+        const response = await sendMutation(`${API_URL}/api/time/clockin`, {
             method: 'POST',
-            headers: getAuthHeaders(),
             body: JSON.stringify({ job_id: jobId })
-        });
+        }, idempotencyKey);
         if (response.ok) {
-            fetchJobs();
-            fetchActiveClocks();
+            refreshDashboard();
             closeModal();
         } else {
             const error = await response.json();
@@ -209,19 +397,24 @@ async function clockIn(jobId) {
         }
     } catch (error) {
         console.error('Error clocking in:', error);
+        // Same key: if an attempt did reach the server, the sync skips it
+        queueOffline('clock_in', jobId, idempotencyKey);
     }
 }
 
 async function clockOut(jobId) {
+    // Keep order behind anything already waiting to sync
+    if (await hasQueuedActions()) {
+        return queueOffline('clock_out', jobId);
+    }
+    const idempotencyKey = newIdempotencyKey();
     try {
-        const response = await fetch(`${API_URL}/api/time/clockout`, {
+        const response = await sendMutation(`${API_URL}/api/time/clockout`, {
             method: 'POST',
-            headers: getAuthHeaders(),
             body: JSON.stringify({ job_id: jobId })
-        });
+        }, idempotencyKey);
         if (response.ok) {
-            fetchJobs();
-            fetchActiveClocks();
+            refreshDashboard();
             closeModal();
         } else {
             const error = await response.json();
@@ -229,19 +422,19 @@ async function clockOut(jobId) {
         }
     } catch (error) {
         console.error('Error clocking out:', error);
+        // Same key: if an attempt did reach the server, the sync skips it
+        queueOffline('clock_out', jobId, idempotencyKey);
     }
 }
 
 async function markJobComplete(jobId) {
     if (!confirm('Mark this job as complete?')) return;
     try {
-        const response = await fetch(`${API_URL}/api/jobs/${jobId}/mark-complete`, {
-            method: 'POST',
-            headers: getAuthHeaders()
+        const response = await sendMutation(`${API_URL}/api/jobs/${jobId}/mark-complete`, {
+            method: 'POST'
         });
         if (response.ok) {
-            fetchJobs();
-            fetchActiveClocks();
+            refreshDashboard();
             closeModal();
         } else {
             const error = await response.json();
@@ -254,13 +447,11 @@ async function markJobComplete(jobId) {
 
 async function approveJob(jobId) {
     try {
-        const response = await fetch(`${API_URL}/api/jobs/${jobId}/approve`, {
-            method: 'POST',
-            headers: getAuthHeaders()
+        const response = await sendMutation(`${API_URL}/api/jobs/${jobId}/approve`, {
+            method: 'POST'
         });
         if (response.ok) {
-            fetchJobs();
-            fetchArchivedJobs();
+            refreshDashboard();
         } else {
             const error = await response.json();
             alert(error.detail || 'Failed to approve job');
@@ -272,12 +463,11 @@ async function approveJob(jobId) {
 
 async function reopenJob(jobId) {
     try {
-        const response = await fetch(`${API_URL}/api/jobs/${jobId}/reopen`, {
-            method: 'POST',
-            headers: getAuthHeaders()
+        const response = await sendMutation(`${API_URL}/api/jobs/${jobId}/reopen`, {
+            method: 'POST'
         });
         if (response.ok) {
-            fetchJobs();
+            refreshDashboard();
         } else {
             const error = await response.json();
             alert(error.detail || 'Failed to reopen job');
@@ -290,12 +480,11 @@ async function reopenJob(jobId) {
 async function deleteJob(jobId) {
     if (!confirm('Delete this job permanently?')) return;
     try {
-        const response = await fetch(`${API_URL}/api/jobs/${jobId}`, {
-            method: 'DELETE',
-            headers: getAuthHeaders()
+        const response = await sendMutation(`${API_URL}/api/jobs/${jobId}`, {
+            method: 'DELETE'
         });
         if (response.ok) {
-            fetchJobs();
+            refreshDashboard();
             closeModal();
         } else {
             const error = await response.json();
@@ -308,53 +497,108 @@ async function deleteJob(jobId) {
 
 // ==================== RENDERING ====================
 
+// Container id -> Map of item key -> { html, el } from the last render
+const renderedLists = {};
+
+function renderKeyedList(container, entries, emptyHtml = '') {
+    // entries: [{ key, html }] in display order. Elements whose markup is
+    // unchanged are kept as they are; only new or changed items are rebuilt.
+    if (entries.length === 0) {
+        container.innerHTML = emptyHtml;
+        delete renderedLists[container.id];
+        return;
+    }
+    
+    const previous = renderedLists[container.id] || new Map();
+    const next = new Map();
+    for (const { key, html } of entries) {
+        const old = previous.get(key);
+        if (old && old.html === html) {
+            next.set(key, old);
+        } else {
+            const template = document.createElement('template');
+            template.innerHTML = html.trim();
+            next.set(key, { html, el: template.content.firstElementChild });
+        }
+    }
+    
+    // Drop anything not in the new list (old items, empty-state markup)
+    const keep = new Set(Array.from(next.values(), item => item.el));
+    Array.from(container.childNodes).forEach(node => {
+        if (!keep.has(node)) node.remove();
+    });
+    
+    // Insert new elements and move reordered ones into place
+    let index = 0;
+    for (const { el } of next.values()) {
+        const current = container.children[index];
+        if (current !== el) container.insertBefore(el, current || null);
+        index++;
+    }
+    
+    renderedLists[container.id] = next;
+}
+
 function renderJobBoard() {
     const container = document.getElementById('jobs-list');
     const activeJobs = jobs.filter(j => !j.is_archived && !j.marked_for_review);
     
-    if (activeJobs.length === 0) {
-        container.innerHTML = '<div class="empty-state"><p>No jobs available</p></div>';
-        return;
-    }
-    
-    container.innerHTML = activeJobs.map(job => {
-        const hasActiveWorker = job.assignments.some(a => a.is_clocked_in);
+    renderKeyedList(container, activeJobs.map(job => {
+        const hasActiveWorker = job.clocked_in_workers > 0;
         const statusClass = hasActiveWorker ? 'in-progress' : '';
         const statusBadge = hasActiveWorker ? 
             '<span class="status-badge in-progress">In Progress</span>' :
             '<span class="status-badge open">Open</span>';
         
-        return `
+        return { key: job.id, html: `
             <div class="job-card ${statusClass}" onclick="openJobModal(${job.id})">
                 <h3>
                     ${escapeHtml(job.job_name)}
                     ${statusBadge}
                 </h3>
-                ${job.description ? `<p class="description">${escapeHtml(job.description)}</p>` : ''}
                 <div class="job-meta">
                     <span>Workers: ${job.current_workers}/${job.max_workers}</span>
                     <span>Time: ${formatDuration(job.total_time_seconds)}</span>
                 </div>
             </div>
-        `;
-    }).join('');
-    
-    // Render review queue for admin
-    if (currentUser.role === 'admin') {
-        renderReviewQueue();
+        ` };
+    }), '<div class="empty-state"><p>No jobs available</p></div>');
+}
+
+function renderSearchResults() {
+    // While searching, results replace the board
+    const container = document.getElementById('search-results');
+    document.getElementById('jobs-list').style.display = searchQuery ? 'none' : '';
+    if (!searchQuery) {
+        renderKeyedList(container, []);
+        return;
     }
+    
+    renderKeyedList(container, searchResults.map(job => {
+        let badge = '<span class="status-badge open">Open</span>';
+        if (job.is_archived) badge = '<span class="status-badge complete">Complete</span>';
+        else if (job.marked_for_review) badge = '<span class="status-badge review">Pending Review</span>';
+        else if (job.clocked_in_workers > 0) badge = '<span class="status-badge in-progress">In Progress</span>';
+        
+        return { key: job.id, html: `
+            <div class="job-card" onclick="openJobModal(${job.id})">
+                <h3>
+                    ${escapeHtml(job.job_name)}
+                    ${badge}
+                </h3>
+                <div class="job-meta">
+                    <span>Workers: ${job.current_workers}/${job.max_workers}</span>
+                    <span>Time: ${formatDuration(job.total_time_seconds)}</span>
+                </div>
+            </div>
+        ` };
+    }), '<div class="empty-state"><p>No matching jobs</p></div>');
 }
 
 function renderReviewQueue() {
     const container = document.getElementById('review-queue');
-    const reviewJobs = jobs.filter(j => j.marked_for_review);
     
-    if (reviewJobs.length === 0) {
-        container.innerHTML = '<p class="empty-state">No jobs pending review</p>';
-        return;
-    }
-    
-    container.innerHTML = reviewJobs.map(job => `
+    renderKeyedList(container, reviewJobs.map(job => ({ key: job.id, html: `
         <div class="job-card review">
             <h3>
                 ${escapeHtml(job.job_name)}
@@ -369,26 +613,16 @@ function renderReviewQueue() {
                 <button class="btn btn-small btn-secondary" onclick="event.stopPropagation(); reopenJob(${job.id})">Reopen</button>
             </div>
         </div>
-    `).join('');
+    ` })), '<p class="empty-state">No jobs pending review</p>');
 }
 
 function renderMyJobs() {
     const container = document.getElementById('my-jobs-list');
-    myJobs = jobs.filter(j => 
-        !j.is_archived && 
-        j.assignments.some(a => a.user_id === currentUser.id)
-    );
-    
-    if (myJobs.length === 0) {
-        container.innerHTML = '<div class="empty-state"><p>You\'re not assigned to any jobs</p><p>Join a job from the Job Board!</p></div>';
-        return;
-    }
     
-    container.innerHTML = myJobs.map(job => {
-        const myAssignment = job.assignments.find(a => a.user_id === currentUser.id);
-        const isClockedIn = myAssignment?.is_clocked_in;
+    renderKeyedList(container, myJobs.map(job => {
+        const isClockedIn = activeClocks.some(c => c.job_id === job.id);
         
-        return `
+        return { key: job.id, html: `
             <div class="job-card ${isClockedIn ? 'in-progress' : ''}" onclick="openJobModal(${job.id})">
                 <h3>
                     ${escapeHtml(job.job_name)}
@@ -398,53 +632,44 @@ function renderMyJobs() {
                     <span>Time: ${formatDuration(job.total_time_seconds)}</span>
                 </div>
             </div>
-        `;
-    }).join('');
+        ` };
+    }), '<div class="empty-state"><p>You\'re not assigned to any jobs</p><p>Join a job from the Job Board!</p></div>');
 }
 
 function renderActiveClocks() {
     const container = document.getElementById('active-clocks');
-    clearAllTimers();
-    
     if (activeClocks.length === 0) {
-        container.innerHTML = '';
+        renderKeyedList(container, []);
         return;
     }
     
-    container.innerHTML = `
-        <h3>⏱️ Currently Clocked In</h3>
-        ${activeClocks.map(clock => {
-            const timerId = `clock-${clock.job_id}`;
-            return `
-                <div class="active-clock-item">
-                    <div>
-                        <strong>${escapeHtml(clock.job_name)}</strong>
-                    </div>
-                    <div>
-                        <span class="clock-duration" id="${timerId}">--:--:--</span>
-                        <button class="btn btn-small btn-danger" onclick="clockOut(${clock.job_id})">Clock Out</button>
-                    </div>
+    // The ticker fills in and updates each .clock-duration
+    renderKeyedList(container, [
+        { key: 'header', html: '<h3>⏱️ Currently Clocked In</h3>' },
+        ...activeClocks.map(clock => ({ key: clock.job_id, html: `
+            <div class="active-clock-item">
+                <div>
+                    <strong>${escapeHtml(clock.job_name)}</strong>
                 </div>
-            `;
-        }).join('')}
-    `;
-    
-    // Start timers
-    activeClocks.forEach(clock => {
-        startClockTimer(clock.job_id, new Date(clock.clock_in));
-    });
+                <div>
+                    <span class="clock-duration" data-clock-start="${new Date(clock.clock_in).getTime()}">--:--:--</span>
+                    <button class="btn btn-small btn-danger" onclick="clockOut(${clock.job_id})">Clock Out</button>
+                </div>
+            </div>
+        ` }))
+    ]);
+    updateClocks();
 }
 
 function renderArchive() {
     const container = document.getElementById('archive-list');
-    
     if (archivedJobs.length === 0) {
-        container.innerHTML = '<div class="empty-state"><p>No completed jobs yet</p></div>';
+        renderKeyedList(container, [], '<div class="empty-state"><p>No completed jobs yet</p></div>');
         return;
     }
     
-    container.innerHTML = archivedJobs.map(job => `
-        <div class="job-card" onclick="openJobModal(${job.id}, true)">
+    const entries = archivedJobs.map(job => ({ key: job.id, html: `
+        <div class="job-card" onclick="openJobModal(${job.id})">
             <h3>
                 ${escapeHtml(job.job_name)}
                 <span class="status-badge complete">Complete</span>
@@ -455,13 +680,17 @@ function renderArchive() {
                 <span>Completed: ${formatDate(job.completed_at)}</span>
             </div>
         </div>
-    `).join('');
+    ` }));
+    if (archivedJobs.length < archivedTotal) {
+        entries.push({ key: 'load-more', html: '<button class="btn btn-secondary" onclick="fetchArchivedJobs(true)">Load More</button>' });
+    }
+    renderKeyedList(container, entries);
 }
 
 function renderUsers() {
     const container = document.getElementById('users-list');
     
-    container.innerHTML = users.map(user => `
+    renderKeyedList(container, users.map(user => ({ key: user.id, html: `
         <div class="user-card">
             <div>
                 <span class="user-name">${escapeHtml(user.username)} (${user.initials})</span>
@@ -471,17 +700,33 @@ function renderUsers() {
                 <button class="btn btn-small btn-danger" onclick="deleteUser(${user.id})">Delete</button>
             ` : ''}
         </div>
-    `).join('');
+    ` })));
 }
 
 // ==================== MODAL ====================
 
-function openJobModal(jobId, isArchived = false) {
-    const job = isArchived ? 
-        archivedJobs.find(j => j.id === jobId) : 
-        jobs.find(j => j.id === jobId);
-    
-    if (!job) return;
+async function openJobModal(jobId) {
+    // Lists only carry card fields; load the full job for the modal
+    let job;
+    try {
+        const response = await authedFetch(`${API_URL}/api/jobs/${jobId}`);
+        if (!response.ok) return;
+        job = await response.json();
+    } catch (error) {
+        // Offline: show the card with what we know about our own assignment
+        const card = [...jobs, ...myJobs, ...archivedJobs].find(j => j.id === jobId);
+        if (!card) return;
+        const mine = myJobs.some(j => j.id === jobId);
+        job = {
+            ...card,
+            assignments: mine ? [{
+                user_id: currentUser.id,
+                username: currentUser.username,
+                initials: currentUser.initials,
+                is_clocked_in: activeClocks.some(c => c.job_id === jobId)
+            }] : []
+        };
+    }
     
     document.getElementById('modal-job-name').textContent = job.job_name;
     document.getElementById('modal-job-description').textContent = job.description || 'No description';
@@ -504,6 +749,18 @@ function openJobModal(jobId, isArchived = false) {
     
     document.getElementById('modal-time').textContent = formatDuration(job.total_time_seconds);
     
+    // Estimate from similar archived jobs (median, with the 90th percentile as an upper bound)
+    const estimateRow = document.getElementById('modal-estimate-row');
+    if (job.estimated_total_seconds != null && !job.is_complete) {
+        const remaining = Math.max(0, job.estimated_total_seconds - job.total_time_seconds);
+        const upper = Math.max(0, job.estimated_total_seconds_p90 - job.total_time_seconds);
+        document.getElementById('modal-estimate').textContent =
+            `${formatDuration(remaining)} (up to ${formatDuration(upper)}, from ${job.estimate_samples} similar jobs)`;
+        estimateRow.style.display = 'block';
+    } else {
+        estimateRow.style.display = 'none';
+    }
+    
     // Assignments
     const assignContainer = document.getElementById('modal-assignments');
     if (job.assignments.length === 0) {
@@ -578,24 +835,247 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
-function startClockTimer(jobId, startTime) {
-    const timerId = `clock-${jobId}`;
-    const element = document.getElementById(timerId);
-    if (!element) return;
+// ==================== CLOCK TICKER ====================
+
+// One interval drives every running clock display; paused while the tab is hidden
+let clockTicker = null;
+
+function updateClocks() {
+    const now = Date.now();
+    document.querySelectorAll('.clock-duration[data-clock-start]').forEach(element => {
+        const text = formatDuration((now - Number(element.dataset.clockStart)) / 1000);
+        if (element.textContent !== text) element.textContent = text;
+    });
+}
+
+function startClockTicker() {
+    if (clockTicker || document.hidden) return;
+    updateClocks();
+    clockTicker = setInterval(updateClocks, 1000);
+}
+
+function stopClockTicker() {
+    clearInterval(clockTicker);
+    clockTicker = null;
+}
+
+// ==================== OFFLINE QUEUE ====================
+
+// Join/clock actions taken while the server can't be reached wait in
+// IndexedDB, stamped with the device time and a unique key, and are replayed
+// in order through /api/sync. The server skips keys it has already applied,
+// so resending a batch whose response was lost is harmless.
+const QUEUE_DB_NAME = 'honeybadger';
+const QUEUE_STORE = 'queued-actions';
+const SYNC_BATCH_SIZE = 500;
+
+let queueDb = null;
+let syncInFlight = null;
+
+function openQueue() {
+    if (!queueDb) {
+        queueDb = new Promise((resolve, reject) => {
+            const request = indexedDB.open(QUEUE_DB_NAME, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(QUEUE_STORE, { keyPath: 'seq', autoIncrement: true });
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+    return queueDb;
+}
+
+async function withQueueStore(mode, fn) {
+    // Run fn(store) in one transaction; resolves with the result of the request fn returns
+    const db = await openQueue();
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(QUEUE_STORE, mode);
+        const request = fn(tx.objectStore(QUEUE_STORE));
+        tx.oncomplete = () => resolve(request ? request.result : undefined);
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+function newIdempotencyKey() {
+    // getRandomValues also works on plain-http LAN addresses (randomUUID doesn't)
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function queuedActions() {
+    // Oldest first; only the logged-in user's, since they sync with their token
+    const all = await withQueueStore('readonly', store => store.getAll());
+    return all.filter(a => a.user_id === currentUser.id);
+}
+
+async function hasQueuedActions() {
+    try {
+        return currentUser !== null && (await queuedActions()).length > 0;
+    } catch (error) {
+        return false;
+    }
+}
+
+async function queueOffline(action, jobId, idempotencyKey = newIdempotencyKey()) {
+    try {
+        await withQueueStore('readwrite', store => store.add({
+            idempotency_key: idempotencyKey,
+            action,
+            job_id: jobId,
+            client_time: new Date().toISOString(),
+            user_id: currentUser.id
+        }));
+    } catch (error) {
+        console.error('Error queueing offline action:', error);
+        alert('Could not reach the server');
+        return;
+    }
+    applyLocally(action, jobId);
+    closeModal();
+    renderSyncStatus();
+}
+
+function applyLocally(action, jobId) {
+    // Show the queued action right away; the next successful refresh replaces this
+    const job = [...jobs, ...myJobs].find(j => j.id === jobId);
+    if (action === 'join' && job && !myJobs.some(j => j.id === jobId)) {
+        myJobs = [job, ...myJobs];
+    } else if (action === 'clock_in' && !activeClocks.some(c => c.job_id === jobId)) {
+        activeClocks = [...activeClocks, {
+            job_id: jobId,
+            job_name: job ? job.job_name : `Job ${jobId}`,
+            clock_in: new Date().toISOString()
+        }];
+    } else if (action === 'clock_out') {
+        activeClocks = activeClocks.filter(c => c.job_id !== jobId);
+    }
+    renderMyJobs();
+    renderActiveClocks();
+}
+
+async function renderSyncStatus() {
+    const count = currentUser ? (await queuedActions().catch(() => [])).length : 0;
+    document.getElementById('sync-status').textContent =
+        count ? `⏳ ${count} action${count === 1 ? '' : 's'} waiting to sync` : '';
+}
+
+function syncQueue() {
+    // Send queued actions in one request. Resolves true when nothing is left
+    // to send (or the server took the batch), false if it should be retried.
+    if (!syncInFlight) {
+        syncInFlight = sendQueuedActions()
+            .catch(error => {
+                console.error('Error syncing offline actions:', error);
+                return false;
+            })
+            .finally(() => {
+                syncInFlight = null;
+                renderSyncStatus();
+            });
+    }
+    return syncInFlight;
+}
+
+async function sendQueuedActions() {
+    // No IndexedDB (e.g. private browsing) means nothing can have been queued
+    const actions = (await queuedActions().catch(() => [])).slice(0, SYNC_BATCH_SIZE);
+    if (actions.length === 0) return true;
     
-    function update() {
-        const now = new Date();
-        const diff = (now - startTime) / 1000;
-        element.textContent = formatDuration(diff);
+    const response = await sendMutation(`${API_URL}/api/sync`, {
+        method: 'POST',
+        body: JSON.stringify({
+            sent_at: new Date().toISOString(),
+            actions: actions.map(({ idempotency_key, action, job_id, client_time }) =>
+                ({ idempotency_key, action, job_id, client_time }))
+        })
+    });
+    if (!response.ok) return false;
+    
+    const data = await response.json();
+    await withQueueStore('readwrite', store => {
+        actions.forEach(a => store.delete(a.seq));
+    });
+    const rejected = data.results.filter(r => r.status === 'rejected');
+    if (rejected.length > 0) {
+        alert('Some actions taken offline could not be applied:\n' + rejected.map(r => r.detail).join('\n'));
+    }
+    return true;
+}
+
+function registerServiceWorker() {
+    // Browsers only allow service workers on https:// or localhost
+    if ('serviceWorker' in navigator && window.isSecureContext) {
+        navigator.serviceWorker.register('/sw.js').catch(error => {
+            console.error('Service worker registration failed:', error);
+        });
+    }
+}
+
+// ==================== POLLING ====================
+
+// Dashboard refresh: every 30s while visible, backing off on failures, with
+// at most one request in flight. Nothing runs while hidden or logged out.
+const POLL_INTERVAL_MS = 30000;
+const POLL_MAX_DELAY_MS = 5 * 60 * 1000;
+
+let polling = false;
+let pollTimer = null;
+let pollFailures = 0;
+let pollController = null;  // AbortController of the request in flight
+let pollAgain = false;      // a refresh was asked for while one was in flight
+
+function startPolling() {
+    polling = true;
+    pollFailures = 0;
+    refreshDashboard();
+}
+
+function stopPolling() {
+    polling = false;
+    pollAgain = false;
+    pausePolling();
+    if (pollController) {
+        pollController.abort();
+        pollController = null;
     }
+}
+
+function pausePolling() {
+    clearTimeout(pollTimer);
+    pollTimer = null;
+}
+
+async function refreshDashboard() {
+    // Fetch now, then schedule the next poll
+    if (!polling) return;
+    pausePolling();
+    if (pollController) {
+        // Its data may predate whatever prompted this call; go again after it
+        pollAgain = true;
+        return;
+    }
+    
+    const controller = pollController = new AbortController();
+    const ok = await ensureFreshToken() && await syncQueue() && await fetchDashboard(controller.signal);
+    if (controller.signal.aborted) return;
+    pollController = null;
+    if (!polling) return;
     
-    update();
-    clockTimers[jobId] = setInterval(update, 1000);
+    pollFailures = ok ? 0 : pollFailures + 1;
+    if (pollAgain) {
+        pollAgain = false;
+        refreshDashboard();
+    } else {
+        schedulePoll();
+    }
 }
 
-function clearAllTimers() {
-    Object.values(clockTimers).forEach(timer => clearInterval(timer));
-    clockTimers = {};
+function schedulePoll() {
+    if (!polling || document.hidden) return;
+    const delay = Math.min(POLL_INTERVAL_MS * 2 ** pollFailures, POLL_MAX_DELAY_MS);
+    // Jitter so tablets coming back from an outage don't all poll together
+    pollTimer = setTimeout(refreshDashboard, delay * (0.9 + Math.random() * 0.2));
 }
 
 // ==================== NAVIGATION ====================
@@ -627,19 +1107,10 @@ function showMainApp() {
         document.body.classList.remove('is-admin');
     }
     
-    // Load data
-    fetchJobs();
-    fetchArchivedJobs();
-    fetchActiveClocks();
-    if (currentUser.role === 'admin') {
-        fetchUsers();
-    }
-    
-    // Start refresh interval
-    setInterval(() => {
-        fetchJobs();
-        fetchActiveClocks();
-    }, 30000); // Refresh every 30 seconds
+    // Load data and keep it fresh
+    startPolling();
+    startClockTicker();
+    renderSyncStatus();
 }
 
 function switchPage(pageName) {
@@ -650,22 +1121,43 @@ function switchPage(pageName) {
     document.querySelector(`[data-page="${pageName}"]`).classList.add('active');
     
     // Refresh data based on page
-    if (pageName === 'archive') {
+    if (pageName === 'my-jobs') {
+        fetchMyJobs();
+    } else if (pageName === 'archive') {
         fetchArchivedJobs();
     } else if (pageName === 'admin') {
         fetchUsers();
+        fetchReviewQueue();
     }
 }
 
 // ==================== EVENT LISTENERS ====================
 
+document.addEventListener('visibilitychange', () => {
+    if (document.hidden) {
+        stopClockTicker();
+        pausePolling();
+    } else if (currentUser) {
+        startClockTicker();
+        refreshDashboard();
+    }
+});
+
+window.addEventListener('online', () => {
+    if (currentUser) refreshDashboard();
+});
+
 document.addEventListener('DOMContentLoaded', () => {
+    registerServiceWorker();
+    
     // Check for existing session
     const savedToken = localStorage.getItem('token');
     const savedUser = localStorage.getItem('user');
     
     if (savedToken && savedUser) {
         authToken = savedToken;
+        refreshToken = localStorage.getItem('refreshToken') || null;
+        tokenExpiresAt = Number(localStorage.getItem('tokenExpiresAt')) || 0;
         currentUser = JSON.parse(savedUser);
         showMainApp();
     } else {
@@ -703,6 +1195,10 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
     
+    // Job search
+    document.getElementById('job-search').addEventListener('input', scheduleSearch);
+    document.getElementById('job-search-state').addEventListener('change', fetchSearch);
+
     // Add job form
     document.getElementById('add-job-form').addEventListener('submit', (e) => {
         e.preventDefault();
@@ -726,9 +1222,8 @@ document.addEventListener('DOMContentLoaded', () => {
 async function deleteUser(userId) {
     if (!confirm('Delete this user?')) return;
     try {
-        const response = await fetch(`${API_URL}/api/users/${userId}`, {
-            method: 'DELETE',
-            headers: getAuthHeaders()
+        const response = await sendMutation(`${API_URL}/api/users/${userId}`, {
+            method: 'DELETE'
         });
         if (response.ok) {
             fetchUsers();
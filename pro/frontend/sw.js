@@ -0,0 +1,55 @@
+/**
+ * HoneyBadger Pro - Service Worker
+ *
+ * Caches the app shell so the page still loads when the server can't be
+ * reached. API calls are never cached; join/clock actions taken offline are
+ * queued in IndexedDB by app.js and synced when the connection returns.
+ */
+
+const CACHE_NAME = 'honeybadger-shell-v1';
+const APP_SHELL = ['/', '/static/app.js', '/static/style.css'];
+const NETWORK_TIMEOUT_MS = 3000;
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE_NAME)
+            .then(cache => cache.addAll(APP_SHELL))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    // Drop shells cached by older versions of this file
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(names.filter(name => name !== CACHE_NAME).map(name => caches.delete(name))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const url = new URL(event.request.url);
+    if (event.request.method !== 'GET' || url.origin !== self.location.origin ||
+        !APP_SHELL.includes(url.pathname)) {
+        return;
+    }
+    event.respondWith(networkFirst(event.request));
+});
+
+function networkFirst(request) {
+    // Fresh files when the server answers; the cached shell when it doesn't,
+    // or when it is too slow (flaky Wi-Fi tends to hang rather than fail)
+    const network = fetch(request).then(response => {
+        if (response.ok) {
+            const copy = response.clone();
+            caches.open(CACHE_NAME).then(cache => cache.put(request, copy));
+        }
+        return response;
+    });
+    const timeout = new Promise(resolve => setTimeout(resolve, NETWORK_TIMEOUT_MS))
+        .then(() => caches.match(request, { ignoreSearch: true }));
+    
+    return Promise.race([network, timeout])
+        .then(response => response || network)
+        .catch(() => caches.match(request, { ignoreSearch: true }));
+}
@@ -10,4 +10,4 @@ echo.
 cd /d "%~dp0"
 call backend\venv\Scripts\activate.bat
 cd backend
-python main.py
+python serve.py
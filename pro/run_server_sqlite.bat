@@ -0,0 +1,15 @@
+@echo off
+echo Starting HoneyBadger Pro Server (SQLite mode - no PostgreSQL needed)...
+echo.
+echo Server will be available at: http://localhost:8000
+echo Data is stored in: backend\honeybadger.db
+echo.
+echo Press Ctrl+C to stop the server.
+echo ================================================
+echo.
+
+cd /d "%~dp0"
+call backend\venv\Scripts\activate.bat
+cd backend
+set DATABASE_URL=sqlite:///honeybadger.db
+python serve.py
@@ -18,7 +18,8 @@ where psql >nul 2>&1
 if errorlevel 1 (
     echo.
     echo WARNING: PostgreSQL not found in PATH.
-    echo Make sure PostgreSQL is installed and running.
+    echo Make sure PostgreSQL is installed and running,
+    echo or skip it and start the server with run_server_sqlite.bat instead.
     echo.
     echo Download from: https://www.postgresql.org/download/windows/
     echo.
@@ -51,6 +52,9 @@ echo   GRANT ALL PRIVILEGES ON DATABASE honeybadger TO honeybadger;
 echo   \q
 echo.
 echo Or edit pro\backend\config.py with your database URL.
+echo.
+echo Single-machine shop? Skip PostgreSQL and double-click
+echo pro\run_server_sqlite.bat to use a local SQLite database.
 echo ================================================
 echo.
 